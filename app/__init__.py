@@ -1,9 +1,20 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from app.assets import Assets
+from app.cache import Cache
+from app.database import RoutingSession, apply_engine_profile, register_pragmas
+from app.hashing import PasswordHasher
+from app.instrumentation import Instrumentation
+from app.streaming import Compression
 from config import config
 
 # Inizializzazione estensioni
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+cache = Cache()
+password_hasher = PasswordHasher()
+instrumentation = Instrumentation()
+assets = Assets()
+compression = Compression()
 
 
 def create_app(config_name='default'):
@@ -15,17 +26,29 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     
     # Inizializza le estensioni con l'app
+    apply_engine_profile(app)
     db.init_app(app)
+    register_pragmas(app, db)
+    cache.init_app(app)
+    password_hasher.init_app(app)
+    instrumentation.init_app(app, db)
+    assets.init_app(app)
+    compression.init_app(app)
     
     # Registrazione dei Blueprints
     from app.auth import auth_bp
     from app.main import main_bp
+    from app.api import api_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
+    app.register_blueprint(api_bp)
     
-    # Creazione delle tabelle del database
-    with app.app_context():
-        db.create_all()
+    # Comandi CLI
+    from app.cli import register_commands
+    register_commands(app)
+    
+    # Lo schema del database non viene toccato qui: si aggiorna con
+    # `flask db upgrade` (una volta al deploy), così l'avvio dei worker è immediato
     
     return app
@@ -0,0 +1,217 @@
+"""
+Statistiche avanzate sullo studio, calcolate con NumPy
+Le sessioni dell'utente vengono lette con una sola query (giorno, materia, minuti, fascia oraria)
+e copiate in array NumPy: tutte le metriche sono ottenute con operazioni vettoriali
+(bincount, cumsum, diff, lexsort), senza cicli Python sulle singole sessioni.
+- giorni consecutivi di studio (serie attuale e record), totali e per materia
+- mappa giorno della settimana × ora di registrazione (UTC)
+- medie mobili a 7 e 30 giorni
+- distribuzione delle durate (percentili e istogramma)
+- ritmo necessario per raggiungere le ore obiettivo entro la data dell'esame
+Il risultato contiene solo tipi semplici, così può essere memorizzato in cache.
+"""
+import itertools
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.repositories import StudySessionRepository, SubjectRepository
+
+EPOCH = date(1970, 1, 1)
+WEEKDAY_LABELS = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
+ROLLING_WINDOWS = (7, 30)
+PERCENTILES = (10, 25, 50, 75, 90)
+# Limiti inferiori (minuti) delle classi dell'istogramma delle durate
+DURATION_BINS = (0, 15, 30, 45, 60, 90, 120, 180, 240)
+
+
+def default_exam_date(today):
+    """Data della prima prova della maturità (18 giugno) dell'anno scolastico in corso"""
+    exam = date(today.year, 6, 18)
+    return exam if exam >= today else date(today.year + 1, 6, 18)
+
+
+def load_arrays(user_id):
+    """Colonne delle sessioni dell'utente come array int64: (giorni, materie, minuti, fasce)"""
+    rows = StudySessionRepository.analytics_columns(user_id)
+    data = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64,
+                       count=len(rows) * 4).reshape(-1, 4)
+    return data[:, 0], data[:, 1], data[:, 2], data[:, 3]
+
+
+def _streaks(studied):
+    """
+    Serie di giorni consecutivi per ogni riga di una matrice booleana (righe × giorni,
+    l'ultima colonna è oggi). Restituisce (attuale, record): la serie attuale resta valida
+    se termina ieri, perché oggi si può ancora studiare.
+    """
+    rows, span = studied.shape
+    padded = np.zeros((rows, span + 2), dtype=np.int8)
+    padded[:, 1:-1] = studied
+    edges = np.diff(padded, axis=1)
+    # np.nonzero procede per righe: inizi e fini delle sequenze sono già appaiati
+    run_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    
+    longest = np.zeros(rows, dtype=np.int64)
+    np.maximum.at(longest, run_rows, lengths)
+    current = np.zeros(rows, dtype=np.int64)
+    alive = ends >= span - 1
+    current[run_rows[alive]] = lengths[alive]
+    return current, longest
+
+
+def _rolling_means(daily, window):
+    """Media mobile su window giorni (i giorni precedenti il calendario valgono zero)"""
+    totals = np.concatenate(([0.0], np.cumsum(daily)))
+    index = np.arange(1, len(daily) + 1)
+    return (totals[index] - totals[np.maximum(index - window, 0)]) / window
+
+
+def _group_percentiles(groups, values, counts, percentiles):
+    """
+    Percentili (interpolazione lineare, come np.percentile) di values per ogni gruppo,
+    con un solo ordinamento: restituisce una matrice gruppi × percentili
+    """
+    ordered = values[np.lexsort((values, groups))].astype(np.float64)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = starts[:, None] + np.asarray(percentiles)[None, :] / 100 * (counts[:, None] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.ceil(position).astype(np.int64)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def _hours(minutes, digits=1):
+    return round(float(minutes) / 60, digits)
+
+
+def compute(user_id, today, exam_date, target_hours, chart_days=90):
+    """Calcola tutte le statistiche avanzate di un utente in un unico passaggio vettoriale"""
+    days, subject_ids, minutes, slots = load_arrays(user_id)
+    today_index = (today - EPOCH).days
+    
+    # Calendario denso fino a oggi, con margine per il grafico e la media a 30 giorni
+    past = days <= today_index
+    first = today_index - chart_days - max(ROLLING_WINDOWS) + 2
+    if past.any():
+        first = min(first, int(days[past].min()))
+    span = today_index - first + 1
+    offsets = days[past] - first
+    daily = np.bincount(offsets, weights=minutes[past], minlength=span)
+    
+    current_streak, longest_streak = _streaks((daily > 0)[None, :])
+    rolling = {window: _rolling_means(daily, window) for window in ROLLING_WINDOWS}
+    
+    studied_minutes = int(minutes[past].sum())
+    context = {
+        'session_count': int(len(minutes)),
+        'total_hours': _hours(minutes.sum()),
+        'active_days': int(np.count_nonzero(daily)),
+        'current_streak': int(current_streak[0]),
+        'longest_streak': int(longest_streak[0]),
+        'averages': {window: round(float(rolling[window][-1]) / 60, 2) for window in ROLLING_WINDOWS},
+    }
+    
+    # Grafico: ore giornaliere e medie mobili degli ultimi chart_days giorni
+    chart_start = today - timedelta(days=chart_days - 1)
+    context['chart'] = {
+        'labels': [(chart_start + timedelta(days=i)).strftime('%d/%m') for i in range(chart_days)],
+        'daily': np.round(daily[-chart_days:] / 60, 2).tolist(),
+        **{f'rolling_{window}': np.round(rolling[window][-chart_days:] / 60, 2).tolist()
+           for window in ROLLING_WINDOWS},
+    }
+    
+    # Giorno della settimana × ora, entrambi dal momento della registrazione (UTC):
+    # il giorno di studio (date) non ha un'ora, e mescolare le due fonti sposterebbe
+    # le sessioni registrate dopo mezzanotte sul giorno sbagliato
+    timed = slots >= 0
+    heatmap = np.bincount(slots[timed], weights=minutes[timed], minlength=7 * 24).reshape(7, 24)
+    weekday_totals = heatmap.sum(axis=1)
+    peak = np.unravel_index(np.argmax(heatmap), heatmap.shape) if heatmap.any() else None
+    context['heatmap'] = {
+        'rows': [{'label': WEEKDAY_LABELS[i], 'hours': np.round(heatmap[i] / 60, 1).tolist(),
+                  'total_hours': _hours(weekday_totals[i])} for i in range(7)],
+        'max_hours': _hours(heatmap.max()),
+        'peak': {'weekday': WEEKDAY_LABELS[peak[0]], 'hour': int(peak[1])} if peak else None,
+    }
+    
+    # Distribuzione delle durate
+    if len(minutes):
+        values = np.percentile(minutes, PERCENTILES)
+        percentiles = [{'p': p, 'minutes': int(round(v))} for p, v in zip(PERCENTILES, values)]
+        mean_minutes = int(round(float(minutes.mean())))
+    else:
+        percentiles, mean_minutes = [], 0
+    bins = np.asarray(DURATION_BINS)
+    classes = np.searchsorted(bins, minutes, side='right') - 1
+    histogram = np.bincount(classes, minlength=len(bins))
+    context['durations'] = {
+        'mean_minutes': mean_minutes,
+        'percentiles': percentiles,
+        'labels': [f'{low}–{high - 1}' for low, high in zip(bins[:-1], bins[1:])] + [f'{bins[-1]}+'],
+        'counts': histogram.tolist(),
+    }
+    
+    context['subjects'] = _subject_breakdown(user_id, days, subject_ids, minutes, past,
+                                             first, span, today_index)
+    context['pacing'] = _pacing(today, exam_date, target_hours, studied_minutes,
+                                float(rolling[30][-1]))
+    return context
+
+
+def _subject_breakdown(user_id, days, subject_ids, minutes, past, first, span, today_index):
+    """Totali, durate tipiche, serie e ultimi 30 giorni per materia"""
+    if not len(subject_ids):
+        return []
+    ids, groups, counts = np.unique(subject_ids, return_inverse=True, return_counts=True)
+    groups = groups.ravel()
+    totals = np.bincount(groups, weights=minutes, minlength=len(ids))
+    medians = _group_percentiles(groups, minutes, counts, (50, 90))
+    recent = (days > today_index - 30) & past
+    last_30 = np.bincount(groups[recent], weights=minutes[recent], minlength=len(ids))
+    
+    studied = np.zeros((len(ids), span), dtype=bool)
+    studied[groups[past], days[past] - first] = True
+    current, longest = _streaks(studied)
+    
+    subjects = {s.id: s for s in SubjectRepository.find_all_by_user(user_id)}
+    grand_total = totals.sum()
+    breakdown = [
+        {
+            'name': subjects[subject_id].name,
+            'color': subjects[subject_id].color,
+            'session_count': int(counts[i]),
+            'total_hours': _hours(totals[i]),
+            'share': round(float(totals[i] / grand_total * 100), 1) if grand_total else 0.0,
+            'median_minutes': int(round(medians[i, 0])),
+            'p90_minutes': int(round(medians[i, 1])),
+            'last_30_hours': _hours(last_30[i]),
+            'current_streak': int(current[i]),
+            'longest_streak': int(longest[i]),
+        }
+        for i, subject_id in enumerate(ids.tolist()) if subject_id in subjects
+    ]
+    breakdown.sort(key=lambda s: s['total_hours'], reverse=True)
+    return breakdown
+
+
+def _pacing(today, exam_date, target_hours, studied_minutes, recent_daily_minutes):
+    """Ore al giorno necessarie per raggiungere l'obiettivo e proiezione al ritmo attuale"""
+    days_left = max((exam_date - today).days, 0)
+    studied_hours = studied_minutes / 60
+    remaining = max(target_hours - studied_hours, 0)
+    recent = recent_daily_minutes / 60
+    projected = studied_hours + recent * days_left
+    return {
+        'exam_date': exam_date,
+        'target_hours': target_hours,
+        'days_left': days_left,
+        'studied_hours': round(studied_hours, 1),
+        'remaining_hours': round(remaining, 1),
+        'required_per_day': round(remaining / days_left, 2) if days_left else None,
+        'recent_per_day': round(recent, 2),
+        'projected_hours': round(projected, 1),
+        'progress': min(round(studied_hours / target_hours * 100), 100) if target_hours else 100,
+        'on_track': projected >= target_hours,
+    }
@@ -0,0 +1,226 @@
+"""
+API JSON per client esterni (app mobile, script, PWA)
+Ogni risposta in lettura porta un ETag e un Last-Modified derivati dalla versione dei
+dati dell'utente (UserStats): le richieste condizionali ricevono 304 con una sola
+lettura per chiave primaria, senza eseguire le query aggregate.
+Le rotte /sync permettono ai client offline di scaricare e inviare solo le modifiche.
+"""
+import hashlib
+from functools import wraps
+from datetime import datetime, timedelta
+from flask import jsonify, request, session, make_response, current_app
+from app import sync
+from app.api import api_bp
+from app.repositories import StudySessionRepository, SubjectRepository, StatsRepository, \
+    SyncRepository
+
+
+def api_login_required(f):
+    """Come login_required, ma risponde 401 in JSON invece di reindirizzare al login"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify(error='Autenticazione richiesta'), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def conditional(f):
+    """
+    Gestisce If-None-Match / If-Modified-Since prima di eseguire la vista
+    L'ETag dipende dalla versione dei dati dell'utente e dall'URL richiesto
+    (percorso e parametri), quindi cambia solo quando cambiano i dati; se presente,
+    If-None-Match prevale su If-Modified-Since.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_stats = StatsRepository.get_user_stats(session['user_id'])
+        etag = hashlib.sha1(
+            f'{user_stats.user_id}:{user_stats.version}:{request.full_path}'.encode()
+        ).hexdigest()
+        last_modified = None
+        if user_stats.updated_at:
+            # Last-Modified ha la precisione del secondo: si arrotonda per eccesso e lo si
+            # invia solo a secondo concluso, altrimenti una scrittura successiva nello
+            # stesso secondo avrebbe lo stesso valore e il client riceverebbe un 304 obsoleto
+            last_modified = user_stats.updated_at.replace(microsecond=0) + timedelta(seconds=1)
+            if last_modified > datetime.utcnow():
+                last_modified = None
+        
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = bool(since and last_modified and
+                                last_modified <= since.replace(tzinfo=None))
+        
+        response = make_response('', 304) if not_modified else make_response(f(*args, **kwargs))
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # Il client può conservare la risposta ma deve sempre rivalidarla
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return decorated_function
+
+
+def _session_to_dict(study_session):
+    return {
+        'id': study_session.id,
+        'topic': study_session.topic,
+        'duration_minutes': study_session.duration_minutes,
+        'notes': study_session.notes,
+        'date': study_session.date.isoformat(),
+        'subject_id': study_session.subject_id,
+        'created_at': study_session.created_at.isoformat() if study_session.created_at else None,
+        'updated_at': study_session.updated_at.isoformat() if study_session.updated_at else None,
+        'change_seq': study_session.change_seq
+    }
+
+
+def _subject_to_dict(subject):
+    return {
+        'id': subject.id,
+        'name': subject.name,
+        'description': subject.description,
+        'color': subject.color,
+        'created_at': subject.created_at.isoformat() if subject.created_at else None,
+        'updated_at': subject.updated_at.isoformat() if subject.updated_at else None,
+        'change_seq': subject.change_seq
+    }
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@api_bp.errorhandler(ValueError)
+def handle_value_error(error):
+    return jsonify(error=str(error)), 400
+
+
+@api_bp.route('/sessions')
+@api_login_required
+@conditional
+def sessions_list():
+    """Sessioni dell'utente con paginazione keyset (parametri: cursor, subject_id, date_from, date_to, limit)"""
+    limit = min(request.args.get('limit', type=int) or current_app.config['SESSIONS_PER_PAGE'],
+                current_app.config['API_MAX_PAGE_SIZE'])
+    sessions, next_cursor = StudySessionRepository.find_page_by_user(
+        session['user_id'],
+        per_page=limit,
+        cursor=request.args.get('cursor') or None,
+        subject_id=request.args.get('subject_id', type=int),
+        date_from=_date_arg('date_from'),
+        date_to=_date_arg('date_to')
+    )
+    return jsonify(items=[_session_to_dict(s) for s in sessions], next_cursor=next_cursor)
+
+
+@api_bp.route('/sessions/<int:session_id>')
+@api_login_required
+@conditional
+def session_detail(session_id):
+    """Dettaglio di una sessione"""
+    study_session = StudySessionRepository.find_by_id(session_id, session['user_id'])
+    if not study_session:
+        return jsonify(error='Sessione non trovata'), 404
+    return jsonify(_session_to_dict(study_session))
+
+
+@api_bp.route('/subjects')
+@api_login_required
+@conditional
+def subjects_list():
+    """Materie dell'utente con numero di sessioni e minuti totali"""
+    items = []
+    for stat in SubjectRepository.find_all_with_stats(session['user_id']):
+        item = _subject_to_dict(stat['subject'])
+        item['session_count'] = stat['session_count']
+        item['total_minutes'] = stat['total_minutes']
+        items.append(item)
+    return jsonify(items=items)
+
+
+@api_bp.route('/subjects/<int:subject_id>')
+@api_login_required
+@conditional
+def subject_detail(subject_id):
+    """Dettaglio di una materia con i suoi totali"""
+    user_id = session['user_id']
+    subject = SubjectRepository.find_by_id(subject_id, user_id)
+    if not subject:
+        return jsonify(error='Materia non trovata'), 404
+    
+    item = _subject_to_dict(subject)
+    item['session_count'], item['total_minutes'] = \
+        StudySessionRepository.totals_by_subject(subject_id, user_id)
+    return jsonify(item)
+
+
+@api_bp.route('/stats')
+@api_login_required
+@conditional
+def stats():
+    """Statistiche della dashboard: totali, ore per materia e trend mensile (parametro: year)"""
+    user_id = session['user_id']
+    year = request.args.get('year', type=int) or datetime.utcnow().year
+    user_stats = StatsRepository.get_user_stats(user_id)
+    
+    return jsonify(
+        total_sessions=user_stats.session_count,
+        total_minutes=user_stats.total_minutes,
+        total_hours=user_stats.total_hours,
+        total_subjects=user_stats.subject_count,
+        subjects=StatsRepository.subject_stats(user_id),
+        monthly_trend={'year': year, 'months': StatsRepository.monthly_trend(user_id, year)}
+    )
+
+
+@api_bp.route('/sync/changes')
+@api_login_required
+@conditional
+def sync_changes():
+    """
+    Modifiche successive al cursore (parametri: cursor, limit): materie e sessioni
+    create o modificate ed eliminazioni, in ordine di modifica. Senza cursore
+    restituisce lo stato completo; con has_more il client richiede il blocco successivo.
+    """
+    limit = min(request.args.get('limit', type=int) or current_app.config['SYNC_PAGE_SIZE'],
+                current_app.config['SYNC_PAGE_SIZE'])
+    changes = SyncRepository.changes(session['user_id'], request.args.get('cursor') or None, limit)
+    return jsonify(
+        subjects=[_subject_to_dict(s) for s in changes['subjects']],
+        sessions=[_session_to_dict(s) for s in changes['sessions']],
+        deleted=[{'entity': t.entity, 'id': t.entity_id, 'change_seq': t.change_seq}
+                 for t in changes['deleted']],
+        cursor=changes['cursor'],
+        has_more=changes['has_more']
+    )
+
+
+@api_bp.route('/sync/push', methods=['POST'])
+@api_login_required
+def sync_push():
+    """
+    Applica un lotto di modifiche fatte offline (vedi app.sync) e restituisce un risultato
+    per elemento: created/updated con la riga salvata, deleted, conflict con lo stato
+    attuale del server, invalid con il motivo
+    """
+    results = sync.push(session['user_id'], request.get_json(silent=True),
+                        current_app.config['SYNC_MAX_PUSH_ITEMS'])
+    serializers = {'subjects': _subject_to_dict, 'sessions': _session_to_dict}
+    
+    def serialize(name, result):
+        result = dict(result)
+        for key in ('row', 'current'):
+            if result.get(key) is not None:
+                serializer = serializers.get(name) or serializers[f"{result['entity']}s"]
+                result[key] = serializer(result[key])
+        return result
+    
+    return jsonify({name: [serialize(name, r) for r in items] for name, items in results.items()})
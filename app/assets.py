@@ -0,0 +1,287 @@
+"""
+Asset statici: librerie vendorizzate, fingerprint e precompressione
+- `flask assets vendor` scarica Bootstrap, Font Awesome e Chart.js in app/static/vendor,
+  così l'applicazione funziona anche senza accesso ai CDN (reti scolastiche offline);
+  finché una libreria non è stata scaricata le pagine la caricano dal CDN di origine
+  (con un avviso nel log), oppure, con ASSETS_REQUIRE_VENDOR, build e avvio falliscono
+- `flask assets build` copia gli asset in app/static/dist con l'hash del contenuto nel
+  nome, riscrive gli url() dei CSS, genera le varianti .gz (e .br se il modulo brotli
+  è installato) e scrive manifest.json
+- asset_url() nei template restituisce l'URL con fingerprint, servito con
+  Cache-Control immutable: i caricamenti successivi non fanno richieste di rete
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import urllib.request
+from flask import request, send_from_directory, url_for
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Percorso in app/static → URL di origine (usato anche come ripiego se il file manca)
+VENDOR_ASSETS = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/chartjs/chart.umd.min.js':
+        'https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js',
+    'vendor/fontawesome/css/all.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+}
+# Font referenziati da all.min.css come ../webfonts/<nome>
+FONTAWESOME_WEBFONTS = ('fa-solid-900', 'fa-regular-400', 'fa-brands-400', 'fa-v4compatibility')
+VENDOR_ASSETS.update({
+    f'vendor/fontawesome/webfonts/{font}.{extension}':
+        f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/{font}.{extension}'
+    for font in FONTAWESOME_WEBFONTS
+    for extension in ('woff2', 'ttf')
+})
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Estensioni da precomprimere (woff2, immagini ecc. sono già compresse)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.ttf', '.html')
+# Sotto questa dimensione la compressione non conviene
+MIN_COMPRESS_SIZE = 512
+
+# Varianti precompresse in ordine di preferenza: (Content-Encoding, suffisso del file)
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/ttf', '.ttf')
+
+
+class MissingVendorAssets(RuntimeError):
+    """Librerie di VENDOR_ASSETS non presenti in app/static"""
+    
+    def __init__(self, paths):
+        self.paths = paths
+        super().__init__(f'{len(paths)} librerie non vendorizzate ({", ".join(paths)}): '
+                         f'eseguire `flask assets vendor`')
+
+
+def missing_vendor(static_folder):
+    """Percorsi di VENDOR_ASSETS che mancano in app/static"""
+    return [path for path in VENDOR_ASSETS if not os.path.isfile(os.path.join(static_folder, path))]
+
+
+def fingerprint(path, content):
+    """Nome con l'hash del contenuto: css/style.css → css/style.3f2a9c1b7e04.css"""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, extension = os.path.splitext(path)
+    return f'{root}.{digest}{extension}'
+
+
+def _source_files(static_folder):
+    """Percorsi relativi (con /) di tutti gli asset, esclusa la cartella di build"""
+    paths = []
+    for directory, dirnames, filenames in os.walk(static_folder):
+        relative_dir = os.path.relpath(directory, static_folder)
+        if relative_dir == DIST_DIR or relative_dir.startswith(DIST_DIR + os.sep):
+            dirnames[:] = []
+            continue
+        for filename in filenames:
+            if filename.startswith('.'):
+                continue
+            paths.append(os.path.normpath(os.path.join(relative_dir, filename)).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def _rewrite_css_urls(path, css, manifest):
+    """Sostituisce gli url() relativi di un CSS con i nomi con fingerprint"""
+    base = os.path.dirname(path)
+    
+    def replace(match):
+        quote, target = match.group(1), match.group(2).strip()
+        if target.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        # Conserva eventuali ?query e #frammento (es. font con #iefix)
+        cut = min((i for i in (target.find('?'), target.find('#')) if i >= 0), default=len(target))
+        resource, suffix = target[:cut], target[cut:]
+        resolved = os.path.normpath(os.path.join(base, resource)).replace(os.sep, '/')
+        hashed = manifest.get(resolved)
+        if hashed is None:
+            return match.group(0)
+        relative = os.path.relpath(hashed, base or '.').replace(os.sep, '/')
+        return f'url({quote}{relative}{suffix}{quote})'
+    
+    return _CSS_URL.sub(replace, css)
+
+
+def _write_variants(target, content):
+    """Scrive il file e le sue varianti precompresse; restituisce le codifiche generate"""
+    with open(target, 'wb') as f:
+        f.write(content)
+    
+    encodings = []
+    if not target.endswith(COMPRESSIBLE_EXTENSIONS) or len(content) < MIN_COMPRESS_SIZE:
+        return encodings
+    
+    variants = [('gzip', '.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.insert(0, ('br', '.br', brotli.compress(content, quality=11)))
+    for encoding, suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(target + suffix, 'wb') as f:
+                f.write(compressed)
+            encodings.append(encoding)
+    return encodings
+
+
+def build(static_folder, on_build=None, require_vendor=False):
+    """
+    Genera app/static/dist e il manifest (percorso logico → percorso con fingerprint).
+    I file delle build precedenti non vengono rimossi: le pagine già in cache dei
+    client possono continuare a richiederli durante un aggiornamento.
+    Con require_vendor solleva MissingVendorAssets se le librerie non sono state scaricate.
+    """
+    missing = missing_vendor(static_folder)
+    if missing and require_vendor:
+        raise MissingVendorAssets(missing)
+    
+    dist = os.path.join(static_folder, DIST_DIR)
+    sources = _source_files(static_folder)
+    manifest = {}
+    
+    # Prima tutto tranne i CSS, così gli url() dei CSS trovano già i nomi finali
+    ordered = [p for p in sources if not p.endswith('.css')] + \
+              [p for p in sources if p.endswith('.css')]
+    for path in ordered:
+        with open(os.path.join(static_folder, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = _rewrite_css_urls(path, content.decode('utf-8'), manifest).encode('utf-8')
+        
+        hashed = fingerprint(path, content)
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        encodings = _write_variants(target, content)
+        manifest[path] = hashed
+        if on_build:
+            on_build(path, hashed, encodings)
+    
+    # Scrittura atomica: i processi in esecuzione leggono sempre un manifest completo
+    manifest_path = os.path.join(dist, MANIFEST_NAME)
+    os.makedirs(dist, exist_ok=True)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return manifest
+
+
+def vendor(static_folder, force=False, on_download=None, timeout=30):
+    """Scarica le librerie di VENDOR_ASSETS in app/static; restituisce i file scaricati"""
+    downloaded = []
+    for path, source in VENDOR_ASSETS.items():
+        target = os.path.join(static_folder, path)
+        if os.path.exists(target) and not force:
+            continue
+        with urllib.request.urlopen(source, timeout=timeout) as response:
+            content = response.read()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        downloaded.append(path)
+        if on_download:
+            on_download(path, len(content))
+    return downloaded
+
+
+class Assets:
+    """Estensione Flask: helper asset_url() e rotta /assets con cache immutabile"""
+    
+    def __init__(self, app=None):
+        self.static_folder = None
+        self.manifest = {}
+        self.missing = ()
+        self._fallback_logged = False
+        self._logger = None
+        self.max_age = 365 * 24 * 3600
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Carica il manifest e registra la rotta degli asset e l'helper per i template"""
+        self.static_folder = app.static_folder
+        self.max_age = app.config.get('ASSETS_MAX_AGE', self.max_age)
+        
+        # In sviluppo (default) si usano i file originali, senza build
+        use_manifest = app.config.get('ASSETS_USE_MANIFEST')
+        if use_manifest is None:
+            use_manifest = not app.debug
+        self.manifest = self.load_manifest() if use_manifest else {}
+        
+        # Librerie non ancora vendorizzate: errore se richiesto, altrimenti ripiego sul CDN
+        self.missing = frozenset(missing_vendor(self.static_folder))
+        if self.missing and app.config.get('ASSETS_REQUIRE_VENDOR'):
+            raise MissingVendorAssets(sorted(self.missing))
+        self._logger = app.logger
+        
+        app.add_url_rule('/assets/<path:filename>', 'assets', self.serve)
+        app.add_template_global(self.url, 'asset_url')
+    
+    def load_manifest(self):
+        """Legge dist/manifest.json (vuoto se gli asset non sono stati compilati)"""
+        path = os.path.join(self.static_folder, DIST_DIR, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def url(self, path):
+        """
+        URL di un asset: versione con fingerprint se compilata, altrimenti il file in
+        app/static; per le librerie non ancora vendorizzate, il CDN di origine
+        (segnalato nel log una volta per processo)
+        """
+        hashed = self.manifest.get(path)
+        if hashed is not None:
+            return url_for('assets', filename=hashed)
+        if path in self.missing:
+            if not self._fallback_logged:
+                self._fallback_logged = True
+                self._logger.warning('%s (caricate dai CDN)',
+                                     MissingVendorAssets(sorted(self.missing)))
+            return VENDOR_ASSETS[path]
+        return url_for('static', filename=path)
+    
+    def serve(self, filename):
+        """Serve un file di dist, precompresso se il client lo accetta, con cache immutabile"""
+        dist = os.path.join(self.static_folder, DIST_DIR)
+        if filename == MANIFEST_NAME:
+            raise NotFound()
+        
+        response = None
+        for encoding, suffix in PRECOMPRESSED:
+            if not request.accept_encodings[encoding]:
+                continue
+            compressed = safe_join(dist, filename + suffix)
+            if compressed is not None and os.path.isfile(compressed):
+                response = send_from_directory(
+                    dist, filename + suffix,
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(dist, filename)
+        
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = self.max_age
+        response.cache_control.immutable = True
+        return response
@@ -1,9 +1,17 @@
 from flask import render_template, redirect, url_for, flash, session, request
+from app import transactions
 from app.auth import auth_bp
+from app.hashing import HashingBusy
 from app.repositories import UserRepository
 from functools import wraps
 
 
+def _hashing_busy(template):
+    """Risposta rapida quando la coda di hashing è satura: il client riprova dopo qualche secondo"""
+    flash('Troppe richieste di accesso in questo momento. Riprova tra qualche secondo.', 'warning')
+    return render_template(template), 503, {'Retry-After': '5'}
+
+
 def login_required(f):
     """Decorator per proteggere le rotte che richiedono autenticazione"""
     @wraps(f)
@@ -61,7 +69,10 @@ def register():
             
             flash(f'Registrazione completata! Benvenuto, {user.username}!', 'success')
             return redirect(url_for('main.dashboard'))
+        except HashingBusy:
+            return _hashing_busy('auth/register.html')
         except Exception as e:
+            transactions.rollback()
             flash('Errore durante la registrazione. Riprova.', 'danger')
             return render_template('auth/register.html')
     
@@ -83,10 +94,13 @@ def login():
             flash('Nome utente e password sono obbligatori.', 'danger')
             return render_template('auth/login.html')
         
-        # Cerca l'utente
-        user = UserRepository.find_by_username(username)
+        # Cerca l'utente e verifica la password (nel pool di hashing)
+        try:
+            user = UserRepository.authenticate(username, password)
+        except HashingBusy:
+            return _hashing_busy('auth/login.html')
         
-        if user and user.check_password(password):
+        if user:
             # Login riuscito
             session.permanent = True
             session['user_id'] = user.id
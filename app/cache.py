@@ -0,0 +1,214 @@
+"""
+Cache applicativa con backend intercambiabili
+- memory: LRU + TTL in-process (default)
+- sqlite: file SQLite condiviso tra i processi della stessa macchina
+- null: nessuna cache
+L'invalidazione è esatta perché le chiavi includono la versione dei dati
+dell'utente (UserStats.version), incrementata dai repository a ogni modifica.
+"""
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaseCache:
+    """Interfaccia comune dei backend, con contatori hit/miss"""
+    
+    def __init__(self, default_ttl=300):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+    
+    def get(self, key):
+        """Restituisce il valore associato alla chiave o None"""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    def set(self, key, value, ttl=None):
+        """Memorizza un valore con scadenza (in secondi)"""
+        self.sets += 1
+        self._set(key, value, ttl if ttl is not None else self.default_ttl)
+    
+    def delete(self, key):
+        """Rimuove una chiave"""
+        raise NotImplementedError
+    
+    def clear(self):
+        """Svuota la cache"""
+        raise NotImplementedError
+    
+    def after_fork(self):
+        """Chiamata nel processo figlio dopo un fork: i contatori ripartono da zero"""
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+    
+    def stats(self):
+        """Contatori di utilizzo della cache"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'sets': self.sets,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
+    
+    def _get(self, key):
+        raise NotImplementedError
+    
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """Backend che non memorizza nulla (utile per sviluppo e debug)"""
+    
+    def _get(self, key):
+        return None
+    
+    def _set(self, key, value, ttl):
+        pass
+    
+    def delete(self, key):
+        pass
+    
+    def clear(self):
+        pass
+
+
+class MemoryCache(BaseCache):
+    """Cache LRU con scadenza, locale al processo e thread-safe"""
+    
+    def __init__(self, max_entries=1024, default_ttl=300):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def stats(self):
+        result = super().stats()
+        result['entries'] = len(self._data)
+        return result
+
+
+class SQLiteCache(BaseCache):
+    """Cache condivisa tra processi, salvata in un file SQLite separato dal database"""
+    
+    def __init__(self, path, default_ttl=300):
+        super().__init__(default_ttl)
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache '
+            '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)'
+        )
+    
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+    
+    def after_fork(self):
+        # Le connessioni SQLite non vanno condivise tra processi: il figlio apre le proprie
+        super().after_fork()
+        self._local = threading.local()
+    
+    def _get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+    
+    def _set(self, key, value, ttl):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl)
+        )
+        conn.execute('DELETE FROM cache WHERE expires < ?', (now,))
+    
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+    
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+
+class Cache:
+    """Estensione Flask che seleziona il backend in base alla configurazione"""
+    
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Crea il backend indicato da CACHE_TYPE"""
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        
+        if cache_type == 'memory':
+            self.backend = MemoryCache(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+        elif cache_type == 'sqlite':
+            self.backend = SQLiteCache(app.config['CACHE_SQLITE_PATH'], ttl)
+        elif cache_type == 'null':
+            self.backend = NullCache(ttl)
+        else:
+            raise ValueError(f'CACHE_TYPE non supportato: {cache_type}')
+    
+    def get(self, key):
+        return self.backend.get(key)
+    
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, ttl)
+    
+    def delete(self, key):
+        self.backend.delete(key)
+    
+    def clear(self):
+        self.backend.clear()
+    
+    def after_fork(self):
+        self.backend.after_fork()
+    
+    def stats(self):
+        return self.backend.stats()
@@ -0,0 +1,212 @@
+"""
+Comandi CLI dell'applicazione (eseguibili con `flask --app run <comando>`)
+"""
+import click
+from flask.cli import AppGroup
+
+
+stats_cli = AppGroup('stats', help='Gestione delle tabelle di riepilogo statistiche.')
+
+
+@stats_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Ricalcola solo questo utente.')
+def stats_rebuild(user_id):
+    """Ricostruisce le tabelle di riepilogo dalle sessioni esistenti"""
+    from app.repositories import StatsRepository
+    
+    count = StatsRepository.rebuild(user_id)
+    click.echo(f'✅ Riepiloghi ricostruiti per {count} utenti')
+
+
+@stats_cli.command('check')
+@click.option('--user-id', type=int, default=None, help='Verifica solo questo utente.')
+def stats_check(user_id):
+    """Verifica che le tabelle di riepilogo siano coerenti con le sessioni"""
+    from app.repositories import StatsRepository
+    
+    problems = StatsRepository.check(user_id)
+    if not problems:
+        click.echo('✅ Riepiloghi coerenti')
+        return
+    
+    for problem in problems:
+        click.echo(f'❌ {problem}')
+    raise click.ClickException(
+        f'{len(problems)} incongruenze trovate: esegui `flask stats rebuild`')
+
+
+sessions_cli = AppGroup('sessions', help='Importazione ed esportazione delle sessioni di studio.')
+
+
+def _get_user_or_fail(username):
+    from app.repositories import UserRepository
+    
+    user = UserRepository.find_by_username(username)
+    if not user:
+        raise click.ClickException(f'Utente "{username}" non trovato')
+    return user
+
+
+@sessions_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--username', required=True, help='Utente a cui assegnare le sessioni.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'json']), default=None,
+              help='Formato del file (default: dedotto dall\'estensione).')
+@click.option('--no-create-subjects', is_flag=True, help='Scarta le righe con materie inesistenti.')
+@click.option('--batch-size', type=int, default=2000, show_default=True,
+              help='Righe per blocco di INSERT (una transazione per blocco).')
+def sessions_import(path, username, file_format, no_create_subjects, batch_size):
+    """Importa sessioni di studio da un file CSV o JSON"""
+    import time
+    from app.importer import detect_format, import_file
+    
+    user = _get_user_or_fail(username)
+    file_format = file_format or detect_format(path)
+    if not file_format:
+        raise click.ClickException('Formato non riconosciuto: usa --format csv|json')
+    
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        result = import_file(user.id, f, file_format,
+                             create_subjects=not no_create_subjects,
+                             batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    
+    for line, message in result.errors:
+        click.echo(f'❌ Riga {line if line is not None else "-"}: {message}', err=True)
+    if result.created_subjects:
+        click.echo(f'📚 Materie create: {", ".join(result.created_subjects)}')
+    click.echo(f'✅ Importate {result.imported} sessioni in {elapsed:.2f}s '
+               f'({result.error_count} righe scartate)')
+
+
+@sessions_cli.command('export')
+@click.option('--username', required=True, help='Utente di cui esportare le sessioni.')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson']), default='csv',
+              show_default=True)
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='File di destinazione (default: standard output).')
+def sessions_export(username, export_format, output):
+    """Esporta in streaming le sessioni di studio di un utente"""
+    from app.exporter import generate_export
+    
+    user = _get_user_or_fail(username)
+    for chunk in generate_export(user.id, export_format):
+        output.write(chunk)
+
+
+db_cli = AppGroup('db', help='Migrazioni dello schema del database.')
+
+
+@db_cli.command('upgrade')
+@click.option('--to', 'target', type=int, default=None, help='Versione di arrivo (default: ultima).')
+def db_upgrade(target):
+    """Applica le migrazioni mancanti"""
+    from app import db
+    from app.migrations import upgrade
+    
+    applied = upgrade(db.engine, target, on_apply=lambda m: click.echo(
+        f'⬆️  {m.version:04d} {m.name}: {m.description}'))
+    if not applied:
+        click.echo('✅ Schema già aggiornato')
+    else:
+        click.echo(f'✅ Applicate {len(applied)} migrazioni')
+
+
+@db_cli.command('current')
+def db_current():
+    """Mostra la versione corrente dello schema e le migrazioni in sospeso"""
+    from app import db
+    from app.migrations import applied_versions, discover
+    
+    done = applied_versions(db.engine)
+    for migration in discover():
+        mark = '✅' if migration.version in done else '⏳'
+        click.echo(f'{mark} {migration.version:04d} {migration.name}: {migration.description}')
+    click.echo(f'Versione corrente: {max(done, default=0):04d}')
+
+
+purge_cli = AppGroup('purge', help='Cancellazioni massive a blocchi.')
+
+
+def _echo_progress(deleted, total):
+    click.echo(f'   {deleted}/{total} sessioni eliminate')
+
+
+@purge_cli.command('user')
+@click.option('--username', required=True, help='Utente da eliminare con tutti i suoi dati.')
+@click.option('--batch-size', type=int, default=1000, show_default=True,
+              help='Sessioni eliminate per transazione.')
+@click.option('--pause', type=float, default=0, help='Secondi di attesa tra un blocco e l\'altro.')
+@click.confirmation_option(prompt='Eliminare l\'utente e tutti i suoi dati?')
+def purge_user(username, batch_size, pause):
+    """Elimina un utente con materie, sessioni e riepiloghi"""
+    from app.repositories import PurgeRepository
+    
+    user = _get_user_or_fail(username)
+    deleted = PurgeRepository.purge_user(user, batch_size, _echo_progress, pause)
+    click.echo(f'✅ Utente {username} eliminato ({deleted} sessioni)')
+
+
+search_cli = AppGroup('search', help='Indice di ricerca full-text delle sessioni.')
+
+
+@search_cli.command('rebuild')
+@click.option('--optimize', is_flag=True, help='Unisce anche i segmenti dell\'indice.')
+def search_rebuild(optimize):
+    """Ricostruisce l'indice di ricerca dalle sessioni esistenti"""
+    from app.repositories import SearchRepository
+    
+    count = SearchRepository.rebuild_index()
+    if optimize:
+        SearchRepository.optimize_index()
+    click.echo(f'✅ Indice di ricerca ricostruito ({count} sessioni)')
+
+
+assets_cli = AppGroup('assets', help='Asset statici: librerie vendorizzate e build con fingerprint.')
+
+
+@assets_cli.command('vendor')
+@click.option('--force', is_flag=True, help='Scarica di nuovo anche i file già presenti.')
+def assets_vendor(force):
+    """Scarica Bootstrap, Font Awesome e Chart.js in app/static/vendor"""
+    from flask import current_app
+    from app.assets import vendor
+    
+    try:
+        downloaded = vendor(current_app.static_folder, force,
+                            on_download=lambda path, size: click.echo(f'⬇️  {path} ({size} byte)'))
+    except OSError as e:
+        raise click.ClickException(f'Download non riuscito: {e}')
+    click.echo(f'✅ {len(downloaded)} file scaricati')
+
+
+@assets_cli.command('build')
+def assets_build():
+    """Genera gli asset con fingerprint, le varianti compresse e il manifest"""
+    from flask import current_app
+    from app.assets import build, missing_vendor, MissingVendorAssets
+    
+    def report(path, hashed, encodings):
+        variants = f' (+{", ".join(encodings)})' if encodings else ''
+        click.echo(f'📦 {path} → {hashed}{variants}')
+    
+    try:
+        manifest = build(current_app.static_folder, on_build=report,
+                         require_vendor=current_app.config['ASSETS_REQUIRE_VENDOR'])
+    except MissingVendorAssets as e:
+        raise click.ClickException(str(e))
+    missing = missing_vendor(current_app.static_folder)
+    if missing:
+        click.echo(f'⚠️  {MissingVendorAssets(missing)}; le pagine le caricheranno dai CDN')
+    click.echo(f'✅ {len(manifest)} asset compilati')
+
+
+def register_commands(app):
+    """Registra i comandi CLI sull'applicazione"""
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(sessions_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(purge_cli)
+    app.cli.add_command(assets_cli)
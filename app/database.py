@@ -0,0 +1,90 @@
+"""
+Profilo del motore SQLite
+- PRAGMA applicati a ogni nuova connessione (WAL, busy_timeout, cache, mmap...)
+- separazione lettura/scrittura: le richieste GET/HEAD usano un motore in sola
+  lettura con un pool ampio, le modifiche passano dal motore principale, che in
+  produzione ha una sola connessione per processo (un unico percorso di scrittura)
+"""
+from functools import partial
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+READER_BIND = 'reader'
+
+# PRAGMA che non hanno senso (o falliscono) su una connessione in sola lettura
+WRITER_ONLY_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+class RoutingSession(Session):
+    """Sessione che instrada le letture delle richieste GET/HEAD sul motore in sola lettura"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read_only_request():
+            reader = self._db.engines.get(READER_BIND)
+            if reader is not None:
+                return reader
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _is_read_only_request():
+    return has_request_context() and request.method in ('GET', 'HEAD')
+
+
+def _read_only_url(url):
+    """URL in sola lettura sullo stesso file SQLite (None se il database non è un file SQLite)"""
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.query.get('uri'):
+        return None
+    return url.set(database=f'file:{url.database}',
+                   query={'mode': 'ro', 'uri': 'true'}).render_as_string(hide_password=False)
+
+
+def apply_engine_profile(app):
+    """
+    Prepara la configurazione dei motori prima di db.init_app:
+    con SQLITE_READ_SPLIT aggiunge il bind in sola lettura per lo stesso file
+    """
+    if not app.config.get('SQLITE_READ_SPLIT'):
+        return
+    
+    reader_url = _read_only_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if reader_url is None:
+        app.logger.warning('SQLITE_READ_SPLIT ignorato: il database non è un file SQLite')
+        return
+    
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds[READER_BIND] = dict(app.config.get('SQLITE_READER_ENGINE_OPTIONS') or {}, url=reader_url)
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+
+def _set_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+def register_pragmas(app, db):
+    """Registra i PRAGMA di SQLITE_PRAGMAS su ogni motore SQLite (dopo db.init_app)"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    reader_pragmas = {k: v for k, v in pragmas.items() if k not in WRITER_ONLY_PRAGMAS}
+    reader_pragmas['query_only'] = 'ON'
+    
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name != 'sqlite':
+                continue
+            engine_pragmas = reader_pragmas if key == READER_BIND else pragmas
+            if engine_pragmas:
+                event.listen(engine, 'connect', partial(_set_pragmas, engine_pragmas))
+        
+        if READER_BIND in db.engines:
+            # Una connessione di scrittura crea il file e attiva il WAL prima che
+            # le connessioni in sola lettura provino ad aprirlo
+            with db.engine.connect():
+                pass
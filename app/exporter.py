@@ -0,0 +1,73 @@
+"""
+Esportazione in streaming delle sessioni di studio (CSV o NDJSON)
+Le righe sono lette a blocchi dal cursore e scritte man mano: il primo byte
+(l'intestazione CSV o la prima riga NDJSON) parte subito e la memoria non dipende
+dalla dimensione dello storico.
+Le colonne coincidono con quelle accettate dall'importazione, così un'esportazione
+può essere reimportata come backup.
+"""
+import csv
+import io
+import json
+from app.repositories import StudySessionRepository
+
+
+EXPORT_FIELDS = ['date', 'subject', 'topic', 'duration_minutes', 'notes', 'subject_color']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def _row_values(row):
+    date, subject, topic, duration_minutes, notes, color = row
+    return [date.isoformat(), subject, topic, duration_minutes, notes or '', color]
+
+
+def generate_csv(user_id, rows_per_chunk=500):
+    """Genera il CSV a blocchi di testo (intestazione inclusa nel primo blocco)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    
+    pending = 0
+    for row in StudySessionRepository.iter_export_rows(user_id):
+        writer.writerow(_row_values(row))
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    if pending:
+        yield buffer.getvalue()
+
+
+def generate_ndjson(user_id, rows_per_chunk=500):
+    """
+    Genera un oggetto JSON per riga, raggruppando le righe in blocchi di testo
+    (il primo blocco contiene una sola riga, così la risposta inizia subito)
+    """
+    lines = []
+    limit = 1
+    for row in StudySessionRepository.iter_export_rows(user_id):
+        lines.append(json.dumps(dict(zip(EXPORT_FIELDS, _row_values(row))), ensure_ascii=False))
+        if len(lines) >= limit:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+            limit = rows_per_chunk
+    
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def generate_export(user_id, export_format):
+    """Generatore di blocchi di testo per il formato richiesto ('csv' o 'ndjson')"""
+    if export_format == 'csv':
+        return generate_csv(user_id)
+    return generate_ndjson(user_id)
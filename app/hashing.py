@@ -0,0 +1,110 @@
+"""
+Hashing delle password fuori dal thread che serve la richiesta
+Gli hash (scrypt/pbkdf2 di werkzeug) sono volutamente lenti: vengono eseguiti in un
+pool di processi dedicato e limitato, con controllo di ammissione. Se troppe
+richieste sono già in coda si solleva HashingBusy, così la rotta risponde subito
+"riprova" invece di accumulare latenza per tutte le altre pagine.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Parametri che werkzeug usa quando il metodo li omette (es. 'scrypt', 'pbkdf2:sha256')
+SCRYPT_DEFAULTS = (2 ** 15, 8, 1)
+PBKDF2_DEFAULTS = ('sha256', DEFAULT_PBKDF2_ITERATIONS)
+
+
+class HashingBusy(Exception):
+    """La coda di hashing è satura: il client deve riprovare più tardi"""
+
+
+class PasswordHasher:
+    """Estensione Flask che esegue hash e verifica delle password in un pool di processi"""
+    
+    def __init__(self, app=None):
+        self.method = 'scrypt:32768:8:1'
+        self.workers = 0
+        self.max_pending = 16
+        self.timeout = 10
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Legge i parametri di hashing e di concorrenza dalla configurazione"""
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+    
+    def _ensure_pool(self):
+        """Crea pool e semaforo alla prima richiesta di ogni processo (anche dopo un fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers) \
+                    if self.workers > 0 else None
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+                self._pid = os.getpid()
+    
+    def shutdown(self):
+        """Chiude il pool di hashing creato da questo processo (uscita di un worker)"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._pid = None
+    
+    def _run(self, fn, *args):
+        self._ensure_pool()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        if self._executor is None:
+            try:
+                return fn(*args)
+            finally:
+                slots.release()
+        
+        # Il posto si libera quando il processo termina l'hash, non allo scadere
+        # dell'attesa: un hash abbandonato occupa ancora il pool
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusy()
+    
+    def hash(self, password):
+        """Calcola l'hash della password con i parametri configurati"""
+        return self._run(generate_password_hash, password, self.method)
+    
+    def verify(self, password_hash, password):
+        """Verifica una password rispetto al suo hash"""
+        return self._run(check_password_hash, password_hash, password)
+    
+    def needs_rehash(self, password_hash):
+        """True se l'hash è stato calcolato con parametri diversi da quelli configurati"""
+        return password_hash.split('$', 1)[0] != canonical_method(self.method)
+
+
+def canonical_method(method):
+    """
+    Metodo in forma completa, come compare negli hash: werkzeug espande i parametri
+    omessi (es. 'scrypt' → 'scrypt:32768:8:1'), qui ricostruiti senza calcolare un hash
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = SCRYPT_DEFAULTS
+    elif name == 'pbkdf2':
+        args = [*args, *PBKDF2_DEFAULTS[len(args):]]
+    return ':'.join([name, *map(str, args)])
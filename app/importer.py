@@ -0,0 +1,204 @@
+"""
+Importazione massiva di sessioni di studio da file CSV o JSON
+Il file viene letto in streaming, le materie sono risolte da una mappa nome → id
+caricata una sola volta e le sessioni sono inserite a blocchi (executemany),
+una transazione per blocco.
+
+Campi attesi per ogni riga: subject, topic, duration_minutes, date, notes (opzionale),
+subject_color (opzionale, usato per le materie create dall'importazione)
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from app.repositories import SubjectRepository, StudySessionRepository
+
+
+# Formati data accettati (ISO e formato italiano)
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y')
+
+# Colore esadecimale delle materie (#rrggbb)
+_COLOR = re.compile(r'#[0-9a-fA-F]{6}')
+
+# Dimensione massima (caratteri) di un oggetto JSON: oltre si considera il file malformato
+# invece di accumulare e ridecodificare il resto dell'upload
+MAX_JSON_OBJECT_SIZE = 1024 * 1024
+
+# Numero massimo di errori conservati nel report (gli altri sono solo contati)
+MAX_REPORTED_ERRORS = 200
+
+
+class ImportResult:
+    """Esito di un'importazione: righe importate, materie create ed errori per riga"""
+    
+    def __init__(self):
+        self.imported = 0
+        self.created_subjects = []
+        self.errors = []
+        self.error_count = 0
+    
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(filename):
+    """Determina il formato dall'estensione del file ('csv' o 'json'), None se non supportato"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'csv':
+        return 'csv'
+    if extension in ('json', 'ndjson', 'jsonl'):
+        return 'json'
+    return None
+
+
+def iter_csv_rows(text_stream):
+    """Legge un CSV con intestazione, restituendo coppie (numero_riga, dizionario)"""
+    reader = csv.DictReader(text_stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_json_rows(text_stream, chunk_size=64 * 1024, max_object_size=MAX_JSON_OBJECT_SIZE):
+    """
+    Legge in streaming un array JSON di oggetti oppure un file NDJSON (un oggetto per riga),
+    restituendo coppie (numero_oggetto, dizionario) senza caricare l'intero file.
+    Un oggetto che non si chiude entro max_object_size caratteri solleva ValueError.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    number = 0
+    eof = False
+    
+    while True:
+        # Salta spazi, virgole e le parentesi dell'eventuale array
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        
+        if position >= len(buffer):
+            if eof:
+                return
+            buffer = text_stream.read(chunk_size)
+            position = 0
+            eof = not buffer
+            continue
+        
+        try:
+            obj, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError(f'JSON non valido nell\'oggetto {number + 1}')
+            if len(buffer) - position > max_object_size:
+                raise ValueError(f'JSON non valido nell\'oggetto {number + 1} '
+                                 f'(oltre {max_object_size // 1024} KiB senza chiudersi)')
+            # Oggetto incompleto: si legge un altro blocco
+            chunk = text_stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        
+        number += 1
+        position = end
+        yield number, obj
+
+
+def _parse_date(value):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'data non valida "{value}" (usa AAAA-MM-GG o GG/MM/AAAA)')
+
+
+def _validate_row(row):
+    """Valida una riga: (nome_materia, colore o None, dati_sessione); solleva ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('la riga deve essere un oggetto con i campi della sessione')
+    
+    subject_name = str(row.get('subject') or '').strip()
+    topic = str(row.get('topic') or '').strip()
+    duration = str(row.get('duration_minutes') or '').strip()
+    date_str = str(row.get('date') or '').strip()
+    notes = str(row.get('notes') or '').strip()
+    color = str(row.get('subject_color') or '').strip()
+    
+    if not subject_name or not topic or not duration or not date_str:
+        raise ValueError('campi obbligatori mancanti (subject, topic, duration_minutes, date)')
+    if len(subject_name) > 100:
+        raise ValueError('nome materia troppo lungo (max 100 caratteri)')
+    if len(topic) > 200:
+        raise ValueError('argomento troppo lungo (max 200 caratteri)')
+    
+    try:
+        duration_minutes = int(duration)
+    except ValueError:
+        raise ValueError(f'durata non valida "{duration}"')
+    if duration_minutes <= 0:
+        raise ValueError('la durata deve essere maggiore di 0 minuti')
+    if color and not _COLOR.fullmatch(color):
+        raise ValueError(f'colore non valido "{color}" (formato #rrggbb)')
+    
+    return subject_name, color or None, {
+        'topic': topic,
+        'duration_minutes': duration_minutes,
+        'date': _parse_date(date_str),
+        'notes': notes or None
+    }
+
+
+def import_sessions(user_id, rows, create_subjects=True, batch_size=2000):
+    """
+    Importa le sessioni di un utente da un iterabile di coppie (numero_riga, dizionario)
+    Le righe non valide vengono saltate e riportate nel risultato.
+    """
+    result = ImportResult()
+    subjects = SubjectRepository.name_map(user_id)
+    batch = []
+    
+    try:
+        for line, row in rows:
+            try:
+                subject_name, subject_color, data = _validate_row(row)
+            except ValueError as e:
+                result.add_error(line, str(e))
+                continue
+            
+            subject_id = subjects.get(subject_name.casefold())
+            if subject_id is None:
+                if not create_subjects:
+                    result.add_error(line, f'materia "{subject_name}" inesistente')
+                    continue
+                # Il colore vale solo per le materie nuove: quelle esistenti restano invariate
+                options = {'color': subject_color} if subject_color else {}
+                subject_id = SubjectRepository.create(subject_name, user_id, **options).id
+                subjects[subject_name.casefold()] = subject_id
+                result.created_subjects.append(subject_name)
+            
+            data['subject_id'] = subject_id
+            batch.append(data)
+            
+            if len(batch) >= batch_size:
+                result.imported += StudySessionRepository.bulk_create(user_id, batch)
+                batch = []
+    except (ValueError, csv.Error) as e:
+        # File malformato: si conserva quanto già importato e si segnala l'errore
+        result.add_error(None, str(e))
+    
+    result.imported += StudySessionRepository.bulk_create(user_id, batch)
+    return result
+
+
+def import_file(user_id, binary_stream, file_format, create_subjects=True, batch_size=2000):
+    """Importa da un file binario (upload o file su disco) nel formato indicato"""
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    rows = iter_csv_rows(text_stream) if file_format == 'csv' else iter_json_rows(text_stream)
+    try:
+        return import_sessions(user_id, rows, create_subjects, batch_size)
+    finally:
+        # Il file appartiene al chiamante: si scollega il wrapper senza chiuderlo
+        text_stream.detach()
@@ -0,0 +1,344 @@
+"""
+Strumentazione delle richieste
+- per ogni richiesta: numero di query, tempo totale sul database, query più lenta
+  e tempo di rendering dei template (eventi del motore SQLAlchemy + hook Flask)
+- rilevamento di possibili N+1: la stessa forma di query ripetuta molte volte
+  nella stessa richiesta (es. i caricamenti lazy di subject.study_sessions)
+- istogrammi per endpoint esposti in formato testo Prometheus su /metrics
+- header Server-Timing opzionale (attivo di default in debug)
+
+Le metriche sono tenute in memoria e sono quindi per processo: con più worker
+ogni processo espone le proprie.
+"""
+import hmac
+import re
+import threading
+import time
+from flask import g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+
+# Limiti superiori dei bucket (secondi per i tempi, numero di query per i conteggi)
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+METRICS_PREFIX = 'studyplanner'
+
+# Lunghezza massima del testo SQL riportato nell'etichetta della query più lenta
+SLOWEST_STATEMENT_CHARS = 200
+
+# Liste di parametri "(?, ?, ?)" di lunghezza variabile: una sola forma per ogni IN
+_PARAM_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Forma normalizzata di un'istruzione SQL: parametri e spazi non contano"""
+    return _PARAM_LIST.sub('(?...)', _WHITESPACE.sub(' ', statement).strip())
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class Counter:
+    """Contatore monotono con etichette"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Istogramma cumulativo con etichette (bucket, somma e conteggio)"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, labels, value):
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[-1] += 1
+            self._values[labels] = (counts, total + value)
+    
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((labels, list(counts), total)
+                           for labels, (counts, total) in self._values.items())
+        for labels, counts, total in items:
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                result.append((f'{self.name}_bucket', labels + (('le', bound),), count))
+            result.append((f'{self.name}_sum', labels, total))
+            result.append((f'{self.name}_count', labels, counts[-1]))
+        return result
+
+
+class RequestMetrics:
+    """Misure raccolte durante una singola richiesta"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.render_time = 0.0
+        self.shapes = {}
+        self._render_started = None
+    
+    def add_query(self, statement, elapsed):
+        self.query_count += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+    
+    def repeated_shapes(self, threshold):
+        """Forme di query eseguite almeno `threshold` volte, dalla più ripetuta"""
+        repeated = [(count, shape) for shape, count in self.shapes.items() if count >= threshold]
+        return sorted(repeated, reverse=True)
+
+
+def _current_metrics():
+    if not has_app_context():
+        return None
+    return g.get('_request_metrics')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+class Instrumentation:
+    """Estensione Flask che misura le richieste e ne espone le metriche"""
+    
+    def __init__(self, app=None, db=None):
+        self.nplusone_threshold = 5
+        self.slow_query_seconds = 0.2
+        self.server_timing = False
+        self.metrics_token = None
+        self.metrics_require_token = False
+        self._logger = None
+        self._slowest = {}
+        self._slowest_lock = threading.Lock()
+        self._create_metrics()
+        if app is not None and db is not None:
+            self.init_app(app, db)
+    
+    def _create_metrics(self):
+        self.requests = Counter(
+            f'{METRICS_PREFIX}_requests_total', 'Richieste servite')
+        self.request_duration = Histogram(
+            f'{METRICS_PREFIX}_request_duration_seconds', 'Durata delle richieste', TIME_BUCKETS)
+        self.request_db_time = Histogram(
+            f'{METRICS_PREFIX}_request_db_seconds', 'Tempo speso in query SQL per richiesta',
+            TIME_BUCKETS)
+        self.request_queries = Histogram(
+            f'{METRICS_PREFIX}_request_queries', 'Query SQL eseguite per richiesta', QUERY_BUCKETS)
+        self.request_slowest_query = Histogram(
+            f'{METRICS_PREFIX}_request_slowest_query_seconds',
+            'Durata della query più lenta di ogni richiesta', TIME_BUCKETS)
+        self.request_render_time = Histogram(
+            f'{METRICS_PREFIX}_request_render_seconds', 'Tempo di rendering dei template',
+            TIME_BUCKETS)
+        self.nplusone = Counter(
+            f'{METRICS_PREFIX}_nplusone_suspected_total',
+            'Richieste con la stessa forma di query ripetuta (possibile N+1)')
+        self.slow_queries = Counter(
+            f'{METRICS_PREFIX}_slow_queries_total', 'Query oltre la soglia SQL_SLOW_QUERY_MS')
+        self._metrics = (self.requests, self.request_duration, self.request_db_time,
+                         self.request_queries, self.request_slowest_query,
+                         self.request_render_time, self.nplusone, self.slow_queries)
+    
+    def init_app(self, app, db):
+        """Collega gli eventi di tutti i motori e gli hook delle richieste (dopo db.init_app)"""
+        self.nplusone_threshold = app.config.get('SQL_NPLUSONE_THRESHOLD', 5)
+        self.slow_query_seconds = app.config.get('SQL_SLOW_QUERY_MS', 200) / 1000
+        server_timing = app.config.get('SERVER_TIMING')
+        self.server_timing = app.debug if server_timing is None else server_timing
+        self.metrics_token = app.config.get('METRICS_TOKEN')
+        self.metrics_require_token = app.config.get('METRICS_REQUIRE_TOKEN', False)
+        self._logger = app.logger
+        if not self.metrics_enabled:
+            app.logger.warning('/metrics disattivato: METRICS_TOKEN non impostato')
+        
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                    event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+    
+    # --- Eventi SQL -------------------------------------------------------------
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start_time'].pop()
+        elapsed = time.perf_counter() - started
+        
+        if elapsed >= self.slow_query_seconds:
+            self.slow_queries.inc()
+            self._logger.warning('Query lenta (%.1f ms): %s', elapsed * 1000, statement)
+        
+        metrics = _current_metrics()
+        if metrics is not None:
+            metrics.add_query(statement, elapsed)
+    
+    # --- Template ---------------------------------------------------------------
+    
+    def _before_render(self, sender, template, context, **extra):
+        metrics = _current_metrics()
+        if metrics is not None:
+            metrics._render_started = time.perf_counter()
+    
+    def _after_render(self, sender, template, context, **extra):
+        metrics = _current_metrics()
+        if metrics is not None and metrics._render_started is not None:
+            metrics.render_time += time.perf_counter() - metrics._render_started
+            metrics._render_started = None
+    
+    # --- Richieste --------------------------------------------------------------
+    
+    def _before_request(self):
+        g._request_metrics = RequestMetrics()
+    
+    def _after_request(self, response):
+        """
+        Registra le misure della richiesta
+        Per le risposte in streaming vengono contate solo le query eseguite prima
+        dell'invio del corpo.
+        """
+        metrics = g.pop('_request_metrics', None)
+        if metrics is None:
+            return response
+        
+        elapsed = time.perf_counter() - metrics.started
+        endpoint = request.endpoint or 'unknown'
+        labels = (('endpoint', endpoint), ('method', request.method))
+        
+        self.requests.inc(labels + (('status', response.status_code),))
+        self.request_duration.observe(labels, elapsed)
+        self.request_db_time.observe(labels, metrics.db_time)
+        self.request_queries.observe(labels, metrics.query_count)
+        self.request_slowest_query.observe(labels, metrics.slowest_time)
+        self.request_render_time.observe(labels, metrics.render_time)
+        
+        if metrics.slowest_statement is not None:
+            self._record_slowest(endpoint, metrics.slowest_time, metrics.slowest_statement)
+        
+        repeated = metrics.repeated_shapes(self.nplusone_threshold)
+        if repeated:
+            self.nplusone.inc(labels)
+            count, shape = repeated[0]
+            self._logger.warning('Possibile N+1 in %s: %d query con la stessa forma: %s',
+                                 endpoint, count, shape)
+        
+        if self.server_timing:
+            response.headers['Server-Timing'] = self._server_timing(metrics, elapsed, repeated)
+        
+        return response
+    
+    def _record_slowest(self, endpoint, elapsed, statement):
+        """Conserva la query più lenta mai vista per ogni endpoint"""
+        with self._slowest_lock:
+            current = self._slowest.get(endpoint)
+            if current is None or elapsed > current[0]:
+                shape = statement_shape(statement)[:SLOWEST_STATEMENT_CHARS]
+                self._slowest[endpoint] = (elapsed, shape)
+    
+    @staticmethod
+    def _server_timing(metrics, elapsed, repeated):
+        entries = [
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.query_count} query"',
+            f'db-slowest;dur={metrics.slowest_time * 1000:.2f}',
+            f'render;dur={metrics.render_time * 1000:.2f}',
+            f'total;dur={elapsed * 1000:.2f}'
+        ]
+        if repeated:
+            entries.append(f'nplusone;desc="{repeated[0][0]} query ripetute"')
+        return ', '.join(entries)
+    
+    # --- Esposizione ------------------------------------------------------------
+    
+    @property
+    def metrics_enabled(self):
+        """False se la configurazione richiede un token (produzione) e non ne è impostato uno"""
+        return bool(self.metrics_token) or not self.metrics_require_token
+    
+    def metrics_allowed(self, req):
+        """Con METRICS_TOKEN impostato /metrics richiede "Authorization: Bearer <token>" """
+        if not self.metrics_token:
+            return self.metrics_enabled
+        return hmac.compare_digest(req.headers.get('Authorization', ''), f'Bearer {self.metrics_token}')
+    
+    def render_metrics(self, cache_stats=None):
+        """Tutte le metriche in formato testo Prometheus (versione 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        
+        name = f'{METRICS_PREFIX}_endpoint_slowest_query_seconds'
+        lines.append(f'# HELP {name} Query più lenta osservata per endpoint')
+        lines.append(f'# TYPE {name} gauge')
+        with self._slowest_lock:
+            slowest = sorted(self._slowest.items())
+        for endpoint, (elapsed, statement) in slowest:
+            labels = (('endpoint', endpoint), ('statement', statement))
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(elapsed)}')
+        
+        if cache_stats is not None:
+            backend = (('backend', cache_stats['backend']),)
+            for key in ('hits', 'misses', 'sets'):
+                name = f'{METRICS_PREFIX}_cache_{key}_total'
+                lines.append(f'# HELP {name} Cache applicativa: {key}')
+                lines.append(f'# TYPE {name} counter')
+                lines.append(f'{name}{_format_labels(backend)} {cache_stats[key]}')
+            if 'entries' in cache_stats:
+                name = f'{METRICS_PREFIX}_cache_entries'
+                lines.append(f'# HELP {name} Cache applicativa: elementi memorizzati')
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name}{_format_labels(backend)} {cache_stats["entries"]}')
+        
+        return '\n'.join(lines) + '\n'
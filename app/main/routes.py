@@ -1,8 +1,25 @@
-from flask import render_template, redirect, url_for, flash, session, request
-from datetime import datetime
+from flask import render_template, redirect, url_for, flash, session, request, current_app, jsonify, \
+    Response, stream_with_context, abort
+from datetime import datetime, date, timedelta
+from app import analytics, cache, instrumentation, planner, transactions
+from app.exporter import EXPORT_FORMATS, generate_export
+from app.importer import detect_format, import_file
+from app.streaming import stream_page
+from app.transactions import transactional
 from app.main import main_bp
 from app.auth.routes import login_required
-from app.repositories import StudySessionRepository, SubjectRepository
+from markupsafe import Markup, escape
+from app.repositories import StudySessionRepository, SubjectRepository, StatsRepository, \
+    SearchRepository, GoalRepository, PlannerRepository, GroupRepository, LeaderboardRepository, \
+    TREND_GRANULARITIES, GOAL_PERIODS, LEADERBOARD_PERIODS, SEARCH_MARK_START, SEARCH_MARK_END, \
+    leaderboard_start
+
+MONTHS_LABELS = ['Gen', 'Feb', 'Mar', 'Apr', 'Mag', 'Giu', 
+                 'Lug', 'Ago', 'Set', 'Ott', 'Nov', 'Dic']
+
+GOAL_PERIOD_LABELS = {'week': 'Settimanale', 'month': 'Mensile'}
+
+LEADERBOARD_PERIOD_LABELS = {'week': 'Settimana', 'all': 'Sempre'}
 
 
 @main_bp.route('/')
@@ -18,55 +35,240 @@ def index():
 def dashboard():
     """Dashboard principale con statistiche"""
     user_id = session['user_id']
+    user_stats = StatsRepository.get_user_stats(user_id)
     
-    # Statistiche generali
-    total_sessions = StudySessionRepository.count_by_user(user_id)
-    total_hours = StudySessionRepository.total_hours_by_user(user_id)
-    total_subjects = SubjectRepository.count_by_user(user_id)
+    # La chiave include la versione dei dati: ogni modifica dell'utente la invalida
+    today = datetime.utcnow().date()
+    cache_key = f'dashboard:{user_id}:v{user_stats.version}:{today.isoformat()}'
+    context = cache.get(cache_key)
+    if context is None:
+        context = _build_dashboard_context(user_id, user_stats, today)
+        cache.set(cache_key, context)
     
-    # Statistiche per materia (LIVELLO 3 - GROUP BY)
-    subject_stats = StudySessionRepository.total_hours_by_subject(user_id)
+    return render_template('main/dashboard.html', **context)
+
+
+def _build_dashboard_context(user_id, user_stats, today):
+    """Calcola i dati della dashboard (solo tipi semplici, così sono memorizzabili in cache)"""
+    current_year = today.year
+    # Statistiche per materia (dal riepilogo per utente e materia)
+    subject_stats = StatsRepository.subject_stats(user_id)
     
     # Sessioni recenti
-    recent_sessions = StudySessionRepository.get_recent_sessions(user_id, days=7)
+    recent_sessions = StudySessionRepository.recent_sessions_summary(user_id, days=7, limit=5)
+    
+    # Trend mensile (dal riepilogo per utente e mese)
+    monthly_trend = StatsRepository.monthly_trend(user_id, current_year)
     
-    # Trend mensile
-    current_year = datetime.utcnow().year
-    monthly_trend = StudySessionRepository.study_trend_by_month(user_id, current_year)
+    # Avanzamento degli obiettivi (dai contatori per settimana e mese)
+    goals = GoalRepository.progress(user_id, today)
     
     # Prepara dati per il grafico (tutti i 12 mesi)
-    months_labels = ['Gen', 'Feb', 'Mar', 'Apr', 'Mag', 'Giu', 
-                     'Lug', 'Ago', 'Set', 'Ott', 'Nov', 'Dic']
+    months_labels = MONTHS_LABELS
     monthly_hours = [0] * 12
     for item in monthly_trend:
         monthly_hours[item['month'] - 1] = item['total_hours']
     
-    return render_template('main/dashboard.html',
-                         total_sessions=total_sessions,
-                         total_hours=total_hours,
-                         total_subjects=total_subjects,
-                         subject_stats=subject_stats,
-                         recent_sessions=recent_sessions,
-                         months_labels=months_labels,
-                         monthly_hours=monthly_hours,
-                         current_year=current_year)
+    return {
+        'total_sessions': user_stats.session_count,
+        'total_hours': user_stats.total_hours,
+        'total_subjects': user_stats.subject_count,
+        'subject_stats': subject_stats,
+        'recent_sessions': recent_sessions,
+        'months_labels': months_labels,
+        'monthly_hours': monthly_hours,
+        'current_year': current_year,
+        'goals': goals,
+        'goal_period_labels': GOAL_PERIOD_LABELS
+    }
+
+
+@main_bp.route('/dashboard/trend')
+@login_required
+def dashboard_trend():
+    """
+    Dati del grafico trend in JSON, per cambiare anno o granularità senza ricaricare la pagina
+    Parametri: granularity (day, week, month, year), year oppure start/end (YYYY-MM-DD)
+    """
+    user_id = session['user_id']
+    granularity = request.args.get('granularity', 'month')
+    if granularity not in TREND_GRANULARITIES:
+        return jsonify(error=f'Granularità non valida: {granularity}'), 400
+    
+    year = request.args.get('year', type=int) or datetime.utcnow().year
+    start = _parse_date_arg('start') or date(year, 1, 1)
+    end = _parse_date_arg('end') or date(year, 12, 31)
+    if start > end:
+        return jsonify(error='La data di inizio deve precedere quella di fine'), 400
+    
+    max_days = current_app.config['TREND_MAX_DAYS'][granularity]
+    if (end - start).days > max_days:
+        return jsonify(error=f'Intervallo troppo ampio per la granularità {granularity}'), 400
+    
+    user_stats = StatsRepository.get_user_stats(user_id)
+    cache_key = f'trend:{user_id}:v{user_stats.version}:{granularity}:{start}:{end}'
+    data = cache.get(cache_key)
+    if data is None:
+        buckets = StudySessionRepository.study_trend(user_id, start, end, granularity)
+        data = {
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'labels': [_trend_label(b['start'], granularity, start.year != end.year)
+                       for b in buckets],
+            'hours': [b['total_hours'] for b in buckets],
+            'sessions': [b['session_count'] for b in buckets]
+        }
+        cache.set(cache_key, data)
+    
+    return jsonify(data)
+
+
+def _trend_label(bucket_start, granularity, multi_year):
+    """Etichetta leggibile per un intervallo del grafico trend"""
+    if granularity == 'year':
+        return str(bucket_start.year)
+    if granularity == 'month':
+        label = MONTHS_LABELS[bucket_start.month - 1]
+        return f'{label} {bucket_start.year}' if multi_year else label
+    return bucket_start.strftime('%d/%m/%Y' if multi_year else '%d/%m')
+
+
+@main_bp.route('/analytics')
+@login_required
+def analytics_page():
+    """
+    Statistiche avanzate: serie di giorni consecutivi, mappa settimanale, medie mobili,
+    distribuzione delle durate e ritmo verso l'esame
+    Parametri opzionali: exam_date (YYYY-MM-DD) e target_hours
+    """
+    user_id = session['user_id']
+    user_stats = StatsRepository.get_user_stats(user_id)
+    today = datetime.utcnow().date()
+    
+    exam_date = _parse_date_arg('exam_date') or _configured_exam_date(today)
+    target_hours = request.args.get('target_hours', type=int)
+    if not target_hours or target_hours <= 0:
+        target_hours = current_app.config['EXAM_TARGET_HOURS']
+    
+    # Serie e medie mobili dipendono anche dal giorno corrente
+    cache_key = f'analytics:{user_id}:v{user_stats.version}:{today}:{exam_date}:{target_hours}'
+    context = cache.get(cache_key)
+    if context is None:
+        context = analytics.compute(user_id, today, exam_date, target_hours,
+                                    current_app.config['ANALYTICS_CHART_DAYS'])
+        cache.set(cache_key, context)
+    
+    return render_template('main/analytics.html', **context)
+
+
+def _configured_exam_date(today):
+    """Data dell'esame da EXAM_DATE, oppure quella predefinita"""
+    configured = current_app.config.get('EXAM_DATE')
+    if configured:
+        return datetime.strptime(configured, '%Y-%m-%d').date()
+    return analytics.default_exam_date(today)
+
+
+@main_bp.route('/stats/cache')
+@login_required
+def cache_stats():
+    """Contatori hit/miss della cache applicativa (per il monitoraggio)"""
+    return jsonify(cache.stats())
+
+
+@main_bp.route('/metrics')
+def metrics():
+    """Metriche di richieste, SQL, rendering e cache in formato testo Prometheus"""
+    if not instrumentation.metrics_enabled:
+        abort(404)
+    if not instrumentation.metrics_allowed(request):
+        return Response('Non autorizzato\n', status=401, mimetype='text/plain')
+    return Response(instrumentation.render_metrics(cache.stats()),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 
 @main_bp.route('/sessions')
 @login_required
 def sessions_list():
-    """Lista di tutte le sessioni di studio"""
+    """Lista paginata delle sessioni di studio, con filtri per materia e periodo"""
     user_id = session['user_id']
-    sessions = StudySessionRepository.find_all_by_user(user_id)
     subjects = SubjectRepository.find_all_by_user(user_id)
     
-    return render_template('main/sessions_list.html', 
+    subject_id = request.args.get('subject_id', type=int)
+    date_from = _parse_date_arg('date_from')
+    date_to = _parse_date_arg('date_to')
+    cursor = request.args.get('cursor') or None
+    
+    try:
+        sessions, next_cursor = StudySessionRepository.find_page_by_user(
+            user_id,
+            per_page=current_app.config['SESSIONS_PER_PAGE'],
+            cursor=cursor,
+            subject_id=subject_id,
+            date_from=date_from,
+            date_to=date_to,
+            rows=True
+        )
+    except ValueError:
+        # Cursore manomesso o scaduto: si riparte dalla prima pagina
+        return redirect(url_for('main.sessions_list', subject_id=subject_id,
+                                date_from=request.args.get('date_from'),
+                                date_to=request.args.get('date_to')))
+    
+    filters = {
+        'subject_id': subject_id,
+        'date_from': date_from.isoformat() if date_from else None,
+        'date_to': date_to.isoformat() if date_to else None
+    }
+    
+    return stream_page('main/sessions_list.html',
                          sessions=sessions,
-                         subjects=subjects)
+                         subjects=subjects,
+                         filters=filters,
+                         is_first_page=cursor is None,
+                         next_cursor=next_cursor)
+
+
+@main_bp.route('/sessions/search')
+@login_required
+def sessions_search():
+    """Ricerca full-text in argomento e note delle sessioni, risultati per rilevanza"""
+    user_id = session['user_id']
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    results, has_next = [], False
+    if query:
+        results, has_next = SearchRepository.search(
+            user_id, query, page=page, per_page=current_app.config['SESSIONS_PER_PAGE'])
+    
+    return render_template('main/sessions_search.html',
+                         query=query,
+                         results=results,
+                         page=page,
+                         has_next=has_next)
+
+
+@main_bp.app_template_filter('highlight')
+def highlight_filter(value):
+    """Escape del testo e <mark> sui termini trovati dalla ricerca"""
+    escaped = str(escape(value or ''))
+    return Markup(escaped.replace(SEARCH_MARK_START, '<mark>').replace(SEARCH_MARK_END, '</mark>'))
+
+
+def _parse_date_arg(name):
+    """Legge un parametro data (YYYY-MM-DD) dalla query string, None se assente o non valido"""
+    value = request.args.get(name, '')
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
 
 
 @main_bp.route('/sessions/new', methods=['GET', 'POST'])
 @login_required
+@transactional
 def session_create():
     """Crea una nuova sessione di studio"""
     user_id = session['user_id']
@@ -127,8 +329,10 @@ def session_create():
             flash('Sessione di studio creata con successo!', 'success')
             return redirect(url_for('main.sessions_list'))
         except ValueError as ve:
+            transactions.rollback()
             flash(f'Data non valida: {str(ve)}', 'danger')
         except Exception as e:
+            transactions.rollback()
             flash(f'Errore durante la creazione della sessione: {str(e)}', 'danger')
     
     return render_template('main/session_form.html', 
@@ -137,8 +341,58 @@ def session_create():
                          today=datetime.utcnow().date())
 
 
+@main_bp.route('/sessions/import', methods=['GET', 'POST'])
+@login_required
+def sessions_import():
+    """Importazione massiva di sessioni da file CSV o JSON"""
+    user_id = session['user_id']
+    result = None
+    
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Seleziona un file da importare.', 'danger')
+            return render_template('main/session_import.html', result=None)
+        
+        file_format = detect_format(upload.filename)
+        if not file_format:
+            flash('Formato non supportato: usa un file .csv, .json o .ndjson.', 'danger')
+            return render_template('main/session_import.html', result=None)
+        
+        result = import_file(user_id, upload.stream, file_format,
+                             create_subjects=bool(request.form.get('create_subjects')),
+                             batch_size=current_app.config['IMPORT_BATCH_SIZE'])
+        
+        if result.imported:
+            flash(f'Importate {result.imported} sessioni di studio.', 'success')
+        if result.error_count:
+            flash(f'{result.error_count} righe non importate: controlla il dettaglio degli errori.',
+                  'warning')
+    
+    return render_template('main/session_import.html', result=result)
+
+
+@main_bp.route('/sessions/export')
+@login_required
+def sessions_export():
+    """Esportazione in streaming di tutte le sessioni (CSV o NDJSON) per backup"""
+    user_id = session['user_id']
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        flash('Formato di esportazione non supportato.', 'danger')
+        return redirect(url_for('main.sessions_list'))
+    
+    filename = f'sessioni-{datetime.utcnow().date().isoformat()}.{export_format}'
+    return Response(
+        stream_with_context(generate_export(user_id, export_format)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
 @main_bp.route('/sessions/<int:session_id>/edit', methods=['GET', 'POST'])
 @login_required
+@transactional
 def session_edit(session_id):
     """Modifica una sessione di studio"""
     user_id = session['user_id']
@@ -191,8 +445,10 @@ def session_edit(session_id):
             flash('Sessione aggiornata con successo!', 'success')
             return redirect(url_for('main.sessions_list'))
         except ValueError:
+            transactions.rollback()
             flash('Data non valida.', 'danger')
         except Exception as e:
+            transactions.rollback()
             flash('Errore durante l\'aggiornamento della sessione.', 'danger')
     
     return render_template('main/session_form.html', 
@@ -203,6 +459,7 @@ def session_edit(session_id):
 
 @main_bp.route('/sessions/<int:session_id>/delete', methods=['POST'])
 @login_required
+@transactional
 def session_delete(session_id):
     """Elimina una sessione di studio"""
     user_id = session['user_id']
@@ -216,6 +473,7 @@ def session_delete(session_id):
         StudySessionRepository.delete(study_session)
         flash('Sessione eliminata con successo.', 'success')
     except Exception as e:
+        transactions.rollback()
         flash('Errore durante l\'eliminazione della sessione.', 'danger')
     
     return redirect(url_for('main.sessions_list'))
@@ -224,15 +482,16 @@ def session_delete(session_id):
 @main_bp.route('/subjects')
 @login_required
 def subjects_list():
-    """Lista di tutte le materie"""
+    """Lista di tutte le materie con i relativi totali"""
     user_id = session['user_id']
-    subjects = SubjectRepository.find_all_by_user(user_id)
+    subject_stats = SubjectRepository.find_all_with_stats(user_id)
     
-    return render_template('main/subjects_list.html', subjects=subjects)
+    return render_template('main/subjects_list.html', subject_stats=subject_stats)
 
 
 @main_bp.route('/subjects/new', methods=['GET', 'POST'])
 @login_required
+@transactional
 def subject_create():
     """Crea una nuova materia"""
     user_id = session['user_id']
@@ -257,6 +516,7 @@ def subject_create():
             flash('Materia creata con successo!', 'success')
             return redirect(url_for('main.subjects_list'))
         except Exception as e:
+            transactions.rollback()
             flash('Errore durante la creazione della materia.', 'danger')
     
     return render_template('main/subject_form.html', subject=None)
@@ -264,6 +524,7 @@ def subject_create():
 
 @main_bp.route('/subjects/<int:subject_id>/edit', methods=['GET', 'POST'])
 @login_required
+@transactional
 def subject_edit(subject_id):
     """Modifica una materia"""
     user_id = session['user_id']
@@ -293,6 +554,7 @@ def subject_edit(subject_id):
             flash('Materia aggiornata con successo!', 'success')
             return redirect(url_for('main.subjects_list'))
         except Exception as e:
+            transactions.rollback()
             flash('Errore durante l\'aggiornamento della materia.', 'danger')
     
     return render_template('main/subject_form.html', subject=subject)
@@ -313,11 +575,376 @@ def subject_delete(subject_id):
         SubjectRepository.delete(subject)
         flash('Materia eliminata con successo.', 'success')
     except Exception as e:
+        transactions.rollback()
         flash('Errore durante l\'eliminazione della materia.', 'danger')
     
     return redirect(url_for('main.subjects_list'))
 
 
+@main_bp.route('/goals')
+@login_required
+def goals_list():
+    """Obiettivi di studio con l'avanzamento nel periodo in corso"""
+    user_id = session['user_id']
+    goals = GoalRepository.progress(user_id, datetime.utcnow().date())
+    subjects = SubjectRepository.find_all_by_user(user_id)
+    
+    return render_template('main/goals.html', goals=goals, subjects=subjects,
+                           period_labels=GOAL_PERIOD_LABELS)
+
+
+def _parse_goal_hours():
+    """Ore obiettivo dal form convertite in minuti (None se non valide)"""
+    try:
+        hours = float(request.form.get('target_hours', '').replace(',', '.'))
+    except ValueError:
+        return None
+    minutes = int(round(hours * 60))
+    return minutes if minutes > 0 else None
+
+
+@main_bp.route('/goals/new', methods=['POST'])
+@login_required
+@transactional
+def goal_create():
+    """Crea un obiettivo settimanale o mensile"""
+    user_id = session['user_id']
+    period = request.form.get('period')
+    subject_id = request.form.get('subject_id', type=int)
+    target_minutes = _parse_goal_hours()
+    
+    # Validazione
+    if period not in GOAL_PERIODS:
+        flash('Periodo non valido.', 'danger')
+    elif not target_minutes:
+        flash('Le ore obiettivo devono essere un numero positivo.', 'danger')
+    elif subject_id and not SubjectRepository.find_by_id(subject_id, user_id):
+        flash('Materia non valida.', 'danger')
+    elif GoalRepository.exists(user_id, period, subject_id or None):
+        flash('Esiste già un obiettivo per questo periodo e materia.', 'warning')
+    else:
+        try:
+            GoalRepository.create(user_id, period, target_minutes, subject_id or None)
+            flash('Obiettivo creato con successo!', 'success')
+        except Exception as e:
+            transactions.rollback()
+            flash('Errore durante la creazione dell\'obiettivo.', 'danger')
+    
+    return redirect(url_for('main.goals_list'))
+
+
+@main_bp.route('/goals/<int:goal_id>/edit', methods=['POST'])
+@login_required
+@transactional
+def goal_edit(goal_id):
+    """Modifica le ore di un obiettivo"""
+    user_id = session['user_id']
+    goal = GoalRepository.find_by_id(goal_id, user_id)
+    
+    if not goal:
+        flash('Obiettivo non trovato.', 'danger')
+        return redirect(url_for('main.goals_list'))
+    
+    target_minutes = _parse_goal_hours()
+    if not target_minutes:
+        flash('Le ore obiettivo devono essere un numero positivo.', 'danger')
+        return redirect(url_for('main.goals_list'))
+    
+    try:
+        GoalRepository.update(goal, target_minutes)
+        flash('Obiettivo aggiornato con successo!', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'aggiornamento dell\'obiettivo.', 'danger')
+    
+    return redirect(url_for('main.goals_list'))
+
+
+@main_bp.route('/goals/<int:goal_id>/delete', methods=['POST'])
+@login_required
+@transactional
+def goal_delete(goal_id):
+    """Elimina un obiettivo"""
+    user_id = session['user_id']
+    goal = GoalRepository.find_by_id(goal_id, user_id)
+    
+    if not goal:
+        flash('Obiettivo non trovato.', 'danger')
+        return redirect(url_for('main.goals_list'))
+    
+    try:
+        GoalRepository.delete(goal)
+        flash('Obiettivo eliminato con successo.', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'eliminazione dell\'obiettivo.', 'danger')
+    
+    return redirect(url_for('main.goals_list'))
+
+
+@main_bp.route('/calendar')
+@login_required
+def calendar_page():
+    """
+    Calendario mensile o settimanale con le ore svolte e pianificate per giorno e materia
+    Parametri: view (month, week), date (YYYY-MM-DD, giorno da mostrare)
+    """
+    user_id = session['user_id']
+    subjects = SubjectRepository.find_all_by_user(user_id)
+    return render_template('main/calendar.html', calendar=_calendar_data(user_id),
+                           subjects=subjects)
+
+
+@main_bp.route('/calendar/data')
+@login_required
+def calendar_data():
+    """Dati del calendario in JSON, per cambiare mese o settimana senza ricaricare la pagina"""
+    return jsonify(_calendar_data(session['user_id']))
+
+
+def _calendar_data(user_id):
+    """Vista richiesta del calendario, dalla cache se i dati dell'utente non sono cambiati"""
+    today = datetime.utcnow().date()
+    view = request.args.get('view', 'month')
+    if view not in planner.CALENDAR_VIEWS:
+        view = 'month'
+    anchor = planner.normalize_anchor(view, _parse_date_arg('date') or today)
+    
+    user_stats = StatsRepository.get_user_stats(user_id)
+    cache_key = f'calendar:{user_id}:v{user_stats.version}:{view}:{anchor}:{today}'
+    data = cache.get(cache_key)
+    if data is None:
+        data = planner.build(user_id, view, anchor, today)
+        cache.set(cache_key, data)
+    return data
+
+
+@main_bp.route('/calendar/day/<day>')
+@login_required
+def calendar_day(day):
+    """Sessioni svolte e pianificate di un giorno (JSON)"""
+    try:
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    except ValueError:
+        transactions.rollback()
+        return jsonify(error='Data non valida'), 400
+    
+    sessions, plans = PlannerRepository.find_by_day(session['user_id'], day)
+    return jsonify(date=day.isoformat(), sessions=sessions, plans=plans)
+
+
+@main_bp.route('/calendar/plans', methods=['POST'])
+@login_required
+@transactional
+def plan_create():
+    """Pianifica una sessione di studio"""
+    user_id = session['user_id']
+    topic = request.form.get('topic', '').strip()
+    duration = request.form.get('duration_minutes', type=int)
+    subject_id = request.form.get('subject_id', type=int)
+    try:
+        day = datetime.strptime(request.form.get('date', ''), '%Y-%m-%d').date()
+    except ValueError:
+        day = None
+    
+    # Validazione
+    if not topic or not duration or duration <= 0 or not day:
+        flash('Compila argomento, data e durata (in minuti positivi).', 'danger')
+    elif not subject_id or not SubjectRepository.find_by_id(subject_id, user_id):
+        flash('Materia non valida.', 'danger')
+    else:
+        try:
+            PlannerRepository.create(user_id, subject_id, day, duration, topic)
+            flash('Sessione pianificata!', 'success')
+        except Exception as e:
+            transactions.rollback()
+            flash('Errore durante la pianificazione della sessione.', 'danger')
+    
+    return redirect(url_for('main.calendar_page', date=request.form.get('date') or None))
+
+
+@main_bp.route('/calendar/plans/<int:plan_id>/complete', methods=['POST'])
+@login_required
+@transactional
+def plan_complete(plan_id):
+    """Registra come svolta una sessione pianificata (oggi, se era prevista per il futuro)"""
+    user_id = session['user_id']
+    plan = PlannerRepository.find_by_id(plan_id, user_id)
+    
+    if not plan:
+        flash('Sessione pianificata non trovata.', 'danger')
+        return redirect(url_for('main.calendar_page'))
+    
+    day = min(plan.date, datetime.utcnow().date())
+    try:
+        PlannerRepository.complete(plan, day)
+        flash('Sessione registrata come svolta!', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante la registrazione della sessione.', 'danger')
+    
+    return redirect(url_for('main.calendar_page', date=day.isoformat()))
+
+
+@main_bp.route('/calendar/plans/<int:plan_id>/delete', methods=['POST'])
+@login_required
+@transactional
+def plan_delete(plan_id):
+    """Elimina una sessione pianificata"""
+    user_id = session['user_id']
+    plan = PlannerRepository.find_by_id(plan_id, user_id)
+    
+    if not plan:
+        flash('Sessione pianificata non trovata.', 'danger')
+        return redirect(url_for('main.calendar_page'))
+    
+    day = plan.date
+    try:
+        PlannerRepository.delete(plan)
+        flash('Sessione pianificata eliminata.', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'eliminazione della sessione pianificata.', 'danger')
+    
+    return redirect(url_for('main.calendar_page', date=day.isoformat()))
+
+
+@main_bp.route('/groups')
+@login_required
+def groups_list():
+    """Gruppi di studio dell'utente, con i moduli per crearne uno o entrare con un codice"""
+    groups = GroupRepository.find_all_by_user(session['user_id'])
+    return render_template('main/groups.html', groups=groups)
+
+
+@main_bp.route('/groups/new', methods=['POST'])
+@login_required
+@transactional
+def group_create():
+    """Crea un gruppo di studio"""
+    name = request.form.get('name', '').strip()
+    
+    # Validazione
+    if not name or len(name) > 100:
+        flash('Il nome del gruppo è obbligatorio (massimo 100 caratteri).', 'danger')
+        return redirect(url_for('main.groups_list'))
+    
+    try:
+        group = GroupRepository.create(name, session['user_id'])
+        flash(f'Gruppo creato! Condividi il codice {group.invite_code} con i compagni.', 'success')
+        return redirect(url_for('main.group_detail', group_id=group.id))
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante la creazione del gruppo.', 'danger')
+        return redirect(url_for('main.groups_list'))
+
+
+@main_bp.route('/groups/join', methods=['POST'])
+@login_required
+@transactional
+def group_join():
+    """Entra in un gruppo con il codice d'invito"""
+    user_id = session['user_id']
+    group = GroupRepository.find_by_invite_code(request.form.get('invite_code', '').strip())
+    
+    if not group:
+        flash('Codice d\'invito non valido.', 'danger')
+        return redirect(url_for('main.groups_list'))
+    if GroupRepository.is_member(group.id, user_id):
+        flash('Fai già parte di questo gruppo.', 'info')
+        return redirect(url_for('main.group_detail', group_id=group.id))
+    
+    try:
+        GroupRepository.join(group, user_id)
+        flash(f'Sei entrato nel gruppo {group.name}!', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'ingresso nel gruppo.', 'danger')
+        return redirect(url_for('main.groups_list'))
+    
+    return redirect(url_for('main.group_detail', group_id=group.id))
+
+
+@main_bp.route('/groups/<int:group_id>')
+@login_required
+def group_detail(group_id):
+    """
+    Classifica del gruppo per ore di studio
+    Parametri: period (week, all), date (YYYY-MM-DD, giorno della settimana da mostrare)
+    """
+    user_id = session['user_id']
+    group = GroupRepository.find_by_id(group_id, user_id)
+    
+    if not group:
+        flash('Gruppo non trovato.', 'danger')
+        return redirect(url_for('main.groups_list'))
+    
+    period = request.args.get('period', 'week')
+    if period not in LEADERBOARD_PERIODS:
+        period = 'week'
+    today = datetime.utcnow().date()
+    start = leaderboard_start(_parse_date_arg('date') or today, period)
+    
+    leaderboard = LeaderboardRepository.top(group.id, period, start,
+                                            current_app.config['LEADERBOARD_SIZE'])
+    return render_template('main/group_detail.html',
+                           group=group,
+                           period=period,
+                           period_labels=LEADERBOARD_PERIOD_LABELS,
+                           start=start,
+                           end=start + timedelta(days=6),
+                           previous_week=start - timedelta(days=7),
+                           next_week=start + timedelta(days=7),
+                           current_week=leaderboard_start(today, 'week'),
+                           leaderboard=leaderboard,
+                           my_rank=LeaderboardRepository.rank(group.id, period, start, user_id),
+                           member_count=GroupRepository.member_count(group.id))
+
+
+@main_bp.route('/groups/<int:group_id>/leave', methods=['POST'])
+@login_required
+@transactional
+def group_leave(group_id):
+    """Esce da un gruppo di studio"""
+    user_id = session['user_id']
+    group = GroupRepository.find_by_id(group_id, user_id)
+    
+    if not group:
+        flash('Gruppo non trovato.', 'danger')
+        return redirect(url_for('main.groups_list'))
+    
+    try:
+        GroupRepository.leave(group, user_id)
+        flash('Sei uscito dal gruppo.', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'uscita dal gruppo.', 'danger')
+    
+    return redirect(url_for('main.groups_list'))
+
+
+@main_bp.route('/groups/<int:group_id>/delete', methods=['POST'])
+@login_required
+@transactional
+def group_delete(group_id):
+    """Elimina un gruppo (solo il proprietario)"""
+    user_id = session['user_id']
+    group = GroupRepository.find_by_id(group_id, user_id)
+    
+    if not group or group.owner_id != user_id:
+        flash('Gruppo non trovato.', 'danger')
+        return redirect(url_for('main.groups_list'))
+    
+    try:
+        GroupRepository.delete(group)
+        flash('Gruppo eliminato con successo.', 'success')
+    except Exception as e:
+        transactions.rollback()
+        flash('Errore durante l\'eliminazione del gruppo.', 'danger')
+    
+    return redirect(url_for('main.groups_list'))
+
+
 @main_bp.route('/subjects/<int:subject_id>')
 @login_required
 def subject_detail(subject_id):
@@ -329,14 +956,15 @@ def subject_detail(subject_id):
         flash('Materia non trovata.', 'danger')
         return redirect(url_for('main.subjects_list'))
     
-    sessions = StudySessionRepository.find_by_subject(subject_id, user_id)
-    
-    # Calcola il totale ore per questa materia
-    total_minutes = sum(s.duration_minutes for s in sessions)
+    # Totali calcolati in SQL con una query aggregata
+    session_count, total_minutes = StudySessionRepository.totals_by_subject(subject_id, user_id)
     total_hours = round(total_minutes / 60, 2)
     
-    return render_template('main/subject_detail.html',
+    # Le righe sono lette a blocchi mentre la pagina viene inviata
+    sessions = StudySessionRepository.iter_rows_by_subject(subject_id, user_id)
+    
+    return stream_page('main/subject_detail.html',
                          subject=subject,
                          sessions=sessions,
                          total_hours=total_hours,
-                         session_count=len(sessions))
+                         session_count=session_count)
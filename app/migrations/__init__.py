@@ -0,0 +1,139 @@
+"""
+Migrazioni dello schema versionate
+Ogni file in app/migrations/versions si chiama NNNN_descrizione.py e definisce
+upgrade(connection). Le migrazioni che ricostruiscono tabelle referenziate da
+chiavi esterne dichiarano DISABLE_FOREIGN_KEYS = True: il runner disattiva i
+vincoli per la durata della migrazione e verifica l'integrità prima del commit.
+Le versioni applicate sono registrate nella tabella
+schema_migrations; il runner viene invocato esplicitamente (`flask db upgrade`)
+al deploy, mai dalla application factory.
+"""
+import importlib
+import pkgutil
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+
+VERSIONS_PACKAGE = 'app.migrations.versions'
+
+
+class Migration:
+    """Una migrazione: numero di versione, nome e modulo con la funzione upgrade"""
+    
+    def __init__(self, version, name, module):
+        self.version = version
+        self.name = name
+        self.module = module
+    
+    @property
+    def description(self):
+        """Prima riga della docstring del modulo"""
+        return (self.module.__doc__ or '').strip().split('\n')[0]
+    
+    def __repr__(self):
+        return f'<Migration {self.version:04d} {self.name}>'
+
+
+def run_statements(connection, statements):
+    """Esegue in ordine una lista di istruzioni SQL"""
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+
+
+def discover():
+    """Trova tutte le migrazioni disponibili, ordinate per versione"""
+    package = importlib.import_module(VERSIONS_PACKAGE)
+    migrations = []
+    for info in pkgutil.iter_modules(package.__path__):
+        prefix, _, name = info.name.partition('_')
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f'{VERSIONS_PACKAGE}.{info.name}')
+        migrations.append(Migration(int(prefix), name, module))
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            'CREATE TABLE IF NOT EXISTS schema_migrations ('
+            'version INTEGER NOT NULL PRIMARY KEY, '
+            'name VARCHAR(200) NOT NULL, '
+            'applied_at DATETIME NOT NULL)'
+        )
+
+
+def applied_versions(engine):
+    """Insieme delle versioni già applicate"""
+    _ensure_version_table(engine)
+    with engine.connect() as connection:
+        return {row[0] for row in connection.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def current_version(engine):
+    """Versione più alta applicata (0 se il database è vuoto)"""
+    return max(applied_versions(engine), default=0)
+
+
+def _apply(engine, migration):
+    """Applica una migrazione nella propria transazione, registrandone la versione"""
+    disable_foreign_keys = getattr(migration.module, 'DISABLE_FOREIGN_KEYS', False)
+    
+    with engine.connect() as connection:
+        if disable_foreign_keys:
+            # Il PRAGMA non ha effetto dentro una transazione: va impostato prima del BEGIN
+            foreign_keys = connection.exec_driver_sql('PRAGMA foreign_keys').scalar()
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+        
+        try:
+            with connection.begin():
+                connection.execute(
+                    text('INSERT INTO schema_migrations (version, name, applied_at) '
+                         'VALUES (:version, :name, :applied_at)'),
+                    {'version': migration.version, 'name': migration.name,
+                     'applied_at': datetime.utcnow()}
+                )
+                migration.module.upgrade(connection)
+                if disable_foreign_keys:
+                    violations = connection.exec_driver_sql('PRAGMA foreign_key_check').fetchall()
+                    if violations:
+                        raise RuntimeError(
+                            f'{migration!r}: {len(violations)} violazioni di chiave esterna '
+                            f'(prima: {violations[0]})')
+        finally:
+            if disable_foreign_keys:
+                connection.exec_driver_sql(f'PRAGMA foreign_keys={foreign_keys}')
+                connection.commit()
+
+
+def upgrade(engine, target=None, on_apply=None):
+    """
+    Applica in ordine le migrazioni mancanti fino a target (tutte se None),
+    ognuna nella propria transazione. Restituisce la lista delle migrazioni applicate.
+    La versione viene registrata per prima: se un altro processo sta applicando
+    la stessa migrazione, la chiave primaria duplicata la fa saltare (solo se la
+    versione risulta poi registrata; gli altri IntegrityError vengono propagati).
+    """
+    done = applied_versions(engine)
+    applied = []
+    
+    for migration in discover():
+        if migration.version in done or (target is not None and migration.version > target):
+            continue
+        
+        try:
+            _apply(engine, migration)
+        except IntegrityError:
+            # Già applicata da un altro processo nel frattempo; altrimenti l'errore
+            # viene dal corpo della migrazione (es. un vincolo violato) e va propagato
+            if migration.version in applied_versions(engine):
+                continue
+            raise
+        
+        applied.append(migration)
+        if on_apply:
+            on_apply(migration)
+    
+    return applied
@@ -0,0 +1,44 @@
+"""Schema iniziale: utenti, materie e sessioni di studio"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER NOT NULL,
+        username VARCHAR(80) NOT NULL,
+        email VARCHAR(120) NOT NULL,
+        password_hash VARCHAR(200) NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id)
+    )''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users (username)',
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)',
+    '''CREATE TABLE IF NOT EXISTS subjects (
+        id INTEGER NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        description TEXT,
+        color VARCHAR(7),
+        user_id INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS study_sessions (
+        id INTEGER NOT NULL,
+        topic VARCHAR(200) NOT NULL,
+        duration_minutes INTEGER NOT NULL,
+        notes TEXT,
+        date DATE NOT NULL,
+        created_at DATETIME,
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(subject_id) REFERENCES subjects (id)
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_study_sessions_date ON study_sessions (date)',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
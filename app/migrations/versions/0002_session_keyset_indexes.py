@@ -0,0 +1,14 @@
+"""Indici composti per la paginazione keyset e i filtri della lista sessioni"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    'CREATE INDEX IF NOT EXISTS ix_study_sessions_user_date '
+    'ON study_sessions (user_id, date, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS ix_study_sessions_user_subject_date '
+    'ON study_sessions (user_id, subject_id, date, created_at, id)',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
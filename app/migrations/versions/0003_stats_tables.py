@@ -0,0 +1,60 @@
+"""Tabelle di riepilogo statistiche per utente, materia e mese (con popolamento iniziale)"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    '''CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        subject_count INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        updated_at DATETIME,
+        PRIMARY KEY (user_id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS user_subject_stats (
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, subject_id),
+        FOREIGN KEY(user_id) REFERENCES users (id),
+        FOREIGN KEY(subject_id) REFERENCES subjects (id)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS user_month_stats (
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, year, month),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )''',
+    # Popolamento dai dati esistenti (le righe già presenti non vengono toccate)
+    '''INSERT OR IGNORE INTO user_stats
+        (user_id, session_count, total_minutes, subject_count, version, updated_at)
+    SELECT u.id,
+           (SELECT COUNT(*) FROM study_sessions s WHERE s.user_id = u.id),
+           (SELECT COALESCE(SUM(s.duration_minutes), 0) FROM study_sessions s WHERE s.user_id = u.id),
+           (SELECT COUNT(*) FROM subjects m WHERE m.user_id = u.id),
+           1,
+           CURRENT_TIMESTAMP
+    FROM users u''',
+    '''INSERT OR IGNORE INTO user_subject_stats (user_id, subject_id, session_count, total_minutes)
+    SELECT user_id, subject_id, COUNT(*), SUM(duration_minutes)
+    FROM study_sessions
+    GROUP BY user_id, subject_id''',
+    '''INSERT OR IGNORE INTO user_month_stats (user_id, year, month, session_count, total_minutes)
+    SELECT user_id,
+           CAST(strftime('%Y', date) AS INTEGER),
+           CAST(strftime('%m', date) AS INTEGER),
+           COUNT(*),
+           SUM(duration_minutes)
+    FROM study_sessions
+    GROUP BY user_id, strftime('%Y', date), strftime('%m', date)''',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
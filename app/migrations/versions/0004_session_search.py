@@ -0,0 +1,41 @@
+"""Indice full-text FTS5 su argomento e note delle sessioni, sincronizzato da trigger"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    # Tabella a contenuto esterno: il testo resta solo in study_sessions, l'indice usa l'id
+    # come rowid. Anche user_id è indicizzato, così la ricerca è limitata all'utente già
+    # nell'indice. remove_diacritics fa trovare "perche" anche per "perché".
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS study_sessions_fts USING fts5(
+        topic,
+        notes,
+        user_id,
+        content='study_sessions',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS study_sessions_fts_insert
+    AFTER INSERT ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (rowid, topic, notes, user_id)
+        VALUES (new.id, new.topic, new.notes, new.user_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS study_sessions_fts_delete
+    AFTER DELETE ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (study_sessions_fts, rowid, topic, notes, user_id)
+        VALUES ('delete', old.id, old.topic, old.notes, old.user_id);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS study_sessions_fts_update
+    AFTER UPDATE OF topic, notes ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (study_sessions_fts, rowid, topic, notes, user_id)
+        VALUES ('delete', old.id, old.topic, old.notes, old.user_id);
+        INSERT INTO study_sessions_fts (rowid, topic, notes, user_id)
+        VALUES (new.id, new.topic, new.notes, new.user_id);
+    END''',
+    # Indicizzazione delle sessioni già presenti
+    "INSERT INTO study_sessions_fts (study_sessions_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
@@ -0,0 +1,133 @@
+"""Chiavi esterne con ON DELETE CASCADE e indici per le cancellazioni a cascata"""
+from app.migrations import run_statements
+
+
+# SQLite non permette di modificare i vincoli di una tabella esistente: ogni tabella
+# viene ricreata con i nuovi vincoli, copiata e rinominata. Le righe orfane (possibili
+# finché i vincoli non erano attivi) non vengono copiate.
+DISABLE_FOREIGN_KEYS = True
+
+STATEMENTS = [
+    # Materie
+    '''CREATE TABLE subjects_new (
+        id INTEGER NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        description TEXT,
+        color VARCHAR(7),
+        user_id INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    '''INSERT INTO subjects_new (id, name, description, color, user_id, created_at)
+    SELECT id, name, description, color, user_id, created_at FROM subjects
+    WHERE user_id IN (SELECT id FROM users)''',
+    'DROP TABLE subjects',
+    'ALTER TABLE subjects_new RENAME TO subjects',
+    'CREATE INDEX ix_subjects_user_id ON subjects (user_id)',
+    
+    # Sessioni di studio (gli id sono conservati: l'indice full-text resta valido)
+    '''CREATE TABLE study_sessions_new (
+        id INTEGER NOT NULL,
+        topic VARCHAR(200) NOT NULL,
+        duration_minutes INTEGER NOT NULL,
+        notes TEXT,
+        date DATE NOT NULL,
+        created_at DATETIME,
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    '''INSERT INTO study_sessions_new
+        (id, topic, duration_minutes, notes, date, created_at, user_id, subject_id)
+    SELECT id, topic, duration_minutes, notes, date, created_at, user_id, subject_id
+    FROM study_sessions
+    WHERE user_id IN (SELECT id FROM users) AND subject_id IN (SELECT id FROM subjects)''',
+    'DROP TABLE study_sessions',
+    'ALTER TABLE study_sessions_new RENAME TO study_sessions',
+    'CREATE INDEX ix_study_sessions_date ON study_sessions (date)',
+    'CREATE INDEX ix_study_sessions_subject_id ON study_sessions (subject_id)',
+    'CREATE INDEX ix_study_sessions_user_date '
+    'ON study_sessions (user_id, date, created_at, id)',
+    'CREATE INDEX ix_study_sessions_user_subject_date '
+    'ON study_sessions (user_id, subject_id, date, created_at, id)',
+    
+    # Trigger dell'indice full-text (eliminati insieme alla vecchia tabella)
+    '''CREATE TRIGGER study_sessions_fts_insert
+    AFTER INSERT ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (rowid, topic, notes, user_id)
+        VALUES (new.id, new.topic, new.notes, new.user_id);
+    END''',
+    '''CREATE TRIGGER study_sessions_fts_delete
+    AFTER DELETE ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (study_sessions_fts, rowid, topic, notes, user_id)
+        VALUES ('delete', old.id, old.topic, old.notes, old.user_id);
+    END''',
+    '''CREATE TRIGGER study_sessions_fts_update
+    AFTER UPDATE OF topic, notes ON study_sessions BEGIN
+        INSERT INTO study_sessions_fts (study_sessions_fts, rowid, topic, notes, user_id)
+        VALUES ('delete', old.id, old.topic, old.notes, old.user_id);
+        INSERT INTO study_sessions_fts (rowid, topic, notes, user_id)
+        VALUES (new.id, new.topic, new.notes, new.user_id);
+    END''',
+    # Le sessioni orfane non copiate escono anche dall'indice
+    "INSERT INTO study_sessions_fts (study_sessions_fts) VALUES ('rebuild')",
+    
+    # Riepiloghi statistiche
+    '''CREATE TABLE user_stats_new (
+        user_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        subject_count INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        updated_at DATETIME,
+        PRIMARY KEY (user_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    '''INSERT INTO user_stats_new
+        (user_id, session_count, total_minutes, subject_count, version, updated_at)
+    SELECT user_id, session_count, total_minutes, subject_count, version, updated_at
+    FROM user_stats
+    WHERE user_id IN (SELECT id FROM users)''',
+    'DROP TABLE user_stats',
+    'ALTER TABLE user_stats_new RENAME TO user_stats',
+    
+    '''CREATE TABLE user_subject_stats_new (
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, subject_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    '''INSERT INTO user_subject_stats_new (user_id, subject_id, session_count, total_minutes)
+    SELECT user_id, subject_id, session_count, total_minutes
+    FROM user_subject_stats
+    WHERE user_id IN (SELECT id FROM users) AND subject_id IN (SELECT id FROM subjects)''',
+    'DROP TABLE user_subject_stats',
+    'ALTER TABLE user_subject_stats_new RENAME TO user_subject_stats',
+    'CREATE INDEX ix_user_subject_stats_subject_id ON user_subject_stats (subject_id)',
+    
+    '''CREATE TABLE user_month_stats_new (
+        user_id INTEGER NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, year, month),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    '''INSERT INTO user_month_stats_new (user_id, year, month, session_count, total_minutes)
+    SELECT user_id, year, month, session_count, total_minutes
+    FROM user_month_stats
+    WHERE user_id IN (SELECT id FROM users)''',
+    'DROP TABLE user_month_stats',
+    'ALTER TABLE user_month_stats_new RENAME TO user_month_stats',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
@@ -0,0 +1,53 @@
+"""Obiettivi di studio e riepiloghi per settimana e mese (con popolamento iniziale)"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    '''CREATE TABLE IF NOT EXISTS goals (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER,
+        period VARCHAR(10) NOT NULL,
+        target_minutes INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_goals_user_id ON goals (user_id)',
+    'CREATE INDEX IF NOT EXISTS ix_goals_subject_id ON goals (subject_id)',
+    
+    '''CREATE TABLE IF NOT EXISTS user_period_stats (
+        user_id INTEGER NOT NULL,
+        period VARCHAR(10) NOT NULL,
+        period_start DATE NOT NULL,
+        subject_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, period, period_start, subject_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_user_period_stats_subject_id ON user_period_stats (subject_id)',
+    
+    # Popolamento dai dati esistenti: settimane lunedì-domenica e mesi
+    '''INSERT OR IGNORE INTO user_period_stats
+        (user_id, period, period_start, subject_id, session_count, total_minutes)
+    SELECT user_id, 'week', date(date, 'weekday 0', '-6 days'), subject_id,
+           COUNT(*), SUM(duration_minutes)
+    FROM study_sessions
+    GROUP BY user_id, date(date, 'weekday 0', '-6 days'), subject_id''',
+    '''INSERT OR IGNORE INTO user_period_stats
+        (user_id, period, period_start, subject_id, session_count, total_minutes)
+    SELECT user_id, 'month', strftime('%Y-%m-01', date), subject_id,
+           COUNT(*), SUM(duration_minutes)
+    FROM study_sessions
+    GROUP BY user_id, strftime('%Y-%m-01', date), subject_id''',
+    
+    # La dashboard in cache non contiene ancora gli obiettivi
+    'UPDATE user_stats SET version = version + 1, updated_at = CURRENT_TIMESTAMP',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
@@ -0,0 +1,45 @@
+"""Sessioni pianificate e contatori giornalieri per il calendario (con popolamento iniziale)"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    '''CREATE TABLE IF NOT EXISTS planned_sessions (
+        id INTEGER NOT NULL,
+        topic VARCHAR(200) NOT NULL,
+        duration_minutes INTEGER NOT NULL,
+        date DATE NOT NULL,
+        created_at DATETIME,
+        user_id INTEGER NOT NULL,
+        subject_id INTEGER NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_planned_sessions_user_date ON planned_sessions (user_id, date)',
+    'CREATE INDEX IF NOT EXISTS ix_planned_sessions_subject_id ON planned_sessions (subject_id)',
+    
+    '''CREATE TABLE IF NOT EXISTS user_day_stats (
+        user_id INTEGER NOT NULL,
+        day DATE NOT NULL,
+        subject_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        planned_count INTEGER NOT NULL,
+        planned_minutes INTEGER NOT NULL,
+        PRIMARY KEY (user_id, day, subject_id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE,
+        FOREIGN KEY(subject_id) REFERENCES subjects (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_user_day_stats_subject_id ON user_day_stats (subject_id)',
+    
+    # Popolamento dalle sessioni esistenti (non ci sono ancora sessioni pianificate)
+    '''INSERT OR IGNORE INTO user_day_stats
+        (user_id, day, subject_id, session_count, total_minutes, planned_count, planned_minutes)
+    SELECT user_id, date, subject_id, COUNT(*), SUM(duration_minutes), 0, 0
+    FROM study_sessions
+    GROUP BY user_id, date, subject_id''',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
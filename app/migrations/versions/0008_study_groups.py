@@ -0,0 +1,47 @@
+"""Gruppi di studio, appartenenze e classifiche per periodo"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    '''CREATE TABLE IF NOT EXISTS study_groups (
+        id INTEGER NOT NULL,
+        name VARCHAR(100) NOT NULL,
+        invite_code VARCHAR(16) NOT NULL,
+        owner_id INTEGER,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(owner_id) REFERENCES users (id) ON DELETE SET NULL
+    )''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS ix_study_groups_invite_code ON study_groups (invite_code)',
+    'CREATE INDEX IF NOT EXISTS ix_study_groups_owner_id ON study_groups (owner_id)',
+    
+    '''CREATE TABLE IF NOT EXISTS group_memberships (
+        group_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        joined_at DATETIME,
+        PRIMARY KEY (group_id, user_id),
+        FOREIGN KEY(group_id) REFERENCES study_groups (id) ON DELETE CASCADE,
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_group_memberships_user_id ON group_memberships (user_id)',
+    
+    '''CREATE TABLE IF NOT EXISTS leaderboard_entries (
+        group_id INTEGER NOT NULL,
+        period VARCHAR(10) NOT NULL,
+        period_start DATE NOT NULL,
+        user_id INTEGER NOT NULL,
+        session_count INTEGER NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (group_id, period, period_start, user_id),
+        FOREIGN KEY(group_id) REFERENCES study_groups (id) ON DELETE CASCADE,
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_leaderboard_entries_user_id ON leaderboard_entries (user_id)',
+    # Classifica già ordinata: primi K con una lettura, posizione contando le voci che precedono
+    'CREATE INDEX IF NOT EXISTS ix_leaderboard_entries_rank '
+    'ON leaderboard_entries (group_id, period, period_start, total_minutes DESC, user_id)',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
@@ -0,0 +1,37 @@
+"""Numeri di modifica, updated_at ed eliminazioni per la sincronizzazione incrementale"""
+from app.migrations import run_statements
+
+
+STATEMENTS = [
+    'ALTER TABLE user_stats ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0',
+    'ALTER TABLE subjects ADD COLUMN updated_at DATETIME',
+    'ALTER TABLE subjects ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0',
+    'ALTER TABLE study_sessions ADD COLUMN updated_at DATETIME',
+    'ALTER TABLE study_sessions ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0',
+    
+    # Le righe esistenti restano con numero di modifica 0: un client senza cursore le
+    # riceve tutte, i cursori successivi solo ciò che cambia dopo
+    'UPDATE subjects SET updated_at = created_at',
+    'UPDATE study_sessions SET updated_at = created_at',
+    
+    'CREATE INDEX IF NOT EXISTS ix_subjects_user_change_seq ON subjects (user_id, change_seq, id)',
+    'CREATE INDEX IF NOT EXISTS ix_study_sessions_user_change_seq '
+    'ON study_sessions (user_id, change_seq, id)',
+    
+    '''CREATE TABLE IF NOT EXISTS sync_tombstones (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        entity VARCHAR(10) NOT NULL,
+        entity_id INTEGER NOT NULL,
+        change_seq INTEGER NOT NULL,
+        deleted_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_sync_tombstones_user_change_seq '
+    'ON sync_tombstones (user_id, change_seq, id)',
+]
+
+
+def upgrade(connection):
+    run_statements(connection, STATEMENTS)
@@ -1,6 +1,5 @@
 from datetime import datetime
-from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app import db, password_hasher
 
 
 class User(db.Model):
@@ -13,17 +12,20 @@ class User(db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relazioni
-    subjects = db.relationship('Subject', backref='user', lazy=True, cascade='all, delete-orphan')
-    study_sessions = db.relationship('StudySession', backref='user', lazy=True, cascade='all, delete-orphan')
+    # Relazioni: le righe figlie sono eliminate dal database (ON DELETE CASCADE),
+    # senza caricarle in memoria
+    subjects = db.relationship('Subject', backref='user', lazy=True,
+                               cascade='all, delete-orphan', passive_deletes=True)
+    study_sessions = db.relationship('StudySession', backref='user', lazy=True,
+                                     cascade='all, delete-orphan', passive_deletes=True)
     
     def set_password(self, password):
-        """Hash della password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash della password (parametri e pool di PasswordHasher, può sollevare HashingBusy)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verifica della password"""
-        return check_password_hash(self.password_hash, password)
+        """Verifica della password (pool di PasswordHasher, può sollevare HashingBusy)"""
+        return password_hasher.verify(self.password_hash, password)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -37,11 +39,21 @@ class Subject(db.Model):
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     color = db.Column(db.String(7), default='#3498db')  # Colore esadecimale per visualizzazione
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Numero di modifica dell'utente (UserStats.change_seq) dell'ultima scrittura della riga
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
     
     # Relazioni
-    study_sessions = db.relationship('StudySession', backref='subject', lazy=True, cascade='all, delete-orphan')
+    study_sessions = db.relationship('StudySession', backref='subject', lazy=True,
+                                     cascade='all, delete-orphan', passive_deletes=True)
+    
+    # Sincronizzazione: le modifiche successive a un cursore sono un range scan sull'indice
+    __table_args__ = (
+        db.Index('ix_subjects_user_change_seq', 'user_id', 'change_seq', 'id'),
+    )
     
     def __repr__(self):
         return f'<Subject {self.name}>'
@@ -57,10 +69,23 @@ class StudySession(db.Model):
     notes = db.Column(db.Text)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Numero di modifica dell'utente (UserStats.change_seq) dell'ultima scrittura della riga
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
     
     # Chiavi esterne
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'),
+                           nullable=False, index=True)
+    
+    # Indici composti per la paginazione keyset su (date, created_at, id):
+    # ogni pagina è un range scan sull'indice, indipendentemente dalla profondità
+    __table_args__ = (
+        db.Index('ix_study_sessions_user_date', 'user_id', 'date', 'created_at', 'id'),
+        db.Index('ix_study_sessions_user_subject_date',
+                 'user_id', 'subject_id', 'date', 'created_at', 'id'),
+        db.Index('ix_study_sessions_user_change_seq', 'user_id', 'change_seq', 'id'),
+    )
     
     @property
     def duration_hours(self):
@@ -69,3 +94,222 @@ class StudySession(db.Model):
     
     def __repr__(self):
         return f'<StudySession {self.topic} - {self.duration_minutes}min>'
+
+
+class UserStats(db.Model):
+    """Statistiche aggregate per utente, aggiornate incrementalmente dai repository"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    subject_count = db.Column(db.Integer, nullable=False, default=0)
+    # Versione dei dati dell'utente: incrementata a ogni modifica, usata per invalidare le cache
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+    # Ultimo numero di modifica assegnato a materie, sessioni ed eliminazioni (sincronizzazione)
+    change_seq = db.Column(db.Integer, nullable=False, default=0)
+    
+    @property
+    def total_hours(self):
+        """Restituisce il totale in ore (formato decimale)"""
+        return round(self.total_minutes / 60, 2)
+    
+    def __repr__(self):
+        return f'<UserStats user={self.user_id} {self.total_minutes}min>'
+
+
+class UserSubjectStats(db.Model):
+    """Statistiche aggregate per (utente, materia)"""
+    __tablename__ = 'user_subject_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserSubjectStats user={self.user_id} subject={self.subject_id}>'
+
+
+class UserMonthStats(db.Model):
+    """Statistiche aggregate per (utente, anno, mese)"""
+    __tablename__ = 'user_month_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserMonthStats user={self.user_id} {self.year}-{self.month:02d}>'
+
+
+class UserPeriodStats(db.Model):
+    """
+    Statistiche aggregate per (utente, settimana o mese, materia): i contatori
+    da cui si legge l'avanzamento degli obiettivi
+    """
+    __tablename__ = 'user_period_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)  # 'week' o 'month'
+    period_start = db.Column(db.Date, primary_key=True)  # lunedì o primo del mese
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserPeriodStats user={self.user_id} {self.period} {self.period_start}>'
+
+
+class Goal(db.Model):
+    """Obiettivo di ore di studio settimanale o mensile, per una materia o complessivo"""
+    __tablename__ = 'goals'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        nullable=False, index=True)
+    # None = tutte le materie
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), index=True)
+    period = db.Column(db.String(10), nullable=False)  # 'week' o 'month'
+    target_minutes = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def target_hours(self):
+        """Restituisce l'obiettivo in ore (formato decimale)"""
+        return round(self.target_minutes / 60, 2)
+    
+    def __repr__(self):
+        return f'<Goal user={self.user_id} {self.period} {self.target_minutes}min>'
+
+
+class UserDayStats(db.Model):
+    """
+    Minuti studiati e pianificati per (utente, giorno, materia): i contatori da cui il
+    calendario legge un mese intero con una sola lettura sull'intervallo di chiavi
+    """
+    __tablename__ = 'user_day_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'),
+                           primary_key=True, index=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    planned_count = db.Column(db.Integer, nullable=False, default=0)
+    planned_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<UserDayStats user={self.user_id} {self.day} subject={self.subject_id}>'
+
+
+class PlannedSession(db.Model):
+    """Sessione di studio pianificata nel calendario, non ancora svolta"""
+    __tablename__ = 'planned_sessions'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(200), nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'),
+                           nullable=False, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_planned_sessions_user_date', 'user_id', 'date'),
+    )
+    
+    @property
+    def duration_hours(self):
+        """Restituisce la durata in ore (formato decimale)"""
+        return round(self.duration_minutes / 60, 2)
+    
+    def __repr__(self):
+        return f'<PlannedSession {self.topic} {self.date}>'
+
+
+class StudyGroup(db.Model):
+    """Gruppo di studio (es. una classe) con classifica delle ore tra i membri"""
+    __tablename__ = 'study_groups'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    # Codice da condividere con i compagni per entrare nel gruppo
+    invite_code = db.Column(db.String(16), unique=True, nullable=False, index=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StudyGroup {self.name}>'
+
+
+class GroupMembership(db.Model):
+    """Appartenenza di un utente a un gruppo di studio"""
+    __tablename__ = 'group_memberships'
+    
+    group_id = db.Column(db.Integer, db.ForeignKey('study_groups.id', ondelete='CASCADE'),
+                         primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        primary_key=True, index=True)
+    joined_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<GroupMembership group={self.group_id} user={self.user_id}>'
+
+
+class LeaderboardEntry(db.Model):
+    """
+    Totale di un membro in un gruppo per periodo ('week' con il lunedì come inizio,
+    'all' per il totale complessivo), aggiornato a ogni modifica delle sessioni.
+    L'indice (gruppo, periodo, inizio, minuti decrescenti) fornisce già ordinata la
+    classifica: i primi K si leggono dall'indice, la posizione di un membro contando
+    le voci che lo precedono (costo proporzionale alla posizione).
+    """
+    __tablename__ = 'leaderboard_entries'
+    
+    group_id = db.Column(db.Integer, db.ForeignKey('study_groups.id', ondelete='CASCADE'),
+                         primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)
+    period_start = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'),
+                        primary_key=True, index=True)
+    session_count = db.Column(db.Integer, nullable=False, default=0)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<LeaderboardEntry group={self.group_id} {self.period} user={self.user_id}>'
+
+
+db.Index('ix_leaderboard_entries_rank', LeaderboardEntry.group_id, LeaderboardEntry.period,
+         LeaderboardEntry.period_start, LeaderboardEntry.total_minutes.desc(),
+         LeaderboardEntry.user_id)
+
+
+class SyncTombstone(db.Model):
+    """
+    Traccia di una materia o sessione eliminata, per comunicare l'eliminazione ai client
+    che sincronizzano le modifiche. L'eliminazione di una materia implica quella delle
+    sue sessioni (come ON DELETE CASCADE sul server).
+    """
+    __tablename__ = 'sync_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    entity = db.Column(db.String(10), nullable=False)  # 'subject' o 'session'
+    entity_id = db.Column(db.Integer, nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_user_change_seq', 'user_id', 'change_seq', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<SyncTombstone {self.entity} {self.entity_id}>'
@@ -0,0 +1,90 @@
+"""
+Calendario delle sessioni di studio
+Costruisce la vista mensile o settimanale (totali per giorno e materia, svolti e
+pianificati) dai contatori giornalieri di user_day_stats, letti con una sola query
+sull'intervallo visualizzato. Il risultato contiene solo tipi semplici (date in formato
+ISO), così può essere memorizzato in cache e inviato in JSON per la navigazione.
+"""
+from datetime import date, timedelta
+from app.repositories import PlannerRepository, period_start
+
+CALENDAR_VIEWS = ('month', 'week')
+MONTH_NAMES = ['Gennaio', 'Febbraio', 'Marzo', 'Aprile', 'Maggio', 'Giugno',
+               'Luglio', 'Agosto', 'Settembre', 'Ottobre', 'Novembre', 'Dicembre']
+
+
+def _add_months(day, months):
+    """Primo giorno del mese che dista `months` mesi da quello di day"""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def normalize_anchor(view, anchor):
+    """Riferimento canonico della vista: primo del mese o lunedì della settimana"""
+    if view == 'week':
+        return period_start(anchor, 'week')
+    return anchor.replace(day=1)
+
+
+def view_range(view, anchor):
+    """Primo e ultimo giorno mostrati: settimane intere (lunedì-domenica)"""
+    anchor = normalize_anchor(view, anchor)
+    if view == 'week':
+        return anchor, anchor + timedelta(days=6)
+    last = _add_months(anchor, 1) - timedelta(days=1)
+    return period_start(anchor, 'week'), period_start(last, 'week') + timedelta(days=6)
+
+
+def _title(view, start, end, anchor):
+    if view == 'week':
+        return f'{start.strftime("%d/%m")} – {end.strftime("%d/%m/%Y")}'
+    return f'{MONTH_NAMES[anchor.month - 1]} {anchor.year}'
+
+
+def build(user_id, view, anchor, today):
+    """Dati del calendario per la vista indicata (mese o settimana che contiene anchor)"""
+    anchor = normalize_anchor(view, anchor)
+    start, end = view_range(view, anchor)
+    
+    by_day = {}
+    for bucket in PlannerRepository.day_buckets(user_id, start, end):
+        by_day.setdefault(bucket['day'], []).append({
+            'subject_id': bucket['subject_id'],
+            'name': bucket['subject_name'],
+            'color': bucket['subject_color'],
+            'minutes': bucket['total_minutes'],
+            'planned_minutes': bucket['planned_minutes']
+        })
+    
+    days = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        subjects = by_day.get(day, [])
+        days.append({
+            'date': day.isoformat(),
+            'day': day.day,
+            'in_period': view == 'week' or day.month == anchor.month,
+            'is_today': day == today,
+            'minutes': sum(s['minutes'] for s in subjects),
+            'planned_minutes': sum(s['planned_minutes'] for s in subjects),
+            'subjects': subjects
+        })
+    
+    if view == 'week':
+        previous, following = anchor - timedelta(days=7), anchor + timedelta(days=7)
+    else:
+        previous, following = _add_months(anchor, -1), _add_months(anchor, 1)
+    in_period = [d for d in days if d['in_period']]
+    return {
+        'view': view,
+        'anchor': anchor.isoformat(),
+        'title': _title(view, start, end, anchor),
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'previous': previous.isoformat(),
+        'next': following.isoformat(),
+        'today': today.isoformat(),
+        'minutes': sum(d['minutes'] for d in in_period),
+        'planned_minutes': sum(d['planned_minutes'] for d in in_period),
+        'days': days
+    }
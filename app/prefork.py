@@ -0,0 +1,542 @@
+"""
+Server di produzione multi-processo (pre-fork), solo libreria standard + Werkzeug
+Il master carica l'applicazione una volta, apre il socket di ascolto e crea i worker
+con fork: il codice importato è condiviso copy-on-write. Ogni worker è un server
+Werkzeug multi-thread sullo stesso socket; dopo il fork scarta le connessioni al
+database e alla cache ereditate dal master e apre le proprie.
+
+Segnali al master:
+- SIGTERM/SIGINT: arresto graduale (i worker finiscono le richieste in corso)
+- SIGQUIT: arresto immediato
+- SIGHUP: ricaricamento senza interruzioni; un nuovo master (rieseguito con il codice
+  aggiornato) eredita il socket, avvia i propri worker e, quando sono pronti, chiede
+  al vecchio master di terminare gradualmente
+
+Salute dei worker:
+- ogni worker invia al master un battito al secondo con i propri contatori; un worker
+  che non risponde per `timeout` secondi viene terminato e sostituito
+- il master scrive lo stato di tutti i worker in un file JSON (status_file)
+- HEALTH_PATH risponde con lo stato del worker che serve la richiesta
+- con max_requests un worker si ricicla dopo N richieste (più un margine casuale,
+  così i worker non si riavviano tutti insieme), limitando la crescita della memoria
+"""
+import json
+import logging
+import os
+import random
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+from app import db, cache, password_hasher
+
+logger = logging.getLogger('studyplanner.server')
+
+HEALTH_PATH = '/-/health'
+
+# Variabili d'ambiente con cui il master ricaricato riceve socket e PID del predecessore
+LISTEN_FD_ENV = 'STUDYPLANNER_LISTEN_FD'
+PARENT_PID_ENV = 'STUDYPLANNER_PARENT_PID'
+
+HEARTBEAT_INTERVAL = 1.0
+
+# Codice di uscita di un worker che non riesce ad avviarsi: il master si arresta
+# invece di ricrearlo all'infinito
+WORKER_BOOT_ERROR = 3
+
+
+def parse_bind(bind):
+    """'host:port' (anche '[::]:8000') → (host, port); solleva ValueError se non valido"""
+    host, _, port = bind.rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f'indirizzo non valido "{bind}" (usa host:porta)')
+    return host.strip('[]'), int(port)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Handler con timeout sulle connessioni keep-alive e log degli accessi disattivabile"""
+    
+    def setup(self):
+        self.timeout = self.server.keepalive
+        super().setup()
+    
+    def log_request(self, *args, **kwargs):
+        if self.server.access_log:
+            super().log_request(*args, **kwargs)
+
+
+class _WorkerServer(ThreadedWSGIServer):
+    """Server del worker: alla chiusura attende i thread delle richieste in corso"""
+    
+    daemon_threads = False
+    block_on_close = True
+    
+    def __init__(self, worker, *args, **kwargs):
+        self.worker = worker
+        self.keepalive = worker.keepalive
+        self.access_log = worker.access_log
+        super().__init__(*args, **kwargs)
+    
+    def service_actions(self):
+        # Eseguita a ogni giro del ciclo di accettazione: il battito dimostra che è vivo
+        super().service_actions()
+        self.worker.heartbeat()
+
+
+class Worker:
+    """Processo worker: serve l'applicazione sul socket condiviso e riferisce al master"""
+    
+    def __init__(self, arbiter, pipe_fd):
+        self.app = arbiter.app
+        self.host = arbiter.host
+        self.port = arbiter.port
+        self.listen_fd = arbiter.socket.fileno()
+        self.keepalive = arbiter.keepalive
+        self.access_log = arbiter.access_log
+        self.pipe = pipe_fd
+        self.max_requests = 0
+        if arbiter.max_requests:
+            self.max_requests = arbiter.max_requests + random.randint(0, arbiter.max_requests_jitter)
+        self.requests = 0
+        self.active = 0
+        self.started = time.time()
+        self.server = None
+        self._stopping = False
+        self._last_beat = float('-inf')
+        self._lock = threading.Lock()
+    
+    def run(self):
+        """Ciclo di vita del worker; restituisce il codice di uscita del processo"""
+        signal.set_wakeup_fd(-1)
+        # SIGHUP riguarda solo il master (ricaricamento)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        for signum in (signal.SIGCHLD, signal.SIGQUIT):
+            signal.signal(signum, signal.SIG_DFL)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop())
+        
+        try:
+            self._after_fork()
+            self.server = _WorkerServer(self, self.host, self.port, self,
+                                        handler=_RequestHandler, fd=self.listen_fd)
+            # Tutti i worker vengono svegliati dalla stessa connessione: chi arriva tardi
+            # non deve restare bloccato in accept()
+            self.server.socket.setblocking(False)
+        except Exception:
+            logger.exception('Avvio del worker non riuscito')
+            return WORKER_BOOT_ERROR
+        
+        logger.info('Worker avviato (max_requests=%s)', self.max_requests or '-')
+        self.heartbeat()
+        if self._stopping:
+            self.server.server_close()
+            return 0
+        try:
+            # Alla chiusura attende le richieste in corso (block_on_close)
+            self.server.serve_forever(poll_interval=0.5)
+        finally:
+            password_hasher.shutdown()
+        logger.info('Worker terminato dopo %d richieste', self.requests)
+        return 0
+    
+    def _after_fork(self):
+        """Scarta le connessioni ereditate dal master: ogni processo usa le proprie"""
+        with self.app.app_context():
+            for engine in db.engines.values():
+                # close=False: le connessioni appartengono al master, qui si abbandonano
+                engine.dispose(close=False)
+        cache.after_fork()
+    
+    def stop(self):
+        """Arresto graduale: smette di accettare connessioni e finisce le richieste in corso"""
+        if self._stopping or self.server is None:
+            self._stopping = True
+            return
+        self._stopping = True
+        # shutdown() attende la fine del ciclo di accettazione: va chiamata da un altro thread
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+    
+    def status(self):
+        """Stato del worker (battito verso il master e risposta di HEALTH_PATH)"""
+        return {
+            'pid': os.getpid(),
+            'master_pid': os.getppid(),
+            'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'uptime': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'active': self.active,
+            'max_requests': self.max_requests,
+            'stopping': self._stopping
+        }
+    
+    def heartbeat(self):
+        """Invia lo stato al master (al più una volta per HEARTBEAT_INTERVAL)"""
+        now = time.monotonic()
+        if now - self._last_beat < HEARTBEAT_INTERVAL:
+            return
+        self._last_beat = now
+        try:
+            os.write(self.pipe, (json.dumps(self.status()) + '\n').encode())
+        except BlockingIOError:
+            # Il master è in ritardo nella lettura: il battito successivo porterà lo stato
+            pass
+        except BrokenPipeError:
+            logger.warning('Master non più raggiungibile: arresto del worker')
+            self.stop()
+    
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+    
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') == HEALTH_PATH:
+            body = json.dumps(self.status()).encode()
+            start_response('503 Service Unavailable' if self._stopping else '200 OK', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(body))),
+                ('Cache-Control', 'no-store')
+            ])
+            return [body]
+        
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            served = self.requests
+        if self.max_requests and served >= self.max_requests:
+            self.stop()
+        
+        def start(status, headers, exc_info=None):
+            # In chiusura il client non deve riusare la connessione keep-alive
+            if self._stopping:
+                headers = [h for h in headers if h[0].lower() != 'connection']
+                headers.append(('Connection', 'close'))
+            return start_response(status, headers, exc_info)
+        
+        try:
+            app_iter = self.app(environ, start)
+        except BaseException:
+            self._finished()
+            raise
+        return ClosingIterator(app_iter, self._finished)
+
+
+class WorkerInfo:
+    """Vista del master su un worker: PID, canale dei battiti e ultimo stato ricevuto"""
+    
+    def __init__(self, pid, pipe_fd):
+        self.pid = pid
+        self.pipe = pipe_fd
+        self.spawned = time.monotonic()
+        self.last_seen = self.spawned
+        self.status = None
+        self.killed = False
+        self._buffer = b''
+    
+    @property
+    def booted(self):
+        return self.status is not None
+    
+    def read_heartbeats(self):
+        """Legge i battiti disponibili; False se il worker ha chiuso il canale"""
+        try:
+            data = os.read(self.pipe, 65536)
+        except BlockingIOError:
+            return True
+        if not data:
+            return False
+        *lines, self._buffer = (self._buffer + data).split(b'\n')
+        if lines:
+            try:
+                self.status = json.loads(lines[-1])
+            except ValueError:
+                logger.warning('Battito non valido dal worker %d', self.pid)
+            self.last_seen = time.monotonic()
+        return True
+
+
+class Arbiter:
+    """Master: crea i worker, li sorveglia e gestisce arresto e ricaricamento"""
+    
+    def __init__(self, app, bind='127.0.0.1:8000', workers=2, max_requests=0, max_requests_jitter=0,
+                 timeout=30, graceful_timeout=30, keepalive=15, access_log=True,
+                 status_file=None, pid_file=None):
+        self.app = app
+        self.host, self.port = parse_bind(bind)
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.keepalive = keepalive
+        self.access_log = access_log
+        self.status_file = status_file
+        self.pid_file = pid_file
+        self.socket = None
+        self.workers = {}
+        self.exit_code = 0
+        self._signals = []
+        self._stopping = False
+        self._deadline = None
+        self._reexec_pid = None
+        self._parent_pid = None
+        self._selector = None
+        self._wakeup = None
+        self._last_status = 0.0
+    
+    # --- avvio ---------------------------------------------------------------
+    
+    def _listen(self):
+        """Socket di ascolto: ereditato dal master precedente o creato qui"""
+        inherited = os.environ.pop(LISTEN_FD_ENV, None)
+        parent = os.environ.pop(PARENT_PID_ENV, None)
+        if inherited is not None:
+            self.socket = socket.socket(fileno=int(inherited))
+            self._parent_pid = int(parent) if parent else None
+        else:
+            family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+            self.socket = socket.create_server((self.host, self.port), family=family, backlog=2048)
+        # Ereditabile dal nuovo master in caso di SIGHUP
+        self.socket.set_inheritable(True)
+        self.port = self.socket.getsockname()[1]
+    
+    def _setup_signals(self):
+        self._wakeup = os.pipe()
+        for fd in self._wakeup:
+            os.set_blocking(fd, False)
+        signal.set_wakeup_fd(self._wakeup[1])
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGQUIT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, lambda signum, frame: self._signals.append(signum))
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wakeup[0], selectors.EVENT_READ)
+    
+    def run(self):
+        """Avvia il master e ne restituisce il codice di uscita al termine"""
+        self._listen()
+        self._setup_signals()
+        # Il master non usa il database: i worker partono senza connessioni aperte
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        
+        if self._parent_pid is None:
+            self._write_pid_file()
+        logger.info('Master in ascolto su %s:%d con %d worker', self.host, self.port, self.num_workers)
+        
+        try:
+            while True:
+                self._reap_workers()
+                if self._stopping:
+                    if not self.workers:
+                        break
+                    if time.monotonic() >= self._deadline:
+                        self._kill_workers(signal.SIGKILL)
+                else:
+                    self._spawn_workers()
+                    self._kill_stale_workers()
+                    self._take_over()
+                self._write_status()
+                self._wait(1.0)
+                self._handle_signals()
+        finally:
+            self._cleanup()
+        logger.info('Master terminato')
+        return self.exit_code
+    
+    # --- ciclo principale ----------------------------------------------------
+    
+    def _wait(self, timeout):
+        for key, _ in self._selector.select(timeout):
+            if key.data is None:
+                try:
+                    while os.read(self._wakeup[0], 512):
+                        pass
+                except BlockingIOError:
+                    pass
+            elif not key.data.read_heartbeats():
+                self._selector.unregister(key.fd)
+    
+    def _handle_signals(self):
+        while self._signals:
+            signum = self._signals.pop(0)
+            if signum == signal.SIGHUP:
+                self._reload()
+            elif signum in (signal.SIGTERM, signal.SIGINT):
+                # Un secondo segnale durante l'arresto graduale lo rende immediato
+                self._stop(graceful=not self._stopping)
+            elif signum == signal.SIGQUIT:
+                self._stop(graceful=False)
+    
+    def _stop(self, graceful=True):
+        if not self._stopping:
+            logger.info('Arresto %s', 'graduale' if graceful else 'immediato')
+        self._stopping = True
+        if graceful:
+            self._deadline = time.monotonic() + self.graceful_timeout
+            self._kill_workers(signal.SIGTERM)
+        else:
+            self._deadline = time.monotonic()
+            self._kill_workers(signal.SIGKILL)
+    
+    def _kill_workers(self, signum):
+        for worker in list(self.workers.values()):
+            if worker.killed:
+                continue
+            if signum == signal.SIGKILL:
+                worker.killed = True
+            try:
+                os.kill(worker.pid, signum)
+            except ProcessLookupError:
+                pass
+    
+    def _spawn_workers(self):
+        while len(self.workers) < self.num_workers:
+            self._spawn_worker()
+    
+    def _spawn_worker(self):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                os.close(read_fd)
+                self._selector.close()
+                for fd in self._wakeup:
+                    os.close(fd)
+                for worker in self.workers.values():
+                    os.close(worker.pipe)
+                os.set_blocking(write_fd, False)
+                code = Worker(self, write_fd).run()
+            except BaseException:
+                logger.exception('Errore nel worker')
+            finally:
+                # Mai tornare nel codice del master
+                logging.shutdown()
+                os._exit(code)
+        
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = WorkerInfo(pid, read_fd)
+        self.workers[pid] = worker
+        self._selector.register(read_fd, selectors.EVENT_READ, worker)
+        logger.info('Avviato il worker %d', pid)
+    
+    def _reap_workers(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            code = os.waitstatus_to_exitcode(status)
+            
+            if pid == self._reexec_pid:
+                logger.error('Il nuovo master è terminato (codice %d): ricaricamento annullato', code)
+                self._reexec_pid = None
+                continue
+            
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.pipe in self._selector.get_map():
+                self._selector.unregister(worker.pipe)
+            os.close(worker.pipe)
+            
+            if self._stopping:
+                continue
+            if code == WORKER_BOOT_ERROR:
+                logger.error('Il worker %d non è riuscito ad avviarsi: arresto del master', pid)
+                self.exit_code = WORKER_BOOT_ERROR
+                self._stop(graceful=True)
+            elif code == 0:
+                logger.info('Worker %d terminato (riciclo): viene sostituito', pid)
+            else:
+                logger.warning('Worker %d terminato con codice %d: viene sostituito', pid, code)
+    
+    def _kill_stale_workers(self):
+        now = time.monotonic()
+        for worker in self.workers.values():
+            if not worker.killed and now - worker.last_seen > self.timeout:
+                logger.error('Worker %d senza battito da %.0f s: terminato', worker.pid,
+                             now - worker.last_seen)
+                worker.killed = True
+                try:
+                    os.kill(worker.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+    
+    # --- ricaricamento -------------------------------------------------------
+    
+    def _reload(self):
+        """Riesegue il master con il codice aggiornato, passandogli il socket di ascolto"""
+        if self._stopping or self._reexec_pid is not None:
+            return
+        logger.info('SIGHUP: avvio di un nuovo master con il codice aggiornato')
+        env = dict(os.environ, **{LISTEN_FD_ENV: str(self.socket.fileno()),
+                                  PARENT_PID_ENV: str(os.getpid())})
+        pid = os.fork()
+        if pid == 0:
+            try:
+                os.execve(sys.executable, [sys.executable] + sys.orig_argv[1:], env)
+            finally:
+                os._exit(1)
+        self._reexec_pid = pid
+    
+    def _take_over(self):
+        """Nel master ricaricato: quando i worker sono pronti chiude il master precedente"""
+        if self._parent_pid is None:
+            return
+        if len(self.workers) < self.num_workers or not all(w.booted for w in self.workers.values()):
+            return
+        if os.getppid() == self._parent_pid:
+            logger.info('Worker pronti: arresto graduale del master precedente %d', self._parent_pid)
+            os.kill(self._parent_pid, signal.SIGTERM)
+        self._parent_pid = None
+        self._write_pid_file()
+    
+    # --- stato e pulizia -----------------------------------------------------
+    
+    def status(self):
+        """Stato del master e dei worker (ultimo battito ricevuto da ciascuno)"""
+        now = time.monotonic()
+        return {
+            'master_pid': os.getpid(),
+            'bind': f'{self.host}:{self.port}',
+            'workers': [
+                dict(worker.status or {'pid': worker.pid},
+                     booted=worker.booted, last_heartbeat=round(now - worker.last_seen, 1))
+                for worker in self.workers.values()
+            ],
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+    
+    def _write_status(self):
+        if not self.status_file or time.monotonic() - self._last_status < HEARTBEAT_INTERVAL:
+            return
+        self._last_status = time.monotonic()
+        tmp = f'{self.status_file}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp, self.status_file)
+    
+    def _write_pid_file(self):
+        if self.pid_file:
+            with open(self.pid_file, 'w') as f:
+                f.write(f'{os.getpid()}\n')
+    
+    def _cleanup(self):
+        # Il file del PID resta se nel frattempo è passato al nuovo master
+        if self.pid_file:
+            try:
+                with open(self.pid_file) as f:
+                    if f.read().strip() == str(os.getpid()):
+                        os.unlink(self.pid_file)
+            except OSError:
+                pass
+        signal.set_wakeup_fd(-1)
+        self.socket.close()
@@ -0,0 +1,41 @@
+"""
+Modelli di sola lettura per le pagine di elenco
+Righe compatte (__slots__, nessuna istanza ORM né identity map) costruite da query
+che leggono solo le colonne necessarie, con le note già troncate in SQL e nome e
+colore della materia presi in join nella stessa query.
+"""
+
+
+class SessionRow:
+    """Sessione di studio come appare negli elenchi (sessioni, dettaglio materia, dashboard)"""
+    
+    __slots__ = ('id', 'date', 'created_at', 'topic', 'duration_minutes', 'notes_preview',
+                 'notes_truncated', 'subject_id', 'subject_name', 'subject_color')
+    
+    def __init__(self, id, date, created_at, topic, duration_minutes, notes_preview,
+                 notes_truncated, subject_id, subject_name, subject_color):
+        self.id = id
+        self.date = date
+        self.created_at = created_at
+        self.topic = topic
+        self.duration_minutes = duration_minutes
+        self.notes_preview = notes_preview
+        self.notes_truncated = bool(notes_truncated)
+        self.subject_id = subject_id
+        self.subject_name = subject_name
+        self.subject_color = subject_color
+    
+    @property
+    def duration_hours(self):
+        """Restituisce la durata in ore (formato decimale)"""
+        return round(self.duration_minutes / 60, 2)
+    
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+    
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+    
+    def __repr__(self):
+        return f'<SessionRow {self.id} {self.topic} - {self.duration_minutes}min>'
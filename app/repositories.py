@@ -2,10 +2,126 @@
 Repository Pattern per l'accesso ai dati
 Separa la logica di business dalla logica di accesso al database
 """
-from datetime import datetime
-from sqlalchemy import func, extract
-from app import db
-from app.models import User, Subject, StudySession
+import base64
+import re
+import secrets
+import time
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, extract, insert, select, delete, tuple_, table, column, \
+    literal_column, text, cast, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db, password_hasher, transactions
+from app.hashing import HashingBusy
+from app.models import User, Subject, StudySession, UserStats, UserSubjectStats, UserMonthStats, \
+    UserPeriodStats, Goal, UserDayStats, PlannedSession, StudyGroup, GroupMembership, LeaderboardEntry, \
+    SyncTombstone
+from app.read_models import SessionRow
+
+
+def encode_cursor(study_session):
+    """Codifica la chiave (date, created_at, id) di una sessione in un cursore opaco"""
+    raw = f'{study_session.date.isoformat()}|{study_session.created_at.isoformat()}|{study_session.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica un cursore prodotto da encode_cursor
+    Solleva ValueError se il cursore non è valido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date_str, created_str, id_str = base64.urlsafe_b64decode(padded).decode().split('|')
+        return (datetime.strptime(date_str, '%Y-%m-%d').date(),
+                datetime.fromisoformat(created_str),
+                int(id_str))
+    except (ValueError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError('Cursore non valido') from e
+
+
+# Sorgenti delle modifiche sincronizzate, nell'ordine in cui sono restituite a parità di
+# numero di modifica (le materie prima delle sessioni che le usano)
+SYNC_SOURCES = ('subjects', 'sessions', 'deleted')
+
+
+def encode_sync_cursor(change_seq, source, last_id):
+    """Codifica la posizione (numero di modifica, sorgente, id) nel flusso delle modifiche"""
+    raw = f'{change_seq}|{source}|{last_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_sync_cursor(cursor):
+    """
+    Decodifica un cursore prodotto da encode_sync_cursor
+    Solleva ValueError se il cursore non è valido
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        change_seq, source, last_id = (int(part) for part in
+                                       base64.urlsafe_b64decode(padded).decode().split('|'))
+    except (ValueError, UnicodeDecodeError, TypeError) as e:
+        raise ValueError('Cursore non valido') from e
+    if not 0 <= source < len(SYNC_SOURCES):
+        raise ValueError('Cursore non valido')
+    return change_seq, source, last_id
+
+
+TREND_GRANULARITIES = ('day', 'week', 'month', 'year')
+
+# Periodi degli obiettivi (e dei riepiloghi user_period_stats)
+GOAL_PERIODS = ('week', 'month')
+
+# Periodi delle classifiche di gruppo: settimana (dal lunedì) e totale complessivo,
+# registrato con una data di inizio convenzionale
+LEADERBOARD_PERIODS = ('week', 'all')
+ALL_TIME_START = date(1970, 1, 1)
+
+
+def leaderboard_start(day, period):
+    """Data di inizio della classifica del periodo che contiene day"""
+    return period_start(day, 'week') if period == 'week' else ALL_TIME_START
+
+
+def period_start(day, period):
+    """Primo giorno del periodo che contiene day: lunedì della settimana o primo del mese"""
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _trend_bucket_expression(granularity):
+    """Espressione SQL (SQLite) che restituisce la data di inizio dell'intervallo in formato ISO"""
+    if granularity == 'day':
+        return func.date(StudySession.date)
+    if granularity == 'week':
+        # Lunedì della settimana (settimane lunedì-domenica)
+        return func.date(StudySession.date, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return func.strftime('%Y-%m-01', StudySession.date)
+    return func.strftime('%Y-01-01', StudySession.date)
+
+
+def _trend_bucket_starts(start, end, granularity):
+    """Genera le date di inizio di tutti gli intervalli che coprono [start, end]"""
+    if granularity == 'day':
+        current = start
+    elif granularity == 'week':
+        current = start - timedelta(days=start.weekday())
+    elif granularity == 'month':
+        current = start.replace(day=1)
+    else:
+        current = start.replace(month=1, day=1)
+    
+    while current <= end:
+        yield current
+        if granularity == 'day':
+            current += timedelta(days=1)
+        elif granularity == 'week':
+            current += timedelta(weeks=1)
+        elif granularity == 'month':
+            current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
+        else:
+            current = date(current.year + 1, 1, 1)
 
 
 class UserRepository:
@@ -15,9 +131,29 @@ class UserRepository:
     def create(username, email, password):
         """Crea un nuovo utente"""
         user = User(username=username, email=email)
-        user.set_password(password)
+        user.password_hash = password_hasher.hash(password)
         db.session.add(user)
-        db.session.commit()
+        transactions.commit()
+        return user
+    
+    @staticmethod
+    def authenticate(username, password):
+        """
+        Verifica le credenziali e restituisce l'utente, oppure None
+        Se l'hash è stato calcolato con parametri diversi da quelli configurati
+        viene ricalcolato in modo trasparente (la password in chiaro è disponibile solo qui).
+        """
+        user = UserRepository.find_by_username(username)
+        if not user or not password_hasher.verify(user.password_hash, password):
+            return None
+        
+        try:
+            if password_hasher.needs_rehash(user.password_hash):
+                user.password_hash = password_hasher.hash(password)
+                transactions.commit()
+        except HashingBusy:
+            # Il ricalcolo non è indispensabile: si riproverà al prossimo login
+            pass
         return user
     
     @staticmethod
@@ -41,6 +177,11 @@ class UserRepository:
         return User.query.filter(
             (User.username == username) | (User.email == email)
         ).first() is not None
+    
+    @staticmethod
+    def delete(user, batch_size=1000, on_progress=None):
+        """Elimina un utente con tutti i suoi dati (a blocchi, vedi PurgeRepository)"""
+        return PurgeRepository.purge_user(user, batch_size, on_progress)
 
 
 class SubjectRepository:
@@ -53,20 +194,70 @@ class SubjectRepository:
             name=name,
             user_id=user_id,
             description=description,
-            color=color
+            color=color,
+            change_seq=StatsRepository.next_change_seq(user_id)
         )
         db.session.add(subject)
-        db.session.commit()
+        StatsRepository.apply_subject_delta(user_id, 1)
+        transactions.commit()
         return subject
     
     @staticmethod
+    @transactions.memoized
     def find_all_by_user(user_id):
         """Trova tutte le materie di un utente"""
         return Subject.query.filter_by(user_id=user_id).order_by(Subject.name).all()
     
+    @staticmethod
+    def name_map(user_id):
+        """Mappa nome materia (senza distinzione maiuscole/minuscole) → id, con una sola query"""
+        return {
+            name.casefold(): subject_id
+            for subject_id, name in db.session.query(Subject.id, Subject.name)
+                                              .filter(Subject.user_id == user_id)
+        }
+    
+    @staticmethod
+    def find_all_with_stats(user_id):
+        """
+        Trova tutte le materie di un utente con numero di sessioni e minuti totali
+        calcolati in un'unica query (LEFT JOIN + GROUP BY), senza caricare le sessioni.
+        Restituisce una lista di dizionari con: subject, session_count, total_minutes, total_hours
+        """
+        results = db.session.query(
+            Subject,
+            func.count(StudySession.id).label('session_count'),
+            func.coalesce(func.sum(StudySession.duration_minutes), 0).label('total_minutes')
+        ).outerjoin(StudySession, StudySession.subject_id == Subject.id)\
+         .filter(Subject.user_id == user_id)\
+         .group_by(Subject.id)\
+         .order_by(Subject.name)\
+         .all()
+        
+        return [
+            {
+                'subject': r[0],
+                'session_count': r[1],
+                'total_minutes': r[2],
+                'total_hours': round(r[2] / 60, 2)
+            }
+            for r in results
+        ]
+    
     @staticmethod
     def find_by_id(subject_id, user_id):
-        """Trova una materia per ID (verificando che appartenga all'utente)"""
+        """
+        Trova una materia per ID (verificando che appartenga all'utente)
+        In un'unità di lavoro che ha già caricato le materie dell'utente non esegue query
+        """
+        subjects = transactions.cached(SubjectRepository.find_all_by_user, user_id)
+        if subjects is not None:
+            return next((s for s in subjects if s.id == subject_id), None)
+        return SubjectRepository._find_by_id(subject_id, user_id)
+    
+    @staticmethod
+    @transactions.memoized
+    def _find_by_id(subject_id, user_id):
         return Subject.query.filter_by(id=subject_id, user_id=user_id).first()
     
     @staticmethod
@@ -77,14 +268,15 @@ class SubjectRepository:
             subject.description = description
         if color:
             subject.color = color
-        db.session.commit()
+        subject.change_seq = StatsRepository.next_change_seq(subject.user_id)
+        StatsRepository.bump_version(subject.user_id)
+        transactions.commit()
         return subject
     
     @staticmethod
-    def delete(subject):
-        """Elimina una materia"""
-        db.session.delete(subject)
-        db.session.commit()
+    def delete(subject, batch_size=1000, on_progress=None):
+        """Elimina una materia con le sue sessioni (a blocchi, vedi PurgeRepository)"""
+        return PurgeRepository.purge_subject(subject, batch_size, on_progress)
     
     @staticmethod
     def count_by_user(user_id):
@@ -104,12 +296,40 @@ class StudySessionRepository:
             subject_id=subject_id,
             user_id=user_id,
             date=date or datetime.utcnow().date(),
-            notes=notes
+            notes=notes,
+            change_seq=StatsRepository.next_change_seq(user_id)
         )
         db.session.add(session)
-        db.session.commit()
+        StatsRepository.apply_session_delta(
+            user_id, subject_id, session.date, duration_minutes, 1)
+        transactions.commit()
         return session
     
+    @staticmethod
+    def bulk_create(user_id, rows):
+        """
+        Inserisce molte sessioni con un unico INSERT executemany e aggiorna i riepiloghi
+        con un delta per riga di riepilogo, il tutto in una sola transazione.
+        rows: lista di dizionari con topic, duration_minutes, subject_id, date, notes
+        (le materie devono essere già state verificate come appartenenti all'utente)
+        """
+        if not rows:
+            return 0
+        
+        created_at = datetime.utcnow()
+        change_seq = StatsRepository.next_change_seq(user_id)
+        db.session.execute(
+            insert(StudySession),
+            [dict(row, user_id=user_id, created_at=created_at, updated_at=created_at,
+                  change_seq=change_seq) for row in rows]
+        )
+        
+        StatsRepository.apply_session_deltas(
+            (user_id, row['subject_id'], row['date'], row['duration_minutes'], 1) for row in rows)
+        
+        transactions.commit()
+        return len(rows)
+    
     @staticmethod
     def find_all_by_user(user_id, limit=None):
         """Trova tutte le sessioni di un utente"""
@@ -121,6 +341,111 @@ class StudySessionRepository:
         
         return query.all()
     
+    @staticmethod
+    def _row_query(notes_chars):
+        """
+        Proiezione per SessionRow: solo le colonne mostrate negli elenchi, note troncate
+        a notes_chars caratteri in SQL e materia in join (nessun caricamento lazy per riga)
+        """
+        return db.session.query(
+            StudySession.id,
+            StudySession.date,
+            StudySession.created_at,
+            StudySession.topic,
+            StudySession.duration_minutes,
+            func.substr(StudySession.notes, 1, notes_chars),
+            func.length(StudySession.notes) > notes_chars,
+            StudySession.subject_id,
+            Subject.name,
+            Subject.color
+        ).join(Subject, Subject.id == StudySession.subject_id)
+    
+    @staticmethod
+    def find_page_by_user(user_id, per_page=20, cursor=None, subject_id=None,
+                          date_from=None, date_to=None, rows=False, notes_chars=50):
+        """
+        Paginazione keyset delle sessioni di un utente, ordinate per
+        (date, created_at, id) decrescenti, con filtri opzionali eseguiti in SQL.
+        Con rows=True restituisce SessionRow di sola lettura invece delle istanze ORM.
+        Restituisce una tupla (sessioni, cursore_pagina_successiva o None)
+        """
+        if rows:
+            query = StudySessionRepository._row_query(notes_chars)\
+                .filter(StudySession.user_id == user_id)
+        else:
+            query = StudySession.query.filter(StudySession.user_id == user_id)
+        
+        if subject_id:
+            query = query.filter(StudySession.subject_id == subject_id)
+        if date_from:
+            query = query.filter(StudySession.date >= date_from)
+        if date_to:
+            query = query.filter(StudySession.date <= date_to)
+        if cursor:
+            query = query.filter(
+                tuple_(StudySession.date, StudySession.created_at, StudySession.id)
+                < decode_cursor(cursor)
+            )
+        
+        # Si legge una riga in più per sapere se esiste una pagina successiva
+        sessions = query.order_by(StudySession.date.desc(),
+                                  StudySession.created_at.desc(),
+                                  StudySession.id.desc())\
+            .limit(per_page + 1).all()
+        
+        if rows:
+            sessions = [SessionRow(*row) for row in sessions]
+        
+        next_cursor = None
+        if len(sessions) > per_page:
+            sessions = sessions[:per_page]
+            next_cursor = encode_cursor(sessions[-1])
+        
+        return sessions, next_cursor
+    
+    @staticmethod
+    def iter_export_rows(user_id, chunk_size=1000):
+        """
+        Itera sulle sessioni di un utente per l'esportazione, leggendo solo le colonne
+        necessarie (con nome e colore della materia) a blocchi dal cursore:
+        la memoria resta costante qualunque sia la dimensione dello storico
+        """
+        stmt = select(
+            StudySession.date,
+            Subject.name,
+            StudySession.topic,
+            StudySession.duration_minutes,
+            StudySession.notes,
+            Subject.color
+        ).join(StudySession.subject)\
+         .where(StudySession.user_id == user_id)\
+         .order_by(StudySession.date, StudySession.created_at, StudySession.id)
+        
+        result = db.session.execute(stmt, execution_options={'yield_per': chunk_size})
+        try:
+            yield from result
+        finally:
+            result.close()
+    
+    @staticmethod
+    def analytics_columns(user_id):
+        """
+        Colonne delle sessioni di un utente per le statistiche avanzate, tutte intere:
+        (giorno dal 1970-01-01, subject_id, duration_minutes, fascia di registrazione o -1).
+        La fascia è giorno della settimana (lunedì = 0) × 24 + ora, entrambi da created_at
+        (UTC). Le conversioni di data e ora avvengono in SQL, così le righe non passano dal
+        parsing Python di Date/DateTime e si copiano direttamente in un array NumPy
+        """
+        logged_weekday = (cast(func.strftime('%w', StudySession.created_at), Integer) + 6) % 7
+        logged_hour = cast(func.strftime('%H', StudySession.created_at), Integer)
+        stmt = select(
+            cast(func.julianday(StudySession.date) - 2440587.5, Integer),
+            StudySession.subject_id,
+            StudySession.duration_minutes,
+            func.coalesce(logged_weekday * 24 + logged_hour, -1)
+        ).where(StudySession.user_id == user_id)
+        return db.session.execute(stmt).all()
+    
     @staticmethod
     def find_by_id(session_id, user_id):
         """Trova una sessione per ID (verificando che appartenga all'utente)"""
@@ -132,22 +457,65 @@ class StudySessionRepository:
         return StudySession.query.filter_by(subject_id=subject_id, user_id=user_id)\
             .order_by(StudySession.date.desc()).all()
     
+    @staticmethod
+    def iter_rows_by_subject(subject_id, user_id, notes_chars=80, chunk_size=500):
+        """
+        Itera sulle sessioni di una materia come SessionRow (dalla più recente),
+        leggendole a blocchi dal cursore: adatto al rendering in streaming
+        """
+        query = StudySessionRepository._row_query(notes_chars)\
+            .filter(StudySession.user_id == user_id, StudySession.subject_id == subject_id)\
+            .order_by(StudySession.date.desc(), StudySession.created_at.desc(),
+                      StudySession.id.desc())\
+            .execution_options(yield_per=chunk_size)
+        for row in query:
+            yield SessionRow(*row)
+    
+    @staticmethod
+    def find_rows_by_subject(subject_id, user_id, notes_chars=80):
+        """Sessioni di una materia come lista di SessionRow di sola lettura"""
+        return list(StudySessionRepository.iter_rows_by_subject(subject_id, user_id, notes_chars))
+    
+    @staticmethod
+    def totals_by_subject(subject_id, user_id):
+        """
+        Calcola numero di sessioni e minuti totali di una materia con una query aggregata
+        Restituisce una tupla (session_count, total_minutes)
+        """
+        result = db.session.query(
+            func.count(StudySession.id),
+            func.coalesce(func.sum(StudySession.duration_minutes), 0)
+        ).filter(
+            StudySession.subject_id == subject_id,
+            StudySession.user_id == user_id
+        ).one()
+        return result[0], result[1]
+    
     @staticmethod
     def update(session, topic, duration_minutes, subject_id, date, notes=None):
         """Aggiorna una sessione di studio"""
+        # Si storna il contributo precedente e si applica quello nuovo
+        StatsRepository.apply_session_deltas([
+            (session.user_id, session.subject_id, session.date, -session.duration_minutes, -1),
+            (session.user_id, subject_id, date, duration_minutes, 1)
+        ])
         session.topic = topic
         session.duration_minutes = duration_minutes
         session.subject_id = subject_id
         session.date = date
         session.notes = notes
-        db.session.commit()
+        session.change_seq = StatsRepository.next_change_seq(session.user_id)
+        transactions.commit()
         return session
     
     @staticmethod
     def delete(session):
         """Elimina una sessione di studio"""
+        StatsRepository.apply_session_delta(
+            session.user_id, session.subject_id, session.date, -session.duration_minutes, -1)
+        SyncRepository.add_tombstone(session.user_id, 'session', session.id)
         db.session.delete(session)
-        db.session.commit()
+        transactions.commit()
     
     @staticmethod
     def count_by_user(user_id):
@@ -198,31 +566,1341 @@ class StudySessionRepository:
         if not year:
             year = datetime.utcnow().year
         
-        results = db.session.query(
-            extract('month', StudySession.date).label('month'),
-            func.sum(StudySession.duration_minutes).label('total_minutes')
-        ).filter(
-            StudySession.user_id == user_id,
-            extract('year', StudySession.date) == year
-        ).group_by('month')\
-         .order_by('month')\
-         .all()
+        buckets = StudySessionRepository.study_trend(
+            user_id, date(year, 1, 1), date(year, 12, 31), granularity='month')
         
         return [
             {
-                'month': int(r[0]),
-                'total_hours': round(r[1] / 60, 2)
+                'month': b['start'].month,
+                'total_hours': b['total_hours']
             }
-            for r in results
+            for b in buckets if b['session_count']
         ]
     
+    @staticmethod
+    def study_trend(user_id, start, end, granularity='month'):
+        """
+        Calcola le ore studiate per intervallo (giorno, settimana, mese o anno)
+        nel periodo [start, end], includendo anche gli intervalli senza sessioni.
+        Il filtro usa un range sulla colonna date (sfrutta l'indice user_id, date).
+        Restituisce una lista di dizionari con: start, session_count, total_minutes, total_hours
+        """
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f'Granularità non valida: {granularity}')
+        
+        bucket = _trend_bucket_expression(granularity)
+        results = db.session.query(
+            bucket.label('bucket'),
+            func.count(StudySession.id),
+            func.sum(StudySession.duration_minutes)
+        ).filter(
+            StudySession.user_id == user_id,
+            StudySession.date >= start,
+            StudySession.date <= end
+        ).group_by('bucket')\
+         .all()
+        
+        totals = {r[0]: (r[1], r[2]) for r in results}
+        
+        # Riempimento degli intervalli vuoti
+        buckets = []
+        for bucket_start in _trend_bucket_starts(start, end, granularity):
+            count, minutes = totals.get(bucket_start.isoformat(), (0, 0))
+            buckets.append({
+                'start': bucket_start,
+                'session_count': count,
+                'total_minutes': minutes,
+                'total_hours': round(minutes / 60, 2)
+            })
+        return buckets
+    
+    @staticmethod
+    def recent_sessions_summary(user_id, days=7, limit=5):
+        """
+        Ultime sessioni degli ultimi N giorni come SessionRow (serializzabili in cache),
+        con nome e colore della materia letti nella stessa query
+        """
+        date_threshold = datetime.utcnow().date() - timedelta(days=days)
+        
+        results = StudySessionRepository._row_query(0)\
+            .filter(StudySession.user_id == user_id,
+                    StudySession.date >= date_threshold)\
+            .order_by(StudySession.date.desc(), StudySession.created_at.desc())\
+            .limit(limit)\
+            .all()
+        
+        return [SessionRow(*r) for r in results]
+    
     @staticmethod
     def get_recent_sessions(user_id, days=7):
         """Ottiene le sessioni degli ultimi N giorni"""
-        from datetime import timedelta
         date_threshold = datetime.utcnow().date() - timedelta(days=days)
         
         return StudySession.query.filter(
             StudySession.user_id == user_id,
             StudySession.date >= date_threshold
         ).order_by(StudySession.date.desc()).all()
+
+
+# Indice full-text delle sessioni (FTS5, creato dalla migrazione 0004)
+SEARCH_TABLE = table('study_sessions_fts', column('rowid'))
+# Marcatori dei termini trovati in titoli ed estratti (il template li trasforma in <mark>)
+SEARCH_MARK_START = '\x02'
+SEARCH_MARK_END = '\x03'
+# Numero massimo di parole considerate in una ricerca e lunghezza degli estratti (in token)
+MAX_SEARCH_TERMS = 8
+SEARCH_SNIPPET_TOKENS = 16
+
+_SEARCH_WORD = re.compile(r'\w+')
+
+
+def build_search_query(user_id, text_query):
+    """
+    Converte il testo inserito dall'utente in un'espressione MATCH di FTS5:
+    ogni parola è cercata come prefisso ("integr" trova "integrali") in argomento e note,
+    tutte devono essere presenti, e i risultati sono limitati all'utente.
+    Restituisce None se il testo non contiene parole.
+    """
+    words = _SEARCH_WORD.findall(text_query or '')[:MAX_SEARCH_TERMS]
+    if not words:
+        return None
+    terms = ' '.join(f'"{word}"*' for word in words)
+    return f'user_id : "{int(user_id)}" AND {{topic notes}} : ({terms})'
+
+
+class SearchRepository:
+    """Ricerca full-text nelle sessioni di studio (argomento e note)"""
+    
+    @staticmethod
+    def search(user_id, text_query, page=1, per_page=20):
+        """
+        Sessioni dell'utente che contengono tutte le parole cercate, ordinate per rilevanza
+        (bm25, con l'argomento che pesa più delle note). Restituisce (risultati, has_next):
+        i risultati sono dizionari con argomento evidenziato ed estratto delle note.
+        """
+        match = build_search_query(user_id, text_query)
+        if match is None:
+            return [], False
+        
+        fts = literal_column(SEARCH_TABLE.name)
+        rows = db.session.query(
+            StudySession.id,
+            StudySession.topic,
+            StudySession.date,
+            StudySession.duration_minutes,
+            Subject.name,
+            Subject.color,
+            func.highlight(fts, 0, SEARCH_MARK_START, SEARCH_MARK_END),
+            func.snippet(fts, 1, SEARCH_MARK_START, SEARCH_MARK_END, '…', SEARCH_SNIPPET_TOKENS)
+        ).select_from(SEARCH_TABLE)\
+         .join(StudySession, StudySession.id == SEARCH_TABLE.c.rowid)\
+         .join(Subject, Subject.id == StudySession.subject_id)\
+         .filter(fts.match(match), StudySession.user_id == user_id)\
+         .order_by(func.bm25(fts, 10.0, 1.0, 0.0), StudySession.date.desc(), StudySession.id.desc())\
+         .offset((page - 1) * per_page)\
+         .limit(per_page + 1)\
+         .all()
+        
+        results = [
+            {
+                'id': r[0],
+                'topic': r[1],
+                'date': r[2],
+                'duration_minutes': r[3],
+                'subject_name': r[4],
+                'subject_color': r[5],
+                'topic_highlight': r[6],
+                'notes_snippet': r[7] or None
+            }
+            for r in rows[:per_page]
+        ]
+        return results, len(rows) > per_page
+    
+    @staticmethod
+    def rebuild_index():
+        """Ricostruisce l'indice dalle sessioni esistenti; restituisce il numero di sessioni"""
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE.name} ({SEARCH_TABLE.name}) VALUES ('rebuild')"))
+        transactions.commit()
+        return db.session.query(func.count(StudySession.id)).scalar()
+    
+    @staticmethod
+    def optimize_index():
+        """Unisce i segmenti dell'indice (utile dopo importazioni massive)"""
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE.name} ({SEARCH_TABLE.name}) VALUES ('optimize')"))
+        transactions.commit()
+
+
+class GoalRepository:
+    """
+    Repository per gli obiettivi di studio
+    L'avanzamento non ricalcola le sessioni: si legge dai contatori per settimana e mese
+    (user_period_stats), aggiornati da StatsRepository.apply_session_delta.
+    """
+    
+    @staticmethod
+    def create(user_id, period, target_minutes, subject_id=None):
+        """Crea un obiettivo (subject_id None = tutte le materie)"""
+        if period not in GOAL_PERIODS:
+            raise ValueError(f'Periodo non valido: {period}')
+        goal = Goal(user_id=user_id, subject_id=subject_id, period=period,
+                    target_minutes=target_minutes)
+        db.session.add(goal)
+        StatsRepository.bump_version(user_id)
+        transactions.commit()
+        return goal
+    
+    @staticmethod
+    def find_by_id(goal_id, user_id):
+        """Trova un obiettivo per ID (verificando che appartenga all'utente)"""
+        return Goal.query.filter_by(id=goal_id, user_id=user_id).first()
+    
+    @staticmethod
+    def exists(user_id, period, subject_id=None):
+        """Verifica se esiste già un obiettivo per lo stesso periodo e materia"""
+        return Goal.query.filter_by(user_id=user_id, period=period, subject_id=subject_id)\
+            .first() is not None
+    
+    @staticmethod
+    def update(goal, target_minutes):
+        """Aggiorna le ore obiettivo"""
+        goal.target_minutes = target_minutes
+        StatsRepository.bump_version(goal.user_id)
+        transactions.commit()
+        return goal
+    
+    @staticmethod
+    def delete(goal):
+        """Elimina un obiettivo"""
+        StatsRepository.bump_version(goal.user_id)
+        db.session.delete(goal)
+        transactions.commit()
+    
+    @staticmethod
+    def progress(user_id, today):
+        """
+        Obiettivi dell'utente con l'avanzamento nel periodo in corso: una query per gli
+        obiettivi e una sui contatori del periodo (poche righe per materia), senza
+        scansioni delle sessioni. Restituisce una lista di dizionari con: id, period,
+        subject_name, subject_color, target_hours, done_hours, percentage, days_left
+        """
+        goals = db.session.query(Goal, Subject.name, Subject.color)\
+            .outerjoin(Subject, Subject.id == Goal.subject_id)\
+            .filter(Goal.user_id == user_id)\
+            .order_by(Goal.period.desc(), Goal.subject_id.is_not(None), Subject.name)\
+            .all()
+        if not goals:
+            return []
+        
+        starts = {period: period_start(today, period) for period in GOAL_PERIODS}
+        counters = db.session.query(
+            UserPeriodStats.period,
+            UserPeriodStats.subject_id,
+            UserPeriodStats.total_minutes
+        ).filter(
+            UserPeriodStats.user_id == user_id,
+            tuple_(UserPeriodStats.period, UserPeriodStats.period_start).in_(list(starts.items()))
+        )
+        
+        # Il totale complessivo del periodo è la somma dei contatori delle materie
+        done = {}
+        for period, subject_id, minutes in counters:
+            done[(period, subject_id)] = done.get((period, subject_id), 0) + minutes
+            done[(period, None)] = done.get((period, None), 0) + minutes
+        
+        ends = {
+            'week': starts['week'] + timedelta(days=6),
+            'month': date(today.year + today.month // 12, today.month % 12 + 1, 1) - timedelta(days=1)
+        }
+        result = []
+        for goal, subject_name, subject_color in goals:
+            minutes = done.get((goal.period, goal.subject_id), 0)
+            result.append({
+                'id': goal.id,
+                'period': goal.period,
+                'subject_id': goal.subject_id,
+                'subject_name': subject_name,
+                'subject_color': subject_color,
+                'target_minutes': goal.target_minutes,
+                'target_hours': goal.target_hours,
+                'done_minutes': minutes,
+                'done_hours': round(minutes / 60, 2),
+                'percentage': min(int(minutes / goal.target_minutes * 100), 100) if goal.target_minutes else 100,
+                'days_left': (ends[goal.period] - today).days + 1
+            })
+        return result
+
+
+class PlannerRepository:
+    """
+    Repository per il calendario: sessioni pianificate e totali giornalieri
+    I totali si leggono da user_day_stats, aggiornata da StatsRepository per le sessioni
+    svolte e da questo repository per quelle pianificate.
+    """
+    
+    @staticmethod
+    def create(user_id, subject_id, day, duration_minutes, topic):
+        """Pianifica una sessione di studio"""
+        plan = PlannedSession(user_id=user_id, subject_id=subject_id, date=day,
+                              duration_minutes=duration_minutes, topic=topic)
+        db.session.add(plan)
+        StatsRepository.apply_plan_delta(user_id, subject_id, day, duration_minutes, 1)
+        transactions.commit()
+        return plan
+    
+    @staticmethod
+    def find_by_id(plan_id, user_id):
+        """Trova una sessione pianificata per ID (verificando che appartenga all'utente)"""
+        return PlannedSession.query.filter_by(id=plan_id, user_id=user_id).first()
+    
+    @staticmethod
+    def delete(plan):
+        """Elimina una sessione pianificata"""
+        StatsRepository.apply_plan_delta(
+            plan.user_id, plan.subject_id, plan.date, -plan.duration_minutes, -1)
+        db.session.delete(plan)
+        transactions.commit()
+    
+    @staticmethod
+    def complete(plan, day, duration_minutes=None, notes=None):
+        """
+        Registra come svolta una sessione pianificata: crea la sessione di studio nel giorno
+        indicato e rimuove la pianificazione, nella stessa transazione
+        """
+        duration_minutes = duration_minutes or plan.duration_minutes
+        session = StudySession(
+            topic=plan.topic,
+            duration_minutes=duration_minutes,
+            subject_id=plan.subject_id,
+            user_id=plan.user_id,
+            date=day,
+            notes=notes,
+            change_seq=StatsRepository.next_change_seq(plan.user_id)
+        )
+        db.session.add(session)
+        StatsRepository.apply_session_delta(plan.user_id, plan.subject_id, day, duration_minutes, 1)
+        StatsRepository.apply_plan_delta(
+            plan.user_id, plan.subject_id, plan.date, -plan.duration_minutes, -1)
+        db.session.delete(plan)
+        transactions.commit()
+        return session
+    
+    @staticmethod
+    def day_buckets(user_id, start, end):
+        """
+        Totali per (giorno, materia) nel periodo [start, end] con una sola lettura
+        sull'intervallo della chiave primaria (user_id, day, subject_id).
+        Restituisce una lista di dizionari con: day, subject_id, subject_name, subject_color,
+        session_count, total_minutes, planned_count, planned_minutes
+        """
+        results = db.session.query(
+            UserDayStats.day,
+            UserDayStats.subject_id,
+            Subject.name,
+            Subject.color,
+            UserDayStats.session_count,
+            UserDayStats.total_minutes,
+            UserDayStats.planned_count,
+            UserDayStats.planned_minutes
+        ).join(Subject, Subject.id == UserDayStats.subject_id)\
+         .filter(UserDayStats.user_id == user_id,
+                 UserDayStats.day >= start,
+                 UserDayStats.day <= end,
+                 (UserDayStats.session_count > 0) | (UserDayStats.planned_count > 0))\
+         .order_by(UserDayStats.day, Subject.name)\
+         .all()
+        
+        return [
+            {
+                'day': r[0],
+                'subject_id': r[1],
+                'subject_name': r[2],
+                'subject_color': r[3],
+                'session_count': r[4],
+                'total_minutes': r[5],
+                'planned_count': r[6],
+                'planned_minutes': r[7]
+            }
+            for r in results
+        ]
+    
+    @staticmethod
+    def find_by_day(user_id, day):
+        """
+        Sessioni svolte e pianificate di un giorno (indici user_id, date).
+        Restituisce (sessioni, pianificate) come liste di dizionari
+        """
+        sessions = db.session.query(
+            StudySession.id,
+            StudySession.topic,
+            StudySession.duration_minutes,
+            Subject.name,
+            Subject.color
+        ).join(StudySession.subject)\
+         .filter(StudySession.user_id == user_id, StudySession.date == day)\
+         .order_by(StudySession.created_at, StudySession.id)\
+         .all()
+        plans = db.session.query(
+            PlannedSession.id,
+            PlannedSession.topic,
+            PlannedSession.duration_minutes,
+            Subject.name,
+            Subject.color
+        ).join(Subject, Subject.id == PlannedSession.subject_id)\
+         .filter(PlannedSession.user_id == user_id, PlannedSession.date == day)\
+         .order_by(PlannedSession.created_at, PlannedSession.id)\
+         .all()
+        
+        def as_dict(r):
+            return {'id': r[0], 'topic': r[1], 'duration_minutes': r[2],
+                    'subject_name': r[3], 'subject_color': r[4]}
+        
+        return [as_dict(r) for r in sessions], [as_dict(r) for r in plans]
+
+
+class GroupRepository:
+    """
+    Repository per i gruppi di studio e le appartenenze
+    Chi entra in un gruppo porta con sé i propri totali: le voci di classifica sono
+    inizializzate dai riepiloghi settimanali e complessivi già presenti.
+    """
+    
+    @staticmethod
+    def _new_invite_code():
+        """Codice d'invito casuale non ancora usato"""
+        while True:
+            code = secrets.token_urlsafe(6)
+            if not StudyGroup.query.filter_by(invite_code=code).first():
+                return code
+    
+    @staticmethod
+    def create(name, owner_id):
+        """Crea un gruppo con il proprietario come primo membro"""
+        group = StudyGroup(name=name, owner_id=owner_id,
+                           invite_code=GroupRepository._new_invite_code())
+        db.session.add(group)
+        db.session.flush()
+        GroupRepository._add_member(group, owner_id)
+        transactions.commit()
+        return group
+    
+    @staticmethod
+    def find_by_id(group_id, user_id):
+        """Trova un gruppo per ID (solo se l'utente ne fa parte)"""
+        return StudyGroup.query.join(GroupMembership, GroupMembership.group_id == StudyGroup.id)\
+            .filter(StudyGroup.id == group_id, GroupMembership.user_id == user_id)\
+            .first()
+    
+    @staticmethod
+    def find_by_invite_code(invite_code):
+        """Trova un gruppo dal codice d'invito"""
+        return StudyGroup.query.filter_by(invite_code=invite_code).first()
+    
+    @staticmethod
+    def find_all_by_user(user_id):
+        """
+        Gruppi dell'utente con il numero di membri.
+        Restituisce una lista di dizionari con: id, name, invite_code, is_owner, member_count
+        """
+        own = select(GroupMembership.group_id).where(GroupMembership.user_id == user_id)
+        members = db.session.query(
+            GroupMembership.group_id,
+            func.count(GroupMembership.user_id).label('member_count')
+        ).filter(GroupMembership.group_id.in_(own))\
+         .group_by(GroupMembership.group_id)\
+         .subquery()
+        
+        results = db.session.query(StudyGroup, members.c.member_count)\
+            .join(members, members.c.group_id == StudyGroup.id)\
+            .order_by(StudyGroup.name)\
+            .all()
+        
+        return [
+            {
+                'id': group.id,
+                'name': group.name,
+                'invite_code': group.invite_code,
+                'is_owner': group.owner_id == user_id,
+                'member_count': member_count
+            }
+            for group, member_count in results
+        ]
+    
+    @staticmethod
+    def is_member(group_id, user_id):
+        """Verifica se l'utente fa parte del gruppo"""
+        return db.session.get(GroupMembership, (group_id, user_id)) is not None
+    
+    @staticmethod
+    def member_count(group_id):
+        """Numero di membri del gruppo"""
+        return db.session.query(func.count(GroupMembership.user_id))\
+            .filter(GroupMembership.group_id == group_id)\
+            .scalar()
+    
+    @staticmethod
+    def join(group, user_id):
+        """Aggiunge l'utente al gruppo con i suoi totali già registrati"""
+        GroupRepository._add_member(group, user_id)
+        transactions.commit()
+    
+    @staticmethod
+    def _add_member(group, user_id):
+        """Crea l'appartenenza e le voci di classifica del nuovo membro (senza commit)"""
+        db.session.add(GroupMembership(group_id=group.id, user_id=user_id))
+        
+        # Una voce per ogni settimana con sessioni: somma dei contatori delle materie
+        weeks = db.session.query(
+            UserPeriodStats.period_start,
+            func.sum(UserPeriodStats.session_count),
+            func.sum(UserPeriodStats.total_minutes)
+        ).filter(UserPeriodStats.user_id == user_id, UserPeriodStats.period == 'week')\
+         .group_by(UserPeriodStats.period_start)\
+         .having(func.sum(UserPeriodStats.session_count) > 0)
+        db.session.add_all(
+            LeaderboardEntry(group_id=group.id, period='week', period_start=start, user_id=user_id,
+                             session_count=count, total_minutes=minutes)
+            for start, count, minutes in weeks
+        )
+        
+        # Il totale complessivo c'è sempre, anche a zero: ogni membro compare in classifica
+        user_stats = StatsRepository.get_user_stats(user_id)
+        db.session.add(LeaderboardEntry(
+            group_id=group.id, period='all', period_start=ALL_TIME_START, user_id=user_id,
+            session_count=user_stats.session_count, total_minutes=user_stats.total_minutes))
+    
+    @staticmethod
+    def leave(group, user_id):
+        """Rimuove l'utente dal gruppo; il gruppo rimasto senza membri viene eliminato"""
+        LeaderboardEntry.query.filter_by(group_id=group.id, user_id=user_id)\
+            .delete(synchronize_session=False)
+        GroupMembership.query.filter_by(group_id=group.id, user_id=user_id)\
+            .delete(synchronize_session=False)
+        if not GroupRepository.member_count(group.id):
+            db.session.delete(group)
+        elif group.owner_id == user_id:
+            group.owner_id = None
+        transactions.commit()
+    
+    @staticmethod
+    def delete(group):
+        """Elimina un gruppo (appartenenze e classifiche sono rimosse a cascata)"""
+        db.session.delete(group)
+        transactions.commit()
+
+
+class LeaderboardRepository:
+    """
+    Repository per le classifiche dei gruppi
+    Le voci sono aggiornate da StatsRepository.apply_session_deltas a ogni modifica delle
+    sessioni. L'indice (group_id, period, period_start, total_minutes DESC, user_id) le
+    mantiene ordinate: i primi K si leggono con una discesa nell'albero e K passi. La
+    posizione di un membro invece conta le voci dell'indice che lo precedono: il costo è
+    O(posizione), non logaritmico (SQLite non mantiene conteggi nei nodi dell'albero), ma
+    resta limitato ai membri del gruppo e non accede alla tabella.
+    """
+    
+    @staticmethod
+    def top(group_id, period, start, limit=10):
+        """
+        Primi `limit` membri della classifica, a pari merito con la stessa posizione.
+        Restituisce una lista di dizionari con: rank, user_id, username, session_count,
+        total_minutes, total_hours
+        """
+        results = db.session.query(
+            LeaderboardEntry.user_id,
+            User.username,
+            LeaderboardEntry.session_count,
+            LeaderboardEntry.total_minutes
+        ).join(User, User.id == LeaderboardEntry.user_id)\
+         .filter(LeaderboardEntry.group_id == group_id,
+                 LeaderboardEntry.period == period,
+                 LeaderboardEntry.period_start == start)\
+         .order_by(LeaderboardEntry.total_minutes.desc(), LeaderboardEntry.user_id)\
+         .limit(limit)\
+         .all()
+        
+        leaderboard = []
+        for position, (user_id, username, count, minutes) in enumerate(results, start=1):
+            if leaderboard and leaderboard[-1]['total_minutes'] == minutes:
+                position = leaderboard[-1]['rank']
+            leaderboard.append({
+                'rank': position,
+                'user_id': user_id,
+                'username': username,
+                'session_count': count,
+                'total_minutes': minutes,
+                'total_hours': round(minutes / 60, 2)
+            })
+        return leaderboard
+    
+    @staticmethod
+    def rank(group_id, period, start, user_id):
+        """
+        Posizione del membro in classifica (1 + membri con più minuti) e suoi totali.
+        Il conteggio scorre le voci dell'indice davanti al membro: costo O(posizione).
+        Restituisce un dizionario con: rank, session_count, total_minutes, total_hours
+        """
+        entry = db.session.get(LeaderboardEntry, (group_id, period, start, user_id))
+        count, minutes = (entry.session_count, entry.total_minutes) if entry else (0, 0)
+        ahead = db.session.query(func.count())\
+            .select_from(LeaderboardEntry)\
+            .filter(LeaderboardEntry.group_id == group_id,
+                    LeaderboardEntry.period == period,
+                    LeaderboardEntry.period_start == start,
+                    LeaderboardEntry.total_minutes > minutes)\
+            .scalar()
+        return {
+            'rank': ahead + 1,
+            'session_count': count,
+            'total_minutes': minutes,
+            'total_hours': round(minutes / 60, 2)
+        }
+
+
+class SyncRepository:
+    """
+    Repository per la sincronizzazione incrementale dei client offline
+    Ogni scrittura di materie e sessioni registra sulla riga il numero di modifica
+    dell'utente (UserStats.change_seq); le eliminazioni lasciano una traccia in
+    sync_tombstones. Le modifiche successive a un cursore sono range scan sugli indici
+    (user_id, change_seq, id): il costo dipende da quanto è cambiato, non dallo storico.
+    """
+    
+    @staticmethod
+    def add_tombstone(user_id, entity, entity_id, change_seq=None):
+        """Registra l'eliminazione di una materia o sessione (senza commit)"""
+        db.session.add(SyncTombstone(
+            user_id=user_id, entity=entity, entity_id=entity_id,
+            change_seq=change_seq or StatsRepository.next_change_seq(user_id)))
+    
+    @staticmethod
+    def changes(user_id, cursor=None, limit=500):
+        """
+        Modifiche successive al cursore, al massimo `limit`, ordinate per (numero di
+        modifica, sorgente, id). Senza cursore restituisce lo stato completo.
+        Restituisce un dizionario con: subjects, sessions (istanze ORM), deleted
+        (SyncTombstone), cursor (da passare alla richiesta successiva) e has_more
+        """
+        position = decode_sync_cursor(cursor) if cursor else (-1, 0, 0)
+        change_seq, source, last_id = position
+        
+        # Da ogni sorgente bastano `limit` + 1 righe: le prime `limit` dell'unione ordinata
+        # stanno sicuramente tra queste
+        items = []
+        for index, model in enumerate((Subject, StudySession, SyncTombstone)):
+            if index < source:
+                after = model.change_seq > change_seq
+            elif index == source:
+                after = tuple_(model.change_seq, model.id) > tuple_(change_seq, last_id)
+            else:
+                after = model.change_seq >= change_seq
+            rows = model.query.filter(model.user_id == user_id, after)\
+                .order_by(model.change_seq, model.id)\
+                .limit(limit + 1)\
+                .all()
+            items.extend((row.change_seq, index, row.id, row) for row in rows)
+        
+        items.sort(key=lambda item: item[:3])
+        page = items[:limit]
+        result = {name: [] for name in SYNC_SOURCES}
+        for _, index, _, row in page:
+            result[SYNC_SOURCES[index]].append(row)
+        if page:
+            position = page[-1][:3]
+        result['cursor'] = encode_sync_cursor(*position)
+        result['has_more'] = len(items) > limit
+        return result
+    
+    @staticmethod
+    def apply_push(user_id, subjects, sessions, deletions):
+        """
+        Applica in una sola transazione le modifiche inviate da un client, già validate
+        (vedi app.sync): prima le materie, poi le sessioni, infine le eliminazioni.
+        Le righe esistenti sono caricate con una query per tipo. Una modifica o eliminazione
+        è in conflitto se la riga è stata scritta dopo la versione vista dal client
+        (base_seq diverso da change_seq) o non esiste più: in quel caso non viene applicata
+        e il risultato riporta lo stato del server.
+        Restituisce un dizionario {'subjects': [...], 'sessions': [...], 'deleted': [...]}
+        con un risultato per elemento (status: created, updated, deleted, conflict)
+        """
+        results = {name: [] for name in SYNC_SOURCES}
+        if not (subjects or sessions or deletions):
+            return results
+        change_seq = StatsRepository.next_change_seq(user_id)
+        
+        def load(model, ids):
+            ids = list(ids)
+            if not ids:
+                return {}
+            return {row.id: row for row in model.query.filter(model.user_id == user_id,
+                                                              model.id.in_(ids))}
+        
+        existing_subjects = load(Subject, {item['id'] for item in subjects if item.get('id')} |
+                                 {item['id'] for item in deletions if item['entity'] == 'subject'})
+        existing_sessions = load(StudySession, {item['id'] for item in sessions if item.get('id')} |
+                                 {item['id'] for item in deletions if item['entity'] == 'session'})
+        
+        def conflict(item, row):
+            return {'client_id': item.get('client_id'), 'id': item.get('id'),
+                    'status': 'conflict', 'reason': 'deleted' if row is None else 'modified',
+                    'current': row}
+        
+        # Materie: le nuove ricevono l'id al flush, per le sessioni che le indicano con client_id
+        created_subjects = {}
+        subject_count = 0
+        for item in subjects:
+            if item.get('id'):
+                subject = existing_subjects.get(item['id'])
+                if subject is None or subject.change_seq != item['base_seq']:
+                    results['subjects'].append(conflict(item, subject))
+                    continue
+                status = 'updated'
+            else:
+                subject = Subject(user_id=user_id)
+                db.session.add(subject)
+                subject_count += 1
+                status = 'created'
+            subject.name = item['name']
+            subject.description = item.get('description')
+            subject.color = item.get('color') or subject.color or '#3498db'
+            subject.change_seq = change_seq
+            if item.get('client_id'):
+                created_subjects[item['client_id']] = subject
+            results['subjects'].append({'client_id': item.get('client_id'), 'status': status,
+                                        'row': subject})
+        if subject_count:
+            StatsRepository.apply_subject_delta(user_id, subject_count)
+        db.session.flush()
+        subject_ids = {row[0] for row in db.session.query(Subject.id).filter(Subject.user_id == user_id)}
+        
+        deltas = []
+        new_sessions = []
+        for item in sessions:
+            if item.get('subject_client_id'):
+                subject = created_subjects.get(item['subject_client_id'])
+                subject_id = subject.id if subject is not None else None
+            else:
+                subject_id = item.get('subject_id')
+            if subject_id not in subject_ids:
+                results['sessions'].append({'client_id': item.get('client_id'), 'id': item.get('id'),
+                                            'status': 'invalid', 'error': 'Materia non valida'})
+                continue
+            
+            values = {'topic': item['topic'], 'duration_minutes': item['duration_minutes'],
+                      'date': item['date'], 'notes': item.get('notes'), 'subject_id': subject_id,
+                      'change_seq': change_seq}
+            result = {'client_id': item.get('client_id'), 'status': 'created', 'row': None}
+            if item.get('id'):
+                study_session = existing_sessions.get(item['id'])
+                if study_session is None or study_session.change_seq != item['base_seq']:
+                    results['sessions'].append(conflict(item, study_session))
+                    continue
+                deltas.append((user_id, study_session.subject_id, study_session.date,
+                               -study_session.duration_minutes, -1))
+                for name, value in values.items():
+                    setattr(study_session, name, value)
+                result.update(status='updated', row=study_session)
+            else:
+                new_sessions.append((values, result))
+            deltas.append((user_id, subject_id, item['date'], item['duration_minutes'], 1))
+            results['sessions'].append(result)
+        
+        # Le sessioni nuove con un solo INSERT a più righe (come bulk_create): RETURNING
+        # restituisce le righe create, senza rileggerle. SQLite assegna gli id crescenti
+        # nell'ordine dei VALUES (l'ordine delle righe di RETURNING invece non è garantito)
+        if new_sessions:
+            created_at = datetime.utcnow()
+            created = sorted(db.session.scalars(
+                insert(StudySession).returning(StudySession),
+                [dict(values, user_id=user_id, created_at=created_at, updated_at=created_at)
+                 for values, _ in new_sessions]
+            ).all(), key=lambda study_session: study_session.id)
+            for (_, result), study_session in zip(new_sessions, created):
+                result['row'] = study_session
+        
+        # Le sessioni si eliminano prima delle materie: i riepiloghi ricevono tutte le variazioni
+        # delle sessioni, poi remove_subject sottrae ciò che resta delle materie eliminate
+        deletions = sorted(deletions, key=lambda item: item['entity'] == 'subject')
+        for item in deletions:
+            if item['entity'] == 'subject' and deltas is not None:
+                StatsRepository.apply_session_deltas(deltas)
+                deltas = None
+            existing = existing_subjects if item['entity'] == 'subject' else existing_sessions
+            row = existing.get(item['id'])
+            if row is None and SyncTombstone.query.filter_by(
+                    user_id=user_id, entity=item['entity'], entity_id=item['id']).first():
+                # Già eliminata: l'eliminazione è idempotente
+                results['deleted'].append({'entity': item['entity'], 'id': item['id'], 'status': 'deleted'})
+                continue
+            if row is None or row.change_seq != item['base_seq']:
+                results['deleted'].append(dict(conflict(item, row), entity=item['entity']))
+                continue
+            if item['entity'] == 'subject':
+                # Le sessioni della materia sono eliminate a cascata dal database
+                StatsRepository.remove_subject(row)
+            else:
+                deltas.append((user_id, row.subject_id, row.date, -row.duration_minutes, -1))
+            SyncRepository.add_tombstone(user_id, item['entity'], row.id, change_seq)
+            db.session.delete(row)
+            results['deleted'].append({'entity': item['entity'], 'id': row.id, 'status': 'deleted'})
+        
+        if deltas is not None:
+            StatsRepository.apply_session_deltas(deltas)
+        StatsRepository.bump_version(user_id)
+        transactions.commit()
+        return results
+
+
+class PurgeRepository:
+    """
+    Cancellazioni massive a blocchi
+    Le sessioni sono eliminate in lotti di dimensione limitata, ognuno nella propria
+    transazione: il lock di scrittura di SQLite viene rilasciato tra un lotto e l'altro,
+    così gli altri scrittori non restano bloccati. I riepiloghi statistiche sono aggiornati
+    nello stesso commit di ogni lotto; le righe rimanenti (materie, riepiloghi) sono
+    eliminate dal database con ON DELETE CASCADE.
+    """
+    
+    @staticmethod
+    def _purge_sessions(filters, batch_size, on_progress, pause):
+        """Elimina a lotti le sessioni che soddisfano i filtri; restituisce quante ne ha eliminate"""
+        total = db.session.query(func.count(StudySession.id)).filter(*filters).scalar()
+        deleted = 0
+        
+        while True:
+            rows = db.session.query(
+                StudySession.id,
+                StudySession.user_id,
+                StudySession.subject_id,
+                StudySession.date,
+                StudySession.duration_minutes
+            ).filter(*filters).limit(batch_size).all()
+            if not rows:
+                break
+            
+            # Un solo aggiornamento per riga di riepilogo toccata dal lotto
+            StatsRepository.apply_session_deltas(
+                (user_id, subject_id, day, -minutes, -1) for _, user_id, subject_id, day, minutes in rows)
+            
+            db.session.execute(
+                delete(StudySession).where(StudySession.id.in_([r[0] for r in rows])),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()  # lotto con commit proprio, anche in un'unità di lavoro
+            
+            deleted += len(rows)
+            if on_progress:
+                on_progress(deleted, max(total, deleted))
+            if pause:
+                time.sleep(pause)
+        
+        return deleted
+    
+    @staticmethod
+    def purge_subject(subject, batch_size=1000, on_progress=None, pause=0):
+        """
+        Elimina una materia e tutte le sue sessioni a lotti di batch_size.
+        on_progress(eliminate, totale) è chiamata dopo ogni lotto; pause (secondi)
+        lascia spazio agli altri scrittori tra un lotto e l'altro.
+        Restituisce il numero di sessioni eliminate.
+        """
+        deleted = PurgeRepository._purge_sessions(
+            (StudySession.user_id == subject.user_id, StudySession.subject_id == subject.id),
+            batch_size, on_progress, pause)
+        
+        # Nella stessa transazione della cancellazione: copre anche le sessioni
+        # aggiunte dopo l'ultimo lotto, che il database elimina a cascata
+        StatsRepository.remove_subject(subject)
+        SyncRepository.add_tombstone(subject.user_id, 'subject', subject.id)
+        db.session.delete(subject)
+        transactions.commit()
+        return deleted
+    
+    @staticmethod
+    def purge_user(user, batch_size=1000, on_progress=None, pause=0):
+        """
+        Elimina un utente: prima le sessioni a lotti, poi l'utente, con materie
+        e riepiloghi rimossi a cascata. Restituisce il numero di sessioni eliminate.
+        """
+        deleted = PurgeRepository._purge_sessions(
+            (StudySession.user_id == user.id,), batch_size, on_progress, pause)
+        
+        db.session.delete(user)
+        transactions.commit()
+        return deleted
+    
+    @staticmethod
+    def purge_all(batch_size=1000, on_progress=None, pause=0):
+        """
+        Svuota il database un utente alla volta, con i progressi riferiti al totale.
+        Restituisce un dizionario con il numero di utenti, materie e sessioni eliminate.
+        """
+        result = {
+            'users': db.session.query(func.count(User.id)).scalar(),
+            'subjects': db.session.query(func.count(Subject.id)).scalar(),
+            'sessions': 0
+        }
+        total = db.session.query(func.count(StudySession.id)).scalar()
+        
+        def progress(deleted, _user_total):
+            if on_progress:
+                on_progress(result['sessions'] + deleted, total)
+        
+        user_ids = [row[0] for row in db.session.query(User.id).order_by(User.id)]
+        for user_id in user_ids:
+            user = db.session.get(User, user_id)
+            if user is not None:
+                result['sessions'] += PurgeRepository.purge_user(user, batch_size, progress, pause)
+        
+        return result
+
+
+class StatsRepository:
+    """
+    Repository per le tabelle di riepilogo (user_stats, user_subject_stats, user_month_stats,
+    user_period_stats, user_day_stats, leaderboard_entries)
+    Le tabelle sono aggiornate incrementalmente dagli altri repository nella stessa
+    transazione della modifica, così la dashboard legge poche righe per utente.
+    """
+    
+    @staticmethod
+    def _add_counters(model, rows, replace=()):
+        """
+        Somma le variazioni alle righe di riepilogo con un solo INSERT ... ON CONFLICT DO UPDATE
+        SET colonna = colonna + excluded.colonna in executemany; le righe mancanti nascono
+        con le variazioni come valori. rows: dizionari con la chiave primaria e le stesse
+        colonne da sommare; quelle in `replace` prendono il nuovo valore invece di essere sommate.
+        La somma avviene nel database, sotto il lock di scrittura: scritture concorrenti
+        (anche da processi diversi) non si sovrascrivono come con lettura + modifica nell'ORM.
+        Le istanze già caricate nella sessione vengono scadute e rilette al prossimo accesso.
+        """
+        if not rows:
+            return
+        # Le modifiche ORM in sospeso vanno scritte prima: l'upsert le renderebbe obsolete
+        db.session.flush()
+        table = model.__table__
+        keys = [column.name for column in table.primary_key]
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=keys,
+            set_={name: statement.excluded[name] if name in replace else table.c[name] + statement.excluded[name]
+                  for name in rows[0] if name not in keys}
+        )
+        db.session.execute(statement, rows)
+        for row in rows:
+            instance = db.session.identity_map.get(db.session.identity_key(model, tuple(row[name] for name in keys)))
+            if instance is not None:
+                db.session.expire(instance)
+    
+    @staticmethod
+    def apply_session_delta(user_id, subject_id, date, minutes, count):
+        """
+        Applica una variazione (minuti, numero sessioni) di una sessione ai riepiloghi
+        (vedi apply_session_deltas). Non esegue il commit.
+        """
+        StatsRepository.apply_session_deltas([(user_id, subject_id, date, minutes, count)])
+    
+    @staticmethod
+    def apply_session_deltas(deltas):
+        """
+        Applica le variazioni (user_id, subject_id, giorno, minuti, numero sessioni) ai
+        riepiloghi di utente, materia e mese, ai contatori settimanali/mensili degli obiettivi,
+        a quelli giornalieri del calendario e alle classifiche dei gruppi di cui l'utente fa
+        parte. Le variazioni vengono prima sommate per riga di riepilogo, poi applicate con
+        un upsert per tabella (vedi _add_counters): un inserimento o una cancellazione
+        massiva aggiorna ogni riga una sola volta, con un numero fisso di query.
+        Non esegue il commit: fa parte della transazione del chiamante.
+        """
+        changes = {}
+        
+        def add(model, minutes, count, **keys):
+            change = changes.setdefault((model, tuple(keys.items())), [0, 0])
+            change[0] += minutes
+            change[1] += count
+        
+        deltas = list(deltas)
+        groups = StatsRepository._group_ids({delta[0] for delta in deltas})
+        
+        for user_id, subject_id, day, minutes, count in deltas:
+            add(UserStats, minutes, count, user_id=user_id)
+            add(UserSubjectStats, minutes, count, user_id=user_id, subject_id=subject_id)
+            add(UserMonthStats, minutes, count, user_id=user_id, year=day.year, month=day.month)
+            for period in GOAL_PERIODS:
+                add(UserPeriodStats, minutes, count, user_id=user_id, period=period,
+                    period_start=period_start(day, period), subject_id=subject_id)
+            add(UserDayStats, minutes, count, user_id=user_id, day=day, subject_id=subject_id)
+            for group_id in groups.get(user_id, ()):
+                for period in LEADERBOARD_PERIODS:
+                    add(LeaderboardEntry, minutes, count, group_id=group_id, period=period,
+                        period_start=leaderboard_start(day, period), user_id=user_id)
+        
+        rows_by_model = {}
+        updated_at = datetime.utcnow()
+        for (model, keys), (minutes, count) in changes.items():
+            row = dict(keys, session_count=count, total_minutes=minutes)
+            if model is UserStats:
+                # Nuova versione dei dati dell'utente nello stesso aggiornamento
+                row.update(version=1, updated_at=updated_at)
+            rows_by_model.setdefault(model, []).append(row)
+        for model, rows in rows_by_model.items():
+            StatsRepository._add_counters(model, rows, replace=('updated_at',))
+    
+    @staticmethod
+    def _apply_leaderboard_deltas(changes):
+        """Somma le variazioni {(group_id, period, period_start, user_id): [minuti, sessioni]} alle classifiche"""
+        StatsRepository._add_counters(LeaderboardEntry, [
+            {'group_id': group_id, 'period': period, 'period_start': start, 'user_id': user_id,
+             'session_count': count, 'total_minutes': minutes}
+            for (group_id, period, start, user_id), (minutes, count) in changes.items()
+        ])
+    
+    @staticmethod
+    def _group_ids(user_ids):
+        """Gruppi di cui fanno parte gli utenti indicati: {user_id: [group_id, ...]}"""
+        groups = {}
+        for user_id, group_id in db.session.query(GroupMembership.user_id, GroupMembership.group_id)\
+                .filter(GroupMembership.user_id.in_(user_ids)):
+            groups.setdefault(user_id, []).append(group_id)
+        return groups
+    
+    @staticmethod
+    def apply_plan_delta(user_id, subject_id, day, minutes, count):
+        """Aggiorna i minuti pianificati del calendario per (utente, giorno, materia), senza commit"""
+        StatsRepository._add_counters(UserDayStats, [
+            {'user_id': user_id, 'day': day, 'subject_id': subject_id,
+             'planned_count': count, 'planned_minutes': minutes}
+        ])
+        StatsRepository.bump_version(user_id)
+    
+    @staticmethod
+    def apply_subject_delta(user_id, count):
+        """Aggiorna il numero di materie dell'utente (senza commit)"""
+        StatsRepository._add_counters(UserStats, [
+            {'user_id': user_id, 'subject_count': count, 'version': 1, 'updated_at': datetime.utcnow()}
+        ], replace=('updated_at',))
+    
+    @staticmethod
+    def bump_version(user_id):
+        """
+        Incrementa la versione dei dati dell'utente, invalidando le cache e gli ETag (senza
+        commit). L'incremento è un upsert nel database: due scritture concorrenti ottengono
+        versioni diverse, così nessuna pagina in cache resta associata alla versione finale.
+        """
+        StatsRepository._add_counters(UserStats, [
+            {'user_id': user_id, 'version': 1, 'updated_at': datetime.utcnow()}
+        ], replace=('updated_at',))
+    
+    @staticmethod
+    def next_change_seq(user_id):
+        """
+        Assegna il prossimo numero di modifica dell'utente, da registrare sulla materia o
+        sessione scritta (senza commit). Il contatore è incrementato e riletto con un solo
+        upsert ... RETURNING: l'istruzione prende il lock di scrittura, quindi due scritture
+        concorrenti non ricevono mai lo stesso numero e, poiché il lock resta fino al commit,
+        i numeri crescono nell'ordine dei commit.
+        """
+        table = UserStats.__table__
+        statement = sqlite_insert(table).values(user_id=user_id, change_seq=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={'change_seq': table.c.change_seq + 1}
+        ).returning(table.c.change_seq)
+        change_seq = db.session.execute(statement).scalar_one()
+        user_stats = db.session.identity_map.get(db.session.identity_key(UserStats, (user_id,)))
+        if user_stats is not None:
+            db.session.expire(user_stats)
+        return change_seq
+    
+    @staticmethod
+    def remove_subject(subject):
+        """
+        Sottrae dai riepiloghi tutte le sessioni di una materia che sta per essere eliminata
+        (una sola query GROUP BY per mese, senza caricare le sessioni)
+        """
+        rows = db.session.query(
+            extract('year', StudySession.date).label('year'),
+            extract('month', StudySession.date).label('month'),
+            func.count(StudySession.id),
+            func.sum(StudySession.duration_minutes)
+        ).filter(StudySession.subject_id == subject.id)\
+         .group_by('year', 'month')\
+         .all()
+        
+        StatsRepository._add_counters(UserMonthStats, [
+            {'user_id': subject.user_id, 'year': int(year), 'month': int(month),
+             'session_count': -count, 'total_minutes': -minutes}
+            for year, month, count, minutes in rows
+        ])
+        if rows:
+            StatsRepository._add_counters(UserStats, [
+                {'user_id': subject.user_id, 'session_count': -sum(r[2] for r in rows),
+                 'total_minutes': -sum(r[3] for r in rows)}
+            ])
+        
+        # Classifiche dei gruppi: una query GROUP BY per settimana, solo se l'utente ne ha
+        group_ids = StatsRepository._group_ids([subject.user_id]).get(subject.user_id, [])
+        if group_ids:
+            week_start = _trend_bucket_expression('week').label('week_start')
+            weeks = db.session.query(
+                week_start,
+                func.count(StudySession.id),
+                func.sum(StudySession.duration_minutes)
+            ).filter(StudySession.subject_id == subject.id)\
+             .group_by('week_start')\
+             .all()
+            changes = {}
+            for group_id in group_ids:
+                for start_iso, count, minutes in weeks:
+                    for period, start in (('week', date.fromisoformat(start_iso)), ('all', ALL_TIME_START)):
+                        change = changes.setdefault((group_id, period, start, subject.user_id), [0, 0])
+                        change[0] -= minutes
+                        change[1] -= count
+            StatsRepository._apply_leaderboard_deltas(changes)
+        
+        UserSubjectStats.query.filter_by(subject_id=subject.id)\
+            .delete(synchronize_session='fetch')
+        UserPeriodStats.query.filter_by(subject_id=subject.id)\
+            .delete(synchronize_session='fetch')
+        UserDayStats.query.filter_by(subject_id=subject.id)\
+            .delete(synchronize_session='fetch')
+        StatsRepository.apply_subject_delta(subject.user_id, -1)
+    
+    @staticmethod
+    def get_user_stats(user_id):
+        """Restituisce il riepilogo dell'utente (a zero se non ancora presente)"""
+        return db.session.get(UserStats, user_id) or \
+            UserStats(user_id=user_id, session_count=0, total_minutes=0, subject_count=0, version=0,
+                      change_seq=0)
+    
+    @staticmethod
+    def subject_stats(user_id):
+        """
+        Ore per materia lette dal riepilogo (stesso formato di
+        StudySessionRepository.total_hours_by_subject)
+        """
+        results = db.session.query(
+            Subject.name,
+            Subject.color,
+            UserSubjectStats.total_minutes,
+            UserSubjectStats.session_count
+        ).join(Subject, Subject.id == UserSubjectStats.subject_id)\
+         .filter(UserSubjectStats.user_id == user_id,
+                 UserSubjectStats.session_count > 0)\
+         .order_by(UserSubjectStats.total_minutes.desc())\
+         .all()
+        
+        return [
+            {
+                'subject_name': r[0],
+                'subject_color': r[1],
+                'total_hours': round(r[2] / 60, 2),
+                'total_minutes': r[2],
+                'session_count': r[3]
+            }
+            for r in results
+        ]
+    
+    @staticmethod
+    def monthly_trend(user_id, year):
+        """
+        Ore per mese di un anno lette dal riepilogo (stesso formato di
+        StudySessionRepository.study_trend_by_month)
+        """
+        results = db.session.query(UserMonthStats.month, UserMonthStats.total_minutes)\
+            .filter(UserMonthStats.user_id == user_id,
+                    UserMonthStats.year == year,
+                    UserMonthStats.session_count > 0)\
+            .order_by(UserMonthStats.month)\
+            .all()
+        
+        return [
+            {
+                'month': r[0],
+                'total_hours': round(r[1] / 60, 2)
+            }
+            for r in results
+        ]
+    
+    @staticmethod
+    def _compute(user_id=None):
+        """Calcola i riepiloghi direttamente dalle tabelle sorgente"""
+        def scoped(query, column):
+            return query.filter(column == user_id) if user_id else query
+        
+        users = {}
+        for uid, in scoped(db.session.query(User.id), User.id):
+            users[uid] = [0, 0, 0]
+        
+        for uid, count in scoped(db.session.query(Subject.user_id, func.count(Subject.id)), Subject.user_id)\
+                .group_by(Subject.user_id):
+            users[uid][2] = count
+        
+        subjects = {}
+        for uid, sid, count, minutes in scoped(db.session.query(
+                StudySession.user_id, StudySession.subject_id,
+                func.count(StudySession.id), func.sum(StudySession.duration_minutes)),
+                StudySession.user_id)\
+                .group_by(StudySession.user_id, StudySession.subject_id):
+            subjects[(uid, sid)] = [count, minutes]
+            users[uid][0] += count
+            users[uid][1] += minutes
+        
+        months = {}
+        for uid, year, month, count, minutes in scoped(db.session.query(
+                StudySession.user_id,
+                extract('year', StudySession.date).label('year'),
+                extract('month', StudySession.date).label('month'),
+                func.count(StudySession.id), func.sum(StudySession.duration_minutes)),
+                StudySession.user_id)\
+                .group_by(StudySession.user_id, 'year', 'month'):
+            months[(uid, int(year), int(month))] = [count, minutes]
+        
+        periods = {}
+        for period in GOAL_PERIODS:
+            start = _trend_bucket_expression(period).label('period_start')
+            for uid, start_iso, sid, count, minutes in scoped(db.session.query(
+                    StudySession.user_id, start, StudySession.subject_id,
+                    func.count(StudySession.id), func.sum(StudySession.duration_minutes)),
+                    StudySession.user_id)\
+                    .group_by(StudySession.user_id, 'period_start', StudySession.subject_id):
+                periods[(uid, period, date.fromisoformat(start_iso), sid)] = [count, minutes]
+        
+        days = {}
+        for uid, day, sid, count, minutes in scoped(db.session.query(
+                StudySession.user_id, StudySession.date, StudySession.subject_id,
+                func.count(StudySession.id), func.sum(StudySession.duration_minutes)),
+                StudySession.user_id)\
+                .group_by(StudySession.user_id, StudySession.date, StudySession.subject_id):
+            days[(uid, day, sid)] = [count, minutes, 0, 0]
+        for uid, day, sid, count, minutes in scoped(db.session.query(
+                PlannedSession.user_id, PlannedSession.date, PlannedSession.subject_id,
+                func.count(PlannedSession.id), func.sum(PlannedSession.duration_minutes)),
+                PlannedSession.user_id)\
+                .group_by(PlannedSession.user_id, PlannedSession.date, PlannedSession.subject_id):
+            days.setdefault((uid, day, sid), [0, 0, 0, 0])[2:] = [count, minutes]
+        
+        # Classifiche: i totali complessivi di ogni membro (anche a zero) e quelli per settimana
+        leaderboards = {}
+        for gid, uid in scoped(db.session.query(GroupMembership.group_id, GroupMembership.user_id),
+                               GroupMembership.user_id):
+            leaderboards[(gid, 'all', ALL_TIME_START, uid)] = list(users.get(uid, [0, 0])[:2])
+        week_start = _trend_bucket_expression('week').label('week_start')
+        for gid, uid, start_iso, count, minutes in scoped(db.session.query(
+                GroupMembership.group_id, StudySession.user_id, week_start,
+                func.count(StudySession.id), func.sum(StudySession.duration_minutes))
+                .join(GroupMembership, GroupMembership.user_id == StudySession.user_id),
+                StudySession.user_id)\
+                .group_by(GroupMembership.group_id, StudySession.user_id, 'week_start'):
+            leaderboards[(gid, 'week', date.fromisoformat(start_iso), uid)] = [count, minutes]
+        
+        return users, subjects, months, periods, days, leaderboards
+    
+    @staticmethod
+    def rebuild(user_id=None):
+        """
+        Ricostruisce da zero le tabelle di riepilogo (per tutti gli utenti o per uno solo)
+        Serve per popolare database esistenti o correggere incongruenze.
+        Restituisce il numero di utenti ricalcolati.
+        """
+        users, subjects, months, periods, days, leaderboards = StatsRepository._compute(user_id)
+        
+        # Versioni e numeri di modifica restano monotoni anche dopo la ricostruzione
+        versions_query = db.session.query(UserStats.user_id, UserStats.version, UserStats.change_seq)
+        if user_id:
+            versions_query = versions_query.filter(UserStats.user_id == user_id)
+        versions = {uid: (version, change_seq) for uid, version, change_seq in versions_query}
+        # Il numero di modifica non scende sotto quelli già registrati sulle righe sincronizzate
+        for model in (Subject, StudySession, SyncTombstone):
+            seqs_query = db.session.query(model.user_id, func.max(model.change_seq))
+            if user_id:
+                seqs_query = seqs_query.filter(model.user_id == user_id)
+            for uid, change_seq in seqs_query.group_by(model.user_id):
+                version, stored = versions.get(uid, (0, 0))
+                versions[uid] = (version, max(stored, change_seq))
+        
+        for model in (UserStats, UserSubjectStats, UserMonthStats, UserPeriodStats, UserDayStats,
+                      LeaderboardEntry):
+            query = model.query
+            if user_id:
+                query = query.filter(model.user_id == user_id)
+            query.delete(synchronize_session=False)
+        
+        db.session.add_all(
+            UserStats(user_id=uid, session_count=v[0], total_minutes=v[1], subject_count=v[2],
+                      version=versions.get(uid, (0, 0))[0] + 1, change_seq=versions.get(uid, (0, 0))[1],
+                      updated_at=datetime.utcnow())
+            for uid, v in users.items()
+        )
+        db.session.add_all(
+            UserSubjectStats(user_id=k[0], subject_id=k[1], session_count=v[0], total_minutes=v[1])
+            for k, v in subjects.items()
+        )
+        db.session.add_all(
+            UserMonthStats(user_id=k[0], year=k[1], month=k[2], session_count=v[0], total_minutes=v[1])
+            for k, v in months.items()
+        )
+        db.session.add_all(
+            UserPeriodStats(user_id=k[0], period=k[1], period_start=k[2], subject_id=k[3],
+                            session_count=v[0], total_minutes=v[1])
+            for k, v in periods.items()
+        )
+        db.session.add_all(
+            UserDayStats(user_id=k[0], day=k[1], subject_id=k[2], session_count=v[0],
+                         total_minutes=v[1], planned_count=v[2], planned_minutes=v[3])
+            for k, v in days.items()
+        )
+        db.session.add_all(
+            LeaderboardEntry(group_id=k[0], period=k[1], period_start=k[2], user_id=k[3],
+                             session_count=v[0], total_minutes=v[1])
+            for k, v in leaderboards.items()
+        )
+        transactions.commit()
+        return len(users)
+    
+    @staticmethod
+    def check(user_id=None):
+        """
+        Confronta le tabelle di riepilogo con i valori ricalcolati
+        Restituisce una lista di descrizioni delle incongruenze (vuota se tutto è coerente)
+        """
+        users, subjects, months, periods, days, leaderboards = StatsRepository._compute(user_id)
+        
+        def stored(model, key_columns, value_columns):
+            query = model.query
+            if user_id:
+                query = query.filter(model.user_id == user_id)
+            rows = {}
+            for row in query:
+                values = [getattr(row, c) or 0 for c in value_columns]
+                if any(values):
+                    key = tuple(getattr(row, c) for c in key_columns)
+                    rows[key if len(key) > 1 else key[0]] = values
+            return rows
+        
+        def compare(label, expected, actual):
+            expected = {k: v for k, v in expected.items() if any(v)}
+            return [
+                f'{label} {key}: atteso {expected.get(key)}, trovato {actual.get(key)}'
+                for key in sorted(set(expected) | set(actual), key=str)
+                if expected.get(key) != actual.get(key)
+            ]
+        
+        return (
+            compare('user_stats', users,
+                    stored(UserStats, ['user_id'], ['session_count', 'total_minutes', 'subject_count'])) +
+            compare('user_subject_stats', subjects,
+                    stored(UserSubjectStats, ['user_id', 'subject_id'], ['session_count', 'total_minutes'])) +
+            compare('user_month_stats', months,
+                    stored(UserMonthStats, ['user_id', 'year', 'month'], ['session_count', 'total_minutes'])) +
+            compare('user_period_stats', periods,
+                    stored(UserPeriodStats, ['user_id', 'period', 'period_start', 'subject_id'],
+                           ['session_count', 'total_minutes'])) +
+            compare('user_day_stats', days,
+                    stored(UserDayStats, ['user_id', 'day', 'subject_id'],
+                           ['session_count', 'total_minutes', 'planned_count', 'planned_minutes'])) +
+            compare('leaderboard_entries', leaderboards,
+                    stored(LeaderboardEntry, ['group_id', 'period', 'period_start', 'user_id'],
+                           ['session_count', 'total_minutes']))
+        )
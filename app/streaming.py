@@ -0,0 +1,132 @@
+"""
+Rendering in streaming e compressione delle risposte
+- stream_page() invia un template man mano che viene generato (stream_template),
+  raggruppando i frammenti in blocchi: il browser riceve subito intestazione e
+  navigazione e inizia a disegnare la pagina mentre le righe arrivano
+- Compression comprime con gzip (o brotli, se il modulo è installato) le risposte
+  testuali negoziando Accept-Encoding; le risposte in streaming sono compresse blocco
+  per blocco con un flush di sincronizzazione, così ogni blocco arriva subito al client
+"""
+import zlib
+from flask import Response, current_app, request, stream_template
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _buffered(chunks, buffer_size):
+    """Raggruppa i frammenti del template in blocchi di almeno buffer_size caratteri"""
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            yield ''.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield ''.join(pending)
+
+
+def stream_page(template_name, **context):
+    """
+    Response HTML generata in streaming: le variabili del contesto possono essere
+    generatori (es. righe lette a blocchi dal database), consumati durante l'invio
+    """
+    chunks = stream_template(template_name, **context)
+    return Response(_buffered(chunks, current_app.config.get('STREAM_BUFFER_SIZE', 4096)),
+                    mimetype='text/html')
+
+
+def _compressor(encoding, level, brotli_quality):
+    """Funzioni (comprimi, flush, fine) per la codifica scelta"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=brotli_quality)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (compressor.compress,
+            lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+            lambda: compressor.flush(zlib.Z_FINISH))
+
+
+def _compress_stream(original, compress, flush, finish):
+    """Comprime un flusso di blocchi, inviando ogni blocco appena disponibile"""
+    try:
+        for chunk in original:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(original, 'close', None)
+        if close is not None:
+            close()
+
+
+class Compression:
+    """Estensione Flask che comprime le risposte testuali (anche in streaming)"""
+    
+    def __init__(self, app=None):
+        self.enabled = True
+        self.mimetypes = ()
+        self.level = 6
+        self.brotli_quality = 4
+        self.min_size = 500
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        """Legge i parametri di compressione e registra l'hook sulle risposte"""
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.mimetypes = tuple(app.config.get('COMPRESS_MIMETYPES', ()))
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        app.after_request(self._after_request)
+    
+    def _encoding(self):
+        """Codifica migliore accettata dal client tra quelle disponibili (None se nessuna)"""
+        available = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(available)
+    
+    def _should_compress(self, response):
+        if not self.enabled or request.method == 'HEAD':
+            return False
+        if response.status_code != 200 or response.direct_passthrough:
+            return False
+        if 'Content-Encoding' in response.headers or response.mimetype not in self.mimetypes:
+            return False
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        if not response.is_streamed and response.calculate_content_length() < self.min_size:
+            return False
+        return True
+    
+    def _after_request(self, response):
+        # La risposta varia comunque in base ad Accept-Encoding, anche quando non è compressa
+        if response.mimetype in self.mimetypes:
+            response.vary.add('Accept-Encoding')
+        if not self._should_compress(response):
+            return response
+        encoding = self._encoding()
+        if encoding is None:
+            return response
+        
+        compress, flush, finish = _compressor(encoding, self.level, self.brotli_quality)
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, compress, flush, finish)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data()) + finish())
+        
+        response.headers['Content-Encoding'] = encoding
+        # Il contenuto compresso non è identico byte per byte: l'ETag diventa debole
+        etag = response.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response.headers['ETag'] = f'W/{etag}'
+        return response
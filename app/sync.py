@@ -0,0 +1,126 @@
+"""
+Sincronizzazione incrementale per i client offline (PWA)
+Il client chiede le modifiche successive al proprio cursore (/api/sync/changes) e invia
+le modifiche fatte offline in un unico lotto (/api/sync/push). Ogni elemento del lotto
+viene validato qui; quelli validi sono applicati da SyncRepository in una transazione.
+
+Elementi del lotto:
+- subjects: name, description, color; con id e base_seq per modificare una materia esistente
+- sessions: topic, duration_minutes, date, notes e subject_id (oppure subject_client_id per
+  una materia creata nello stesso lotto); con id e base_seq per modificarne una esistente
+- deleted: entity ('subject' o 'session'), id, base_seq
+base_seq è il change_seq della riga ricevuto dal client: se nel frattempo la riga è stata
+modificata sul server la richiesta è in conflitto e il risultato riporta lo stato attuale.
+client_id (facoltativo) è restituito nel risultato per collegare le righe create.
+"""
+import re
+from datetime import datetime
+from app.repositories import SyncRepository, SYNC_SOURCES
+
+SYNC_ENTITIES = ('subject', 'session')
+
+_COLOR = re.compile(r'^#[0-9a-fA-F]{6}$')
+
+
+def _text(item, name, max_length=None, required=False):
+    value = item.get(name)
+    value = str(value).strip() if value is not None else ''
+    if required and not value:
+        raise ValueError(f'campo obbligatorio mancante: {name}')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{name} troppo lungo (max {max_length} caratteri)')
+    return value or None
+
+
+def _integer(item, name, required=False):
+    value = item.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f'campo obbligatorio mancante: {name}')
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{name} deve essere un intero')
+    return value
+
+
+def _reference(item):
+    """Campi comuni: client_id, id ed eventuale base_seq (obbligatorio con id)"""
+    reference = {'client_id': _text(item, 'client_id', max_length=64), 'id': _integer(item, 'id')}
+    if reference['id'] is not None:
+        reference['base_seq'] = _integer(item, 'base_seq', required=True)
+    return reference
+
+
+def _validate_subject(item):
+    subject = _reference(item)
+    subject['name'] = _text(item, 'name', max_length=100, required=True)
+    subject['description'] = _text(item, 'description')
+    subject['color'] = _text(item, 'color')
+    if subject['color'] and not _COLOR.match(subject['color']):
+        raise ValueError(f'colore non valido "{subject["color"]}" (usa #RRGGBB)')
+    return subject
+
+
+def _validate_session(item):
+    study_session = _reference(item)
+    study_session['topic'] = _text(item, 'topic', max_length=200, required=True)
+    study_session['duration_minutes'] = _integer(item, 'duration_minutes', required=True)
+    if study_session['duration_minutes'] <= 0:
+        raise ValueError('la durata deve essere maggiore di 0 minuti')
+    day = _text(item, 'date', required=True)
+    try:
+        study_session['date'] = datetime.strptime(day, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'data non valida "{day}" (usa AAAA-MM-GG)')
+    study_session['notes'] = _text(item, 'notes')
+    study_session['subject_id'] = _integer(item, 'subject_id')
+    study_session['subject_client_id'] = _text(item, 'subject_client_id', max_length=64)
+    if study_session['subject_id'] is None and study_session['subject_client_id'] is None:
+        raise ValueError('campo obbligatorio mancante: subject_id o subject_client_id')
+    return study_session
+
+
+def _validate_deletion(item):
+    if item.get('entity') not in SYNC_ENTITIES:
+        raise ValueError('entity deve essere "subject" o "session"')
+    return {'entity': item['entity'], 'id': _integer(item, 'id', required=True),
+            'base_seq': _integer(item, 'base_seq', required=True)}
+
+
+def push(user_id, payload, max_items=500):
+    """
+    Valida e applica un lotto di modifiche del client
+    Solleva ValueError se il lotto è malformato o troppo grande; gli elementi non validi
+    sono riportati nel risultato con status 'invalid' senza bloccare gli altri.
+    Restituisce i risultati per elemento (vedi SyncRepository.apply_push)
+    """
+    if not isinstance(payload, dict):
+        raise ValueError('Il corpo della richiesta deve essere un oggetto JSON')
+    
+    batches = {}
+    for name in SYNC_SOURCES:
+        items = payload.get(name) or []
+        if not isinstance(items, list):
+            raise ValueError(f'{name} deve essere una lista')
+        batches[name] = items
+    if sum(len(items) for items in batches.values()) > max_items:
+        raise ValueError(f'Troppe modifiche in un solo invio (massimo {max_items})')
+    
+    valid = {name: [] for name in batches}
+    invalid = {name: [] for name in batches}
+    validators = {'subjects': _validate_subject, 'sessions': _validate_session,
+                  'deleted': _validate_deletion}
+    for name, items in batches.items():
+        for item in items:
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError('ogni elemento deve essere un oggetto')
+                valid[name].append(validators[name](item))
+            except ValueError as e:
+                invalid[name].append({'client_id': item.get('client_id') if isinstance(item, dict) else None,
+                                      'status': 'invalid', 'error': str(e)})
+    
+    results = SyncRepository.apply_push(user_id, valid['subjects'], valid['sessions'], valid['deleted'])
+    for name in results:
+        results[name].extend(invalid[name])
+    return results
@@ -0,0 +1,123 @@
+"""
+Unità di lavoro
+Di norma ogni metodo di scrittura dei repository esegue il proprio commit. Dentro
+unit_of_work() (o in una vista decorata con @transactional) i repository si limitano
+al flush: le modifiche di tutta la richiesta finiscono in un unico commit all'uscita,
+oppure vengono annullate insieme se si verifica un errore.
+
+Nella stessa unità di lavoro le letture marcate con @memoized (es. le materie
+dell'utente) sono eseguite una sola volta; i risultati restano validi fino alla
+scrittura successiva, che svuota la memoria.
+
+Se una vista intercetta l'errore di una scrittura (per mostrare un messaggio)
+deve chiamare rollback(): il flush già eseguito verrebbe altrimenti confermato
+insieme alla parte restante della richiesta, lasciando i riepiloghi incoerenti.
+
+Le cancellazioni massive di PurgeRepository restano a lotti con commit propri:
+non vanno eseguite dentro un'unità di lavoro.
+"""
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, has_app_context
+from app import db
+
+
+def active():
+    """True se è in corso un'unità di lavoro nel contesto corrente"""
+    return has_app_context() and g.get('_unit_of_work_depth', 0) > 0
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Raggruppa le scritture dei repository in un'unica transazione
+    Le unità annidate confluiscono in quella più esterna, che esegue il commit
+    (o il rollback se il blocco solleva un'eccezione, se un flush è fallito o se
+    la vista ha chiamato rollback())
+    """
+    depth = g.get('_unit_of_work_depth', 0)
+    g._unit_of_work_depth = depth + 1
+    try:
+        yield
+        if depth == 0:
+            # Un flush fallito lascia la sessione da annullare anche se la vista
+            # ha gestito l'errore (es. mostrando un messaggio all'utente)
+            if db.session.is_active and not g.get('_unit_of_work_failed'):
+                db.session.commit()
+            else:
+                db.session.rollback()
+    except BaseException:
+        if depth == 0:
+            db.session.rollback()
+        raise
+    finally:
+        g._unit_of_work_depth = depth
+        if depth == 0:
+            g.pop('_unit_of_work_memo', None)
+            g.pop('_unit_of_work_failed', None)
+
+
+def transactional(f):
+    """Decorator per le viste: l'intera richiesta è una sola unità di lavoro"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with unit_of_work():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def commit():
+    """
+    Conclude una scrittura di un repository: commit fuori da un'unità di lavoro,
+    solo flush al suo interno (gli id generati sono comunque disponibili)
+    """
+    if active():
+        db.session.flush()
+        g.pop('_unit_of_work_memo', None)
+    else:
+        db.session.commit()
+
+
+def rollback():
+    """
+    Annulla le scritture dopo un errore gestito dalla vista; dentro un'unità di lavoro
+    l'intera unità è annullata e all'uscita non viene eseguito alcun commit
+    """
+    db.session.rollback()
+    if active():
+        g._unit_of_work_failed = True
+        g.pop('_unit_of_work_memo', None)
+
+
+def memo():
+    """Memoria delle letture dell'unità di lavoro corrente (None fuori da un'unità di lavoro)"""
+    if not active():
+        return None
+    if '_unit_of_work_memo' not in g:
+        g._unit_of_work_memo = {}
+    return g._unit_of_work_memo
+
+
+def memoized(f):
+    """
+    Decorator per le letture dei repository: dentro un'unità di lavoro il risultato
+    è riusato per gli stessi argomenti (posizionali) fino alla scrittura successiva
+    """
+    @wraps(f)
+    def decorated_function(*args):
+        store = memo()
+        if store is None:
+            return f(*args)
+        key = (f.__qualname__,) + args
+        if key not in store:
+            store[key] = f(*args)
+        return store[key]
+    return decorated_function
+
+
+def cached(f, *args):
+    """Risultato già memorizzato di una lettura @memoized, oppure None"""
+    store = memo()
+    if store is None:
+        return None
+    return store.get((f.__qualname__,) + args)
@@ -0,0 +1,129 @@
+"""
+Verifica di concorrenza tra processi
+Più processi (come i worker di serve.py) scrivono contemporaneamente per lo stesso
+utente sullo stesso database SQLite con il profilo di produzione; alla fine i riepiloghi
+devono coincidere con i dati (StatsRepository.check) e i numeri di modifica della
+sincronizzazione devono essere unici e non superare il contatore dell'utente.
+Un aggiornamento perso (lettura + modifica non atomica) fa fallire la verifica.
+
+Esempi:
+    python -m benchmarks.concurrency
+    python -m benchmarks.concurrency --processes 8 --operations 200
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from config import config, ProductionConfig
+
+
+def _make_app(workdir):
+    class ConcurrencyConfig(ProductionConfig):
+        SECRET_KEY = 'concurrency'
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(workdir, "concurrency.db")}'
+        CACHE_TYPE = 'null'
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        PASSWORD_HASH_WORKERS = 0
+        # Le attese sul lock di scrittura sono attese qui: non vanno segnalate come query lente
+        SQL_SLOW_QUERY_MS = 60000
+    
+    config['concurrency'] = ConcurrencyConfig
+    from app import create_app
+    return create_app('concurrency')
+
+
+def _writer(workdir, user_id, group_id, operations, start, errors):
+    """Processo scrittore: materie, sessioni, pianificazioni e modifiche in ordine misto"""
+    from app.repositories import SubjectRepository, StudySessionRepository, PlannerRepository
+    
+    app = _make_app(workdir)
+    start.wait()
+    try:
+        with app.app_context():
+            subject = SubjectRepository.create(f'Materia {os.getpid()}', user_id)
+            day = date.today()
+            for i in range(operations):
+                study_session = StudySessionRepository.create(
+                    f'Argomento {i}', 10 + i % 50, subject.id, user_id, day - timedelta(days=i % 20))
+                if i % 5 == 0:
+                    PlannerRepository.create(user_id, subject.id, day + timedelta(days=i % 7), 30, 'Ripasso')
+                if i % 7 == 0:
+                    StudySessionRepository.update(study_session, study_session.topic, 25, subject.id,
+                                                  study_session.date)
+                if i % 11 == 0:
+                    StudySessionRepository.delete(study_session)
+                if i % 13 == 0:
+                    SubjectRepository.create(f'Extra {os.getpid()}-{i}', user_id)
+    except Exception as e:
+        errors.put(f'{os.getpid()}: {e!r}')
+
+
+def run(processes=4, operations=100):
+    """Esegue la verifica e restituisce la lista dei problemi trovati (vuota se tutto è coerente)"""
+    workdir = tempfile.mkdtemp(prefix='studyplanner-concurrency-')
+    app = _make_app(workdir)
+    
+    from app import db
+    from app.migrations import upgrade
+    from app.models import Subject, StudySession, SyncTombstone
+    from app.repositories import UserRepository, GroupRepository, StatsRepository
+    
+    with app.app_context():
+        upgrade(db.engine)
+        user = UserRepository.create('concorrenza', 'concorrenza@example.com', 'password')
+        group = GroupRepository.create('Classe', user.id)
+        user_id, group_id = user.id, group.id
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+    
+    context = multiprocessing.get_context('fork')
+    start = context.Event()
+    errors = context.Queue()
+    writers = [context.Process(target=_writer, args=(workdir, user_id, group_id, operations, start, errors))
+               for _ in range(processes)]
+    for writer in writers:
+        writer.start()
+    start.set()
+    for writer in writers:
+        writer.join()
+    
+    problems = []
+    while not errors.empty():
+        problems.append(f'errore nello scrittore {errors.get()}')
+    
+    with app.app_context():
+        problems.extend(StatsRepository.check())
+        
+        seqs = []
+        for model in (Subject, StudySession, SyncTombstone):
+            seqs.extend(row[0] for row in db.session.query(model.change_seq).filter(model.user_id == user_id))
+        duplicates = len(seqs) - len(set(seqs))
+        if duplicates:
+            problems.append(f'change_seq: {duplicates} numeri di modifica duplicati')
+        user_stats = StatsRepository.get_user_stats(user_id)
+        if seqs and user_stats.change_seq < max(seqs):
+            problems.append(f'change_seq: contatore utente {user_stats.change_seq} '
+                            f'inferiore al massimo sulle righe {max(seqs)}')
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verifica di concorrenza tra processi di StudyPlanner')
+    parser.add_argument('--processes', type=int, default=4, help='Processi scrittori')
+    parser.add_argument('--operations', type=int, default=100, help='Sessioni create da ogni processo')
+    args = parser.parse_args(argv)
+    
+    problems = run(args.processes, args.operations)
+    for problem in problems:
+        print(f'❌ {problem}')
+    if problems:
+        return 1
+    print(f'✅ {args.processes} processi × {args.operations} operazioni: riepiloghi e change_seq coerenti')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,541 @@
+"""
+Benchmark dei repository e delle rotte a diverse scale di dati
+
+Per ogni scala (utenti × materie × sessioni per utente) crea un database SQLite
+temporaneo, lo popola con benchmarks.datagen e misura ogni metodo dei repository
+e ogni rotta (tramite il test client di Flask): p50/p95 in millisecondi, numero di
+query SQL e picco di memoria (tracemalloc).
+
+Esempi:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --scales 2x5x500,4x8x20000 --save benchmarks/baselines/main.json
+    python -m benchmarks.suite --compare benchmarks/baselines/main.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from config import config, DevelopmentConfig
+
+
+DEFAULT_SCALES = '2x5x500,4x8x5000,4x10x20000'
+
+
+class QueryCounter:
+    """Conta le istruzioni SQL eseguite su tutti i motori dell'applicazione"""
+    
+    def __init__(self, engines):
+        self.count = 0
+        self.engines = list(engines)
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._on_execute)
+    
+    def _on_execute(self, *args):
+        self.count += 1
+    
+    def close(self):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._on_execute)
+
+
+class BenchContext:
+    """Dati di riferimento per i benchmark (utente, materia, sessione e gruppo esistenti)"""
+    
+    def __init__(self, user_id, username, subject_id, session_id, group_id):
+        self.user_id = user_id
+        self.username = username
+        self.subject_id = subject_id
+        self.session_id = session_id
+        self.group_id = group_id
+        self.counter = 0
+    
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+
+def _repository_benchmarks():
+    """
+    Elenco (nome, setup, funzione): setup(ctx) prepara gli argomenti fuori dalla misura,
+    funzione(ctx, *argomenti) è la parte misurata
+    """
+    from app import analytics
+    from app.repositories import UserRepository, SubjectRepository, StudySessionRepository, \
+        StatsRepository, SearchRepository, GoalRepository, PlannerRepository, GroupRepository, \
+        LeaderboardRepository, SyncRepository, leaderboard_start
+    
+    today = date.today()
+    week = leaderboard_start(today, 'week')
+    
+    def no_setup(ctx):
+        return ()
+    
+    def new_session(ctx):
+        return (StudySessionRepository.create('bench', 30, ctx.subject_id, ctx.user_id, today),)
+    
+    def new_user(ctx):
+        name = ctx.unique('purgeuser')
+        user = UserRepository.create(name, f'{name}@example.com', 'password')
+        subject = SubjectRepository.create('Da eliminare', user.id)
+        StudySessionRepository.bulk_create(user.id, [
+            {'topic': 'purge', 'duration_minutes': 25, 'subject_id': subject.id,
+             'date': today, 'notes': None} for _ in range(500)])
+        return (user,)
+    
+    def new_subject(ctx):
+        return (SubjectRepository.create(ctx.unique('Bench '), ctx.user_id),)
+    
+    def existing_session(ctx):
+        return (StudySessionRepository.find_by_id(ctx.session_id, ctx.user_id),)
+    
+    def existing_subject(ctx):
+        return (SubjectRepository.find_by_id(ctx.subject_id, ctx.user_id),)
+    
+    def bulk_rows(ctx):
+        return ([{'topic': 'bulk', 'duration_minutes': 25, 'subject_id': ctx.subject_id,
+                  'date': today, 'notes': None} for _ in range(100)],)
+    
+    def new_goal(ctx):
+        return (GoalRepository.create(ctx.user_id, 'month', 600, ctx.subject_id),)
+    
+    def new_plan(ctx):
+        return (PlannerRepository.create(ctx.user_id, ctx.subject_id, today, 45, 'bench'),)
+    
+    def new_group(ctx):
+        return (GroupRepository.create(ctx.unique('Gruppo '), ctx.user_id),)
+    
+    def other_group(ctx):
+        name = ctx.unique('groupowner')
+        owner = UserRepository.create(name, f'{name}@example.com', 'password')
+        return (GroupRepository.create(ctx.unique('Gruppo '), owner.id),)
+    
+    def existing_group(ctx):
+        return (GroupRepository.find_by_id(ctx.group_id, ctx.user_id),)
+    
+    def sync_cursor(ctx):
+        # Posizione dopo lo stato completo: la richiesta misura il caso tipico con poche modifiche
+        cursor = None
+        while True:
+            changes = SyncRepository.changes(ctx.user_id, cursor)
+            cursor = changes['cursor']
+            if not changes['has_more']:
+                break
+        StudySessionRepository.create('sync', 30, ctx.subject_id, ctx.user_id, today)
+        return (cursor,)
+    
+    def push_items(ctx):
+        return ([], [{'client_id': f'c{i}', 'topic': 'offline', 'duration_minutes': 30,
+                      'date': today, 'notes': None, 'subject_id': ctx.subject_id}
+                     for i in range(50)], [])
+    
+    def second_page_cursor(ctx):
+        return (StudySessionRepository.find_page_by_user(ctx.user_id)[1],)
+    
+    return [
+        ('UserRepository.create', lambda ctx: (ctx.unique('benchuser'),),
+         lambda ctx, name: UserRepository.create(name, f'{name}@example.com', 'password')),
+        ('UserRepository.authenticate', no_setup,
+         lambda ctx: UserRepository.authenticate(ctx.username, 'password')),
+        ('UserRepository.find_by_username', no_setup,
+         lambda ctx: UserRepository.find_by_username(ctx.username)),
+        ('UserRepository.find_by_email', no_setup,
+         lambda ctx: UserRepository.find_by_email(f'{ctx.username}@example.com')),
+        ('UserRepository.find_by_id', no_setup,
+         lambda ctx: UserRepository.find_by_id(ctx.user_id)),
+        ('UserRepository.exists', no_setup,
+         lambda ctx: UserRepository.exists(ctx.username, 'nobody@example.com')),
+        ('UserRepository.delete', new_user,
+         lambda ctx, user: UserRepository.delete(user)),
+        
+        ('SubjectRepository.create', lambda ctx: (ctx.unique('Nuova '),),
+         lambda ctx, name: SubjectRepository.create(name, ctx.user_id)),
+        ('SubjectRepository.find_all_by_user', no_setup,
+         lambda ctx: SubjectRepository.find_all_by_user(ctx.user_id)),
+        ('SubjectRepository.name_map', no_setup,
+         lambda ctx: SubjectRepository.name_map(ctx.user_id)),
+        ('SubjectRepository.find_all_with_stats', no_setup,
+         lambda ctx: SubjectRepository.find_all_with_stats(ctx.user_id)),
+        ('SubjectRepository.find_by_id', no_setup,
+         lambda ctx: SubjectRepository.find_by_id(ctx.subject_id, ctx.user_id)),
+        ('SubjectRepository.update', existing_subject,
+         lambda ctx, subject: SubjectRepository.update(subject, subject.name)),
+        ('SubjectRepository.delete', new_subject,
+         lambda ctx, subject: SubjectRepository.delete(subject)),
+        ('SubjectRepository.count_by_user', no_setup,
+         lambda ctx: SubjectRepository.count_by_user(ctx.user_id)),
+        
+        ('StudySessionRepository.create', no_setup,
+         lambda ctx: StudySessionRepository.create('bench', 30, ctx.subject_id, ctx.user_id, today)),
+        ('StudySessionRepository.bulk_create[100]', bulk_rows,
+         lambda ctx, rows: StudySessionRepository.bulk_create(ctx.user_id, rows)),
+        ('StudySessionRepository.find_all_by_user', no_setup,
+         lambda ctx: StudySessionRepository.find_all_by_user(ctx.user_id)),
+        ('StudySessionRepository.find_page_by_user', no_setup,
+         lambda ctx: StudySessionRepository.find_page_by_user(ctx.user_id)),
+        ('StudySessionRepository.find_page_by_user[rows]', no_setup,
+         lambda ctx: StudySessionRepository.find_page_by_user(ctx.user_id, rows=True)),
+        ('StudySessionRepository.find_page_by_user[page2]', second_page_cursor,
+         lambda ctx, cursor: StudySessionRepository.find_page_by_user(ctx.user_id, cursor=cursor)),
+        ('StudySessionRepository.iter_export_rows', no_setup,
+         lambda ctx: sum(1 for _ in StudySessionRepository.iter_export_rows(ctx.user_id))),
+        ('StudySessionRepository.find_by_id', no_setup,
+         lambda ctx: StudySessionRepository.find_by_id(ctx.session_id, ctx.user_id)),
+        ('StudySessionRepository.find_by_subject', no_setup,
+         lambda ctx: StudySessionRepository.find_by_subject(ctx.subject_id, ctx.user_id)),
+        ('StudySessionRepository.iter_rows_by_subject', no_setup,
+         lambda ctx: sum(1 for _ in StudySessionRepository.iter_rows_by_subject(
+             ctx.subject_id, ctx.user_id))),
+        ('StudySessionRepository.find_rows_by_subject', no_setup,
+         lambda ctx: StudySessionRepository.find_rows_by_subject(ctx.subject_id, ctx.user_id)),
+        ('StudySessionRepository.totals_by_subject', no_setup,
+         lambda ctx: StudySessionRepository.totals_by_subject(ctx.subject_id, ctx.user_id)),
+        ('StudySessionRepository.update', existing_session,
+         lambda ctx, s: StudySessionRepository.update(
+             s, s.topic, s.duration_minutes, s.subject_id, s.date, s.notes)),
+        ('StudySessionRepository.delete', new_session,
+         lambda ctx, s: StudySessionRepository.delete(s)),
+        ('StudySessionRepository.count_by_user', no_setup,
+         lambda ctx: StudySessionRepository.count_by_user(ctx.user_id)),
+        ('StudySessionRepository.total_hours_by_user', no_setup,
+         lambda ctx: StudySessionRepository.total_hours_by_user(ctx.user_id)),
+        ('StudySessionRepository.total_hours_by_subject', no_setup,
+         lambda ctx: StudySessionRepository.total_hours_by_subject(ctx.user_id)),
+        ('StudySessionRepository.study_trend_by_month', no_setup,
+         lambda ctx: StudySessionRepository.study_trend_by_month(ctx.user_id, today.year)),
+        ('StudySessionRepository.study_trend[day]', no_setup,
+         lambda ctx: StudySessionRepository.study_trend(
+             ctx.user_id, today - timedelta(days=365), today, 'day')),
+        ('StudySessionRepository.analytics_columns', no_setup,
+         lambda ctx: StudySessionRepository.analytics_columns(ctx.user_id)),
+        ('analytics.compute', no_setup,
+         lambda ctx: analytics.compute(ctx.user_id, today, analytics.default_exam_date(today), 200)),
+        ('StudySessionRepository.recent_sessions_summary', no_setup,
+         lambda ctx: StudySessionRepository.recent_sessions_summary(ctx.user_id)),
+        ('StudySessionRepository.get_recent_sessions', no_setup,
+         lambda ctx: StudySessionRepository.get_recent_sessions(ctx.user_id)),
+        
+        ('SearchRepository.search', no_setup,
+         lambda ctx: SearchRepository.search(ctx.user_id, 'integr')),
+        ('SearchRepository.search[2 parole]', no_setup,
+         lambda ctx: SearchRepository.search(ctx.user_id, 'rivoluzione fran')),
+        ('SearchRepository.rebuild_index', no_setup,
+         lambda ctx: SearchRepository.rebuild_index()),
+        ('SearchRepository.optimize_index', no_setup,
+         lambda ctx: SearchRepository.optimize_index()),
+        
+        ('GoalRepository.create', no_setup,
+         lambda ctx: GoalRepository.create(ctx.user_id, 'week', 600)),
+        ('GoalRepository.find_by_id', new_goal,
+         lambda ctx, goal: GoalRepository.find_by_id(goal.id, ctx.user_id)),
+        ('GoalRepository.exists', no_setup,
+         lambda ctx: GoalRepository.exists(ctx.user_id, 'week')),
+        ('GoalRepository.update', new_goal,
+         lambda ctx, goal: GoalRepository.update(goal, 900)),
+        ('GoalRepository.delete', new_goal,
+         lambda ctx, goal: GoalRepository.delete(goal)),
+        ('GoalRepository.progress', no_setup,
+         lambda ctx: GoalRepository.progress(ctx.user_id, today)),
+        
+        ('PlannerRepository.create', no_setup,
+         lambda ctx: PlannerRepository.create(ctx.user_id, ctx.subject_id, today, 45, 'bench')),
+        ('PlannerRepository.find_by_id', new_plan,
+         lambda ctx, plan: PlannerRepository.find_by_id(plan.id, ctx.user_id)),
+        ('PlannerRepository.delete', new_plan,
+         lambda ctx, plan: PlannerRepository.delete(plan)),
+        ('PlannerRepository.complete', new_plan,
+         lambda ctx, plan: PlannerRepository.complete(plan, today)),
+        ('PlannerRepository.day_buckets', no_setup,
+         lambda ctx: PlannerRepository.day_buckets(
+             ctx.user_id, today - timedelta(days=41), today)),
+        ('PlannerRepository.find_by_day', no_setup,
+         lambda ctx: PlannerRepository.find_by_day(ctx.user_id, today)),
+        
+        ('GroupRepository.create', no_setup,
+         lambda ctx: GroupRepository.create(ctx.unique('Gruppo '), ctx.user_id)),
+        ('GroupRepository.find_by_id', no_setup,
+         lambda ctx: GroupRepository.find_by_id(ctx.group_id, ctx.user_id)),
+        ('GroupRepository.find_by_invite_code', existing_group,
+         lambda ctx, group: GroupRepository.find_by_invite_code(group.invite_code)),
+        ('GroupRepository.find_all_by_user', no_setup,
+         lambda ctx: GroupRepository.find_all_by_user(ctx.user_id)),
+        ('GroupRepository.is_member', no_setup,
+         lambda ctx: GroupRepository.is_member(ctx.group_id, ctx.user_id)),
+        ('GroupRepository.member_count', no_setup,
+         lambda ctx: GroupRepository.member_count(ctx.group_id)),
+        ('GroupRepository.join', other_group,
+         lambda ctx, group: GroupRepository.join(group, ctx.user_id)),
+        ('GroupRepository.leave', new_group,
+         lambda ctx, group: GroupRepository.leave(group, ctx.user_id)),
+        ('GroupRepository.delete', new_group,
+         lambda ctx, group: GroupRepository.delete(group)),
+        ('LeaderboardRepository.top[week]', no_setup,
+         lambda ctx: LeaderboardRepository.top(ctx.group_id, 'week', week)),
+        ('LeaderboardRepository.top[all]', no_setup,
+         lambda ctx: LeaderboardRepository.top(ctx.group_id, 'all', leaderboard_start(today, 'all'))),
+        ('LeaderboardRepository.rank', no_setup,
+         lambda ctx: LeaderboardRepository.rank(ctx.group_id, 'week', week, ctx.user_id)),
+        
+        ('SyncRepository.changes[completo]', no_setup,
+         lambda ctx: SyncRepository.changes(ctx.user_id)),
+        ('SyncRepository.changes[cursore]', sync_cursor,
+         lambda ctx, cursor: SyncRepository.changes(ctx.user_id, cursor)),
+        ('SyncRepository.apply_push[50]', push_items,
+         lambda ctx, subjects, sessions, deletions: SyncRepository.apply_push(
+             ctx.user_id, subjects, sessions, deletions)),
+        ('SyncRepository.add_tombstone', no_setup,
+         lambda ctx: SyncRepository.add_tombstone(ctx.user_id, 'session', 0)),
+        
+        ('StatsRepository.get_user_stats', no_setup,
+         lambda ctx: StatsRepository.get_user_stats(ctx.user_id)),
+        ('StatsRepository.subject_stats', no_setup,
+         lambda ctx: StatsRepository.subject_stats(ctx.user_id)),
+        ('StatsRepository.monthly_trend', no_setup,
+         lambda ctx: StatsRepository.monthly_trend(ctx.user_id, today.year)),
+    ]
+
+
+def _route_benchmarks():
+    """Elenco (nome, metodo, url(ctx), dati(ctx)) delle richieste da misurare"""
+    today = date.today().isoformat()
+    
+    def session_form(ctx):
+        return {'topic': 'bench', 'duration_minutes': '30', 'subject_id': str(ctx.subject_id),
+                'date': today}
+    
+    return [
+        ('GET /', 'GET', lambda ctx: '/', None),
+        ('GET /dashboard', 'GET', lambda ctx: '/dashboard', None),
+        ('GET /dashboard/trend', 'GET', lambda ctx: '/dashboard/trend?granularity=week', None),
+        ('GET /analytics', 'GET', lambda ctx: '/analytics', None),
+        ('GET /sessions', 'GET', lambda ctx: '/sessions', None),
+        ('GET /sessions?subject_id', 'GET', lambda ctx: f'/sessions?subject_id={ctx.subject_id}', None),
+        ('GET /sessions/new', 'GET', lambda ctx: '/sessions/new', None),
+        ('POST /sessions/new', 'POST', lambda ctx: '/sessions/new', session_form),
+        ('GET /sessions/import', 'GET', lambda ctx: '/sessions/import', None),
+        ('GET /sessions/export', 'GET', lambda ctx: '/sessions/export?format=csv', None),
+        ('GET /sessions/<id>/edit', 'GET', lambda ctx: f'/sessions/{ctx.session_id}/edit', None),
+        ('POST /sessions/<id>/edit', 'POST', lambda ctx: f'/sessions/{ctx.session_id}/edit',
+         session_form),
+        ('GET /sessions/search', 'GET', lambda ctx: '/sessions/search?q=integr', None),
+        ('GET /goals', 'GET', lambda ctx: '/goals', None),
+        ('GET /calendar', 'GET', lambda ctx: '/calendar', None),
+        ('GET /calendar/data', 'GET', lambda ctx: '/calendar/data?view=month', None),
+        ('GET /groups', 'GET', lambda ctx: '/groups', None),
+        ('GET /groups/<id>', 'GET', lambda ctx: f'/groups/{ctx.group_id}', None),
+        ('GET /groups/<id>?period=all', 'GET', lambda ctx: f'/groups/{ctx.group_id}?period=all', None),
+        ('GET /subjects', 'GET', lambda ctx: '/subjects', None),
+        ('GET /subjects/new', 'GET', lambda ctx: '/subjects/new', None),
+        ('GET /subjects/<id>', 'GET', lambda ctx: f'/subjects/{ctx.subject_id}', None),
+        ('GET /subjects/<id>/edit', 'GET', lambda ctx: f'/subjects/{ctx.subject_id}/edit', None),
+        ('GET /api/sessions', 'GET', lambda ctx: '/api/sessions', None),
+        ('GET /api/sessions/<id>', 'GET', lambda ctx: f'/api/sessions/{ctx.session_id}', None),
+        ('GET /api/subjects', 'GET', lambda ctx: '/api/subjects', None),
+        ('GET /api/subjects/<id>', 'GET', lambda ctx: f'/api/subjects/{ctx.subject_id}', None),
+        ('GET /api/stats', 'GET', lambda ctx: '/api/stats', None),
+        ('GET /api/sync/changes', 'GET', lambda ctx: '/api/sync/changes?limit=100', None),
+        ('GET /stats/cache', 'GET', lambda ctx: '/stats/cache', None),
+        ('GET /auth/login', 'GET', lambda ctx: '/auth/login', None),
+    ]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summarize(timings, queries, peak_bytes):
+    return {
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 0.95) * 1000, 3),
+        'queries': queries,
+        'peak_kib': round(peak_bytes / 1024, 1)
+    }
+
+
+def _measure(fn, counter, repeat, before=None):
+    """Esegue fn `repeat` volte (più una misura di memoria) e riassume i risultati"""
+    timings = []
+    for _ in range(repeat):
+        args = before() if before else ()
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    
+    # Ultima esecuzione: numero di query e picco di memoria (tracemalloc rallenta, non è cronometrata)
+    args = before() if before else ()
+    counter.count = 0
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summarize(timings, counter.count, peak)
+
+
+def _uncovered(names):
+    """Metodi pubblici dei repository senza benchmark (segnalati come avviso)"""
+    from app import repositories
+    
+    missing = []
+    for cls_name in ('UserRepository', 'SubjectRepository', 'StudySessionRepository',
+                     'SearchRepository', 'GoalRepository', 'PlannerRepository',
+                     'GroupRepository', 'LeaderboardRepository', 'SyncRepository'):
+        cls = getattr(repositories, cls_name)
+        for attr in vars(cls):
+            if not attr.startswith('_') and not any(
+                    n == f'{cls_name}.{attr}' or n.startswith(f'{cls_name}.{attr}[') for n in names):
+                missing.append(f'{cls_name}.{attr}')
+    return missing
+
+
+def run_scale(scale, repeat, seed):
+    """Crea l'app su un database temporaneo, genera i dati e misura tutto a una scala"""
+    users, subjects, sessions = (int(x) for x in scale.split('x'))
+    workdir = tempfile.mkdtemp(prefix='studyplanner-bench-')
+    
+    class BenchmarkConfig(DevelopmentConfig):
+        DEBUG = False
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+        CACHE_TYPE = 'null'
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        PASSWORD_HASH_WORKERS = 0
+    
+    config['benchmark'] = BenchmarkConfig
+    
+    from app import create_app, db
+    from app.migrations import upgrade
+    from benchmarks.datagen import generate
+    from app.models import Subject, StudySession, User
+    from app.repositories import GroupRepository
+    
+    app = create_app('benchmark')
+    results = {}
+    
+    with app.app_context():
+        upgrade(db.engine)
+        started = time.perf_counter()
+        user_ids = generate(users, subjects, sessions, seed=seed)
+        print(f'  dati generati in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+        
+        user = db.session.get(User, user_ids[0])
+        subject = Subject.query.filter_by(user_id=user.id).order_by(Subject.id).first()
+        study_session = StudySession.query.filter_by(user_id=user.id).order_by(StudySession.id).first()
+        # Un gruppo con tutti gli utenti generati: le scritture delle sessioni aggiornano
+        # anche la classifica, come per uno studente iscritto a una classe
+        group = GroupRepository.create('Classe', user.id)
+        for user_id in user_ids[1:]:
+            GroupRepository.join(group, user_id)
+        ctx = BenchContext(user.id, user.username, subject.id, study_session.id, group.id)
+        counter = QueryCounter(db.engines.values())
+        
+        benchmarks = _repository_benchmarks()
+        for name, setup, fn in benchmarks:
+            def before(setup=setup):
+                db.session.remove()
+                return setup(ctx)
+            results[name] = _measure(lambda *args, fn=fn: fn(ctx, *args), counter, repeat, before)
+        
+        missing = _uncovered([b[0] for b in benchmarks])
+        if missing:
+            print(f'  ⚠️  metodi senza benchmark: {", ".join(missing)}', file=sys.stderr)
+    
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['user_id'] = ctx.user_id
+        flask_session['username'] = ctx.username
+    
+    for name, method, url, data in _route_benchmarks():
+        def request(url=url, method=method, data=data):
+            response = client.open(url(ctx), method=method, data=data(ctx) if data else None)
+            response.get_data()
+            if response.status_code >= 400:
+                raise RuntimeError(f'{name}: HTTP {response.status_code}')
+        results[name] = _measure(request, counter, repeat)
+    
+    counter.close()
+    return results
+
+
+def compare(current, baseline, threshold, min_delta_ms=2.0):
+    """
+    Confronta con una baseline: restituisce le regressioni (p95 o numero di query)
+    Variazioni del p95 sotto min_delta_ms sono considerate rumore di misura.
+    """
+    regressions = []
+    for scale, benchmarks in current.items():
+        for name, result in benchmarks.items():
+            reference = baseline.get(scale, {}).get(name)
+            if not reference:
+                continue
+            if result['p95_ms'] > reference['p95_ms'] * (1 + threshold) and \
+                    result['p95_ms'] - reference['p95_ms'] > min_delta_ms:
+                regressions.append(f'{scale} {name}: p95 {reference["p95_ms"]}ms → {result["p95_ms"]}ms')
+            if result['queries'] > reference['queries']:
+                regressions.append(f'{scale} {name}: query {reference["queries"]} → {result["queries"]}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark di repository e rotte di StudyPlanner')
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help='Scale separate da virgola, nel formato UTENTIxMATERIExSESSIONI')
+    parser.add_argument('--repeat', type=int, default=15, help='Ripetizioni per misura')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--save', help='Salva i risultati come baseline JSON')
+    parser.add_argument('--compare', help='Baseline JSON con cui confrontare i risultati')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Tolleranza sul p95 prima di segnalare una regressione (0.25 = +25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0,
+                        help='Variazione minima del p95 (ms) considerata una regressione')
+    args = parser.parse_args(argv)
+    
+    results = {}
+    for scale in args.scales.split(','):
+        print(f'▶ scala {scale}', file=sys.stderr)
+        results[scale] = run_scale(scale, args.repeat, args.seed)
+        width = max(len(name) for name in results[scale])
+        print(f'{"benchmark":<{width}}  {"p50 ms":>9}  {"p95 ms":>9}  {"query":>5}  {"peak KiB":>9}')
+        for name, r in results[scale].items():
+            print(f'{name:<{width}}  {r["p50_ms"]:>9}  {r["p95_ms"]:>9}  {r["queries"]:>5}  {r["peak_kib"]:>9}')
+    
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'results': results
+    }
+    
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'💾 baseline salvata in {args.save}', file=sys.stderr)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f'❌ {regression}')
+        if regressions:
+            return 1
+        print('✅ Nessuna regressione rispetto alla baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
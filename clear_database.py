@@ -1,34 +1,31 @@
 """
 Script per cancellare tutti i dati dal database
+Le sessioni vengono eliminate a blocchi con commit intermedi, così il lock di
+scrittura non resta occupato per tutta la durata della cancellazione.
 """
-from app import create_app, db
-from app.models import User, Subject, StudySession
+from app import create_app
+from app.repositories import PurgeRepository
 
 
-def clear_database():
+def _print_progress(deleted, total):
+    """Avanzamento della cancellazione sulla stessa riga"""
+    print(f"\r   {deleted}/{total} sessioni eliminate", end='', flush=True)
+
+
+def clear_database(batch_size=1000):
     """Cancella tutti i dati dal database"""
     app = create_app()
     
     with app.app_context():
         print("🗑️  Cancellazione dati in corso...")
         
-        # Cancella tutte le sessioni di studio
-        num_sessions = StudySession.query.count()
-        StudySession.query.delete()
-        print(f"✅ Eliminate {num_sessions} sessioni di studio")
-        
-        # Cancella tutte le materie
-        num_subjects = Subject.query.count()
-        Subject.query.delete()
-        print(f"✅ Eliminate {num_subjects} materie")
-        
-        # Cancella tutti gli utenti
-        num_users = User.query.count()
-        User.query.delete()
-        print(f"✅ Eliminati {num_users} utenti")
+        result = PurgeRepository.purge_all(batch_size, on_progress=_print_progress)
+        if result['sessions']:
+            print()
         
-        # Commit delle modifiche
-        db.session.commit()
+        print(f"✅ Eliminate {result['sessions']} sessioni di studio")
+        print(f"✅ Eliminate {result['subjects']} materie")
+        print(f"✅ Eliminati {result['users']} utenti")
         
         print("\n✨ Database pulito con successo!")
         print("Puoi ora registrare un nuovo utente.")
@@ -9,10 +9,85 @@ class Config:
         'sqlite:///studyplanner.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # PRAGMA applicati a ogni connessione SQLite (foreign_keys attiva ON DELETE CASCADE)
+    SQLITE_PRAGMAS = {'busy_timeout': 5000, 'foreign_keys': 'ON'}
+    # Se attivo, le richieste GET/HEAD leggono da connessioni in sola lettura
+    SQLITE_READ_SPLIT = False
+    
     # Configurazione sessione
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    
+    # Numero di sessioni per pagina nella lista sessioni
+    SESSIONS_PER_PAGE = 20
+    
+    # Numero massimo di elementi per pagina nell'API JSON
+    API_MAX_PAGE_SIZE = 200
+    
+    # Ampiezza massima (in giorni) dell'intervallo richiesto al grafico trend, per granularità
+    TREND_MAX_DAYS = {'day': 366, 'week': 3 * 366, 'month': 20 * 366, 'year': 100 * 366}
+    
+    # Statistiche avanzate: data dell'esame (YYYY-MM-DD, None = prossimo 18 giugno),
+    # ore di studio obiettivo e giorni mostrati nel grafico delle medie mobili
+    EXAM_DATE = os.environ.get('EXAM_DATE')
+    EXAM_TARGET_HOURS = int(os.environ.get('EXAM_TARGET_HOURS') or 200)
+    ANALYTICS_CHART_DAYS = 90
+    
+    # Gruppi di studio: membri mostrati nella classifica
+    LEADERBOARD_SIZE = 10
+    
+    # Sincronizzazione dei client offline: modifiche per risposta e per invio
+    SYNC_PAGE_SIZE = 500
+    SYNC_MAX_PUSH_ITEMS = 500
+    
+    # Importazione massiva: dimensione massima del file e righe per blocco di INSERT
+    MAX_CONTENT_LENGTH = 32 * 1024 * 1024
+    IMPORT_BATCH_SIZE = 2000
+    
+    # Hashing delle password: parametri werkzeug (es. 'scrypt:32768:8:1' o 'pbkdf2:sha256:600000').
+    # Se cambiano, gli hash esistenti vengono ricalcolati al login successivo.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    # Processi dedicati all'hashing (0 = nel thread della richiesta)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    # Richieste di hashing ammesse contemporaneamente (oltre si risponde "riprova")
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 8)
+    PASSWORD_HASH_TIMEOUT = 10
+    
+    # Cache applicativa: 'memory' (LRU+TTL nel processo), 'sqlite' (condivisa tra processi) o 'null'
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'memory'
+    CACHE_DEFAULT_TTL = 300
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or 'studyplanner-cache.db'
+    
+    # Strumentazione: soglia (ms) oltre cui una query viene registrata come lenta e numero di
+    # ripetizioni della stessa forma di query in una richiesta segnalate come possibile N+1
+    SQL_SLOW_QUERY_MS = 200
+    SQL_NPLUSONE_THRESHOLD = 5
+    # Header Server-Timing nelle risposte (None = solo in debug)
+    SERVER_TIMING = None
+    # Se impostato, /metrics richiede "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Se attivo, senza METRICS_TOKEN /metrics non è esposto (risponde 404)
+    METRICS_REQUIRE_TOKEN = False
+    
+    # Asset statici: URL con fingerprint da app/static/dist/manifest.json (`flask assets build`).
+    # None = attivo fuori dal debug; in sviluppo si servono i file originali
+    ASSETS_USE_MANIFEST = None
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+    # Se attivo, avvio e `flask assets build` falliscono quando mancano le librerie di
+    # `flask assets vendor`; altrimenti le pagine le caricano dai CDN (con un avviso nel log)
+    ASSETS_REQUIRE_VENDOR = bool(os.environ.get('ASSETS_REQUIRE_VENDOR'))
+    
+    # Compressione delle risposte testuali (gzip, o brotli se installato), anche in streaming
+    COMPRESS_ENABLED = True
+    COMPRESS_MIMETYPES = ('text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+                          'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+    COMPRESS_MIN_SIZE = 500
+    # Dimensione minima (caratteri) dei blocchi inviati dalle pagine in streaming
+    STREAM_BUFFER_SIZE = 4096
 
 
 class DevelopmentConfig(Config):
@@ -25,6 +100,36 @@ class ProductionConfig(Config):
     DEBUG = False
     # In produzione, SECRET_KEY deve essere sempre impostata
     SECRET_KEY = os.environ.get('SECRET_KEY')
+    # Con più processi worker serve una cache condivisa
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'sqlite'
+    # Le metriche rivelano endpoint e query: esposte solo con METRICS_TOKEN
+    METRICS_REQUIRE_TOKEN = True
+    
+    # Profilo SQLite: WAL (i lettori non attendono lo scrittore), attesa sui lock invece
+    # dell'errore "database is locked", cache di pagina e mmap più ampie
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'busy_timeout': 10000,
+        'synchronous': 'NORMAL',
+        'cache_size': -32000,  # in KiB (32 MB)
+        'mmap_size': 268435456,  # 256 MB
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+    # Un solo percorso di scrittura per processo: una connessione, le altre attendono il pool
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 1,
+        'max_overflow': 0,
+        'pool_timeout': 30,
+        'pool_pre_ping': False
+    }
+    # Letture su connessioni in sola lettura, scalano con i thread del worker
+    SQLITE_READ_SPLIT = True
+    SQLITE_READER_ENGINE_OPTIONS = {
+        'pool_size': 8,
+        'max_overflow': 8,
+        'pool_timeout': 30
+    }
 
 
 config = {
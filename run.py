@@ -1,6 +1,10 @@
-from app import create_app
+from app import create_app, db
+from app.migrations import upgrade
 
 app = create_app()
 
 if __name__ == '__main__':
+    # Server di sviluppo (in produzione: serve.py): aggiorna lo schema una volta all'avvio
+    with app.app_context():
+        upgrade(db.engine)
     app.run(debug=True)
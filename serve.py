@@ -0,0 +1,63 @@
+"""
+Avvio in produzione su più processi (vedi app/prefork.py)
+L'applicazione è caricata una volta con create_app('production') e condivisa dai worker.
+
+    SECRET_KEY=... python serve.py --bind 0.0.0.0:8000 --workers 4 --max-requests 5000
+
+Lo schema del database va aggiornato prima, con `flask --app run db upgrade`.
+"""
+import argparse
+import logging
+import os
+import sys
+from app import create_app
+from app.prefork import Arbiter
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Server di produzione multi-processo di StudyPlanner')
+    parser.add_argument('--bind', default=os.environ.get('BIND') or '127.0.0.1:8000',
+                        help='indirizzo di ascolto host:porta (default 127.0.0.1:8000)')
+    parser.add_argument('--workers', type=int, default=_env_int('WEB_CONCURRENCY', os.cpu_count() or 1),
+                        help='processi worker (default: numero di CPU)')
+    parser.add_argument('--max-requests', type=int, default=_env_int('MAX_REQUESTS', 0),
+                        help='richieste dopo cui un worker viene riciclato (0 = mai)')
+    parser.add_argument('--max-requests-jitter', type=int, default=_env_int('MAX_REQUESTS_JITTER', 0),
+                        help='margine casuale aggiunto a --max-requests per ogni worker')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='secondi senza battito dopo cui un worker viene terminato')
+    parser.add_argument('--graceful-timeout', type=int, default=30,
+                        help='secondi concessi ai worker per finire le richieste in corso')
+    parser.add_argument('--keepalive', type=int, default=15,
+                        help='secondi di inattività dopo cui si chiude una connessione keep-alive')
+    parser.add_argument('--status-file', help='file JSON con lo stato dei worker, aggiornato ogni secondo')
+    parser.add_argument('--pid-file', help='file con il PID del master (per inviare SIGHUP/SIGTERM)')
+    parser.add_argument('--no-access-log', dest='access_log', action='store_false',
+                        help='non registra le singole richieste')
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error('--workers deve essere almeno 1')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    
+    app = create_app('production')
+    if not app.config.get('SECRET_KEY'):
+        sys.exit('SECRET_KEY non impostata: obbligatoria in produzione')
+    
+    arbiter = Arbiter(app, bind=args.bind, workers=args.workers, max_requests=args.max_requests,
+                      max_requests_jitter=args.max_requests_jitter, timeout=args.timeout,
+                      graceful_timeout=args.graceful_timeout, keepalive=args.keepalive,
+                      access_log=args.access_log, status_file=args.status_file, pid_file=args.pid_file)
+    return arbiter.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())